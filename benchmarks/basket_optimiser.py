@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the basket optimiser on synthetic catalogues
+
+Usage:
+    python benchmarks/basket_optimiser.py
+    python benchmarks/basket_optimiser.py --items 50 200 500 --runs 5
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.basket_optimiser import BasketOptimiser, DeliveryRule
+from src.price_index import STORE_PRIORITY
+
+STORES = ['jjfoodservice', 'atoz_catering', 'amazon_uk']
+
+# Representative delivery terms for the benchmark only; real values come from config.json
+RULES = {
+    'jjfoodservice': DeliveryRule(fee=5.00, minimum_order=50.0, free_delivery_threshold=150.0),
+    'atoz_catering': DeliveryRule(fee=7.50, minimum_order=40.0, free_delivery_threshold=100.0),
+    'amazon_uk': DeliveryRule(fee=4.99, minimum_order=0.0, free_delivery_threshold=25.0),
+}
+
+
+def make_basket(item_count: int, rng: random.Random) -> dict:
+    """Generate prices for item_count products, each sold by one to three stores."""
+    basket = {}
+    for product_id in range(item_count):
+        base = rng.uniform(2.0, 60.0)
+        stores = [store for store in STORES if rng.random() < 0.75] or [rng.choice(STORES)]
+        basket[product_id] = {store: round(base * rng.uniform(0.85, 1.2), 2) for store in stores}
+    return basket
+
+
+def cheapest_per_item_cost(basket: dict) -> float:
+    """Cost of the naive per-item cheapest assignment, including delivery charges."""
+    subtotals = {}
+    for options in basket.values():
+        store = min(options, key=options.get)
+        subtotals[store] = subtotals.get(store, 0.0) + options[store]
+    return sum(subtotal + RULES[store].charge(subtotal) for store, subtotal in subtotals.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Basket optimiser benchmark')
+    parser.add_argument('--items', type=int, nargs='+', default=[10, 50, 100, 200, 400])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    optimiser = BasketOptimiser(RULES, store_priority=STORE_PRIORITY)
+
+    print(f"{'items':>6} {'median ms':>10} {'max ms':>8} {'optimal':>8} {'nodes':>8} {'naive £':>10} {'optimised £':>12}")
+    for item_count in args.items:
+        timings, optimal_runs, nodes = [], 0, []
+        naive_total = optimised_total = 0.0
+        for _ in range(args.runs):
+            basket = make_basket(item_count, rng)
+            result = optimiser.optimise(basket)
+            timings.append(result.elapsed * 1000)
+            optimal_runs += result.optimal
+            nodes.append(result.nodes_explored)
+            naive_total += cheapest_per_item_cost(basket)
+            optimised_total += result.total_cost
+
+        print(f"{item_count:>6} {statistics.median(timings):>10.1f} {max(timings):>8.1f} "
+              f"{optimal_runs:>5}/{args.runs} {int(statistics.median(nodes)):>8} "
+              f"{naive_total / args.runs:>10.2f} {optimised_total / args.runs:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Query benchmark for DatabaseManager, shopping-list queries and the main Flask routes
+
+Runs against a synthetic database (see benchmarks/synthetic_db.py), generating
+one first if --db does not exist. Each case is called --repeat times for
+randomly chosen products, and the median, p95 and max latency are reported.
+
+Usage:
+    python benchmarks/db_queries.py --db /tmp/price_tracker_1k.db
+    python benchmarks/db_queries.py --db /tmp/big.db --products 10000 --years 3 --repeat 10
+    python benchmarks/db_queries.py --db /tmp/big.db --save-baseline     # before a schema/index change
+    python benchmarks/db_queries.py --db /tmp/big.db                     # after it, compared with the baseline
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+import warnings
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_db import generate
+from src.config import Config
+from src.database import DatabaseManager
+from src.shopping_list import AutoShoppingListGenerator
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'db-queries-baseline.json')
+
+
+def database_cases(db: DatabaseManager, product_ids: List[int]) -> List[Tuple[str, Callable[[int], object]]]:
+    newest = db.get_price_history_page(product_ids[0], days=3650, limit=1)
+    before = (newest[0]['timestamp'], newest[0]['id']) if newest else None
+    return [
+        ('db.get_product', lambda pid: db.get_product(pid)),
+        ('db.get_all_products', lambda pid: db.get_all_products()),
+        ('db.get_price_history 30d', lambda pid: db.get_price_history(pid, days=30)),
+        ('db.get_price_history 365d', lambda pid: db.get_price_history(pid, days=365)),
+        ('db.get_latest_prices', lambda pid: db.get_latest_prices(pid)),
+        ('db.get_price_statistics 30d', lambda pid: db.get_price_statistics(pid, days=30)),
+        ('db.get_price_statistics 365d', lambda pid: db.get_price_statistics(pid, days=365)),
+        ('db.get_products_page', lambda pid: db.get_products_page(after_id=pid, limit=100)),
+        ('db.get_products_page site', lambda pid: db.get_products_page(after_id=pid, limit=100, site_name='amazon_uk')),
+        ('db.get_price_history_page', lambda pid: db.get_price_history_page(pid, days=365, limit=500)),
+        ('db.get_price_history_page before', lambda pid: db.get_price_history_page(pid, days=3650, before=before)),
+        ('db.get_price_history_signature', lambda pid: db.get_price_history_signature(pid, days=30)),
+        ('db.get_data_versions', lambda pid: db.get_data_versions()),
+    ]
+
+
+def shopping_cases(db: DatabaseManager, config: Config) -> List[Tuple[str, Callable[[int], object]]]:
+    warm = AutoShoppingListGenerator(db, delivery_rules=config.delivery_rules)
+    return [
+        ('shopping.get_current_best_prices cold',
+         lambda pid: AutoShoppingListGenerator(db, delivery_rules=config.delivery_rules).get_current_best_prices()),
+        ('shopping.get_current_best_prices warm', lambda pid: warm.get_current_best_prices()),
+        ('shopping.get_latest_prices_by_store', lambda pid: warm.get_latest_prices_by_store(days_back=1)),
+        ('shopping.generate_shopping_lists cold',
+         lambda pid: AutoShoppingListGenerator(db, delivery_rules=config.delivery_rules).generate_shopping_lists()),
+        ('shopping.generate_shopping_lists warm', lambda pid: warm.generate_shopping_lists()),
+    ]
+
+
+def route_cases(db_path: str) -> List[Tuple[str, Callable[[int], object]]]:
+    os.environ['DATABASE_PATH'] = db_path
+    from src.web_ui import create_app
+
+    client = create_app().test_client()
+
+    def get(path: str):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+        return response
+
+    return [
+        ('GET /', lambda pid: get('/')),
+        ('GET /product/<id>', lambda pid: get(f'/product/{pid}')),
+        ('GET /api/products', lambda pid: get('/api/products')),
+        ('GET /api/products?limit=1000', lambda pid: get('/api/products?limit=1000')),
+        ('GET /api/product/<id>/prices', lambda pid: get(f'/api/product/{pid}/prices?days=365')),
+        ('GET /shopping-lists', lambda pid: get('/shopping-lists')),
+        ('GET /api/shopping-lists', lambda pid: get('/api/shopping-lists')),
+    ]
+
+
+def run_case(call: Callable[[int], object], product_ids: List[int], repeat: int,
+             budget: float) -> Dict[str, float]:
+    """Time ``repeat`` calls, stopping early once a case has used ``budget`` seconds."""
+    started = time.perf_counter()
+    call(product_ids[0])  # warm-up
+    timings = []
+    for i in range(repeat):
+        if timings and time.perf_counter() - started > budget:
+            break
+        call_started = time.perf_counter()
+        call(product_ids[i % len(product_ids)])
+        timings.append(time.perf_counter() - call_started)
+    values = np.asarray(timings) * 1000
+    return {'calls': len(timings), 'median_ms': float(np.median(values)),
+            'p95_ms': float(np.percentile(values, 95)), 'max_ms': float(values.max())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Database and route query benchmark')
+    parser.add_argument('--db', required=True, help='Synthetic database to use (generated if missing)')
+    parser.add_argument('--products', type=int, default=1000, help='Products when generating --db')
+    parser.add_argument('--years', type=float, default=1.0, help='Years of history when generating --db')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--case-budget', type=float, default=30.0,
+                        help='Stop repeating a case after this many seconds (slow queries get fewer calls)')
+    parser.add_argument('--only', choices=['db', 'shopping', 'routes'], nargs='+',
+                        default=['db', 'shopping', 'routes'])
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed growth in median latency before reporting a regression (fraction)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    warnings.simplefilter('ignore', FutureWarning)
+
+    if not os.path.exists(args.db):
+        print(f"Generating {args.db} ({args.products} products, {args.years} years)...")
+        generate(args.db, args.products, args.years)
+
+    db = DatabaseManager(args.db)
+    with db.get_connection() as conn:
+        all_ids = [row[0] for row in conn.execute('SELECT id FROM products WHERE active = 1')]
+        history_rows = conn.execute('SELECT COUNT(*) FROM price_history').fetchone()[0]
+    product_ids = random.Random(args.seed).sample(all_ids, min(len(all_ids), args.repeat))
+    print(f"{args.db}: {len(all_ids)} active products, {history_rows:,} price rows\n")
+
+    config = Config()
+    cases = []
+    if 'db' in args.only:
+        cases += database_cases(db, product_ids)
+    if 'shopping' in args.only:
+        cases += shopping_cases(db, config)
+    if 'routes' in args.only:
+        cases += route_cases(args.db)
+
+    results = {}
+    print(f"{'case':<42} {'calls':>5} {'median ms':>10} {'p95 ms':>9} {'max ms':>9}")
+    for name, call in cases:
+        try:
+            row = results[name] = run_case(call, product_ids, args.repeat, args.case_budget)
+        except Exception as e:
+            print(f"{name:<42} failed: {e}", flush=True)
+            continue
+        print(f"{name:<42} {row['calls']:>5} {row['median_ms']:>10.2f} {row['p95_ms']:>9.2f} {row['max_ms']:>9.2f}",
+              flush=True)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nChange in median latency against {args.baseline}:")
+        regressed = False
+        for name, row in results.items():
+            if name not in baseline:
+                continue
+            previous = baseline[name]['median_ms']
+            change = (row['median_ms'] - previous) / previous if previous else 0.0
+            flag = '  REGRESSION' if change > args.tolerance else ''
+            regressed |= bool(flag)
+            print(f"  {name:<40} {previous:>9.2f} -> {row['median_ms']:>9.2f} ms ({change:+.0%}){flag}")
+        sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
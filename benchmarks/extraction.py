@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the UK site extractors over recorded HTML fixtures
+
+Every page listed in benchmarks/fixtures/manifest.json is run through
+UKCateringScraper.extract_page (parse + site extractor), the same path a live
+scrape takes after the fetch. The results are checked against the manifest and
+the benchmark reports pages/sec, p50/p99 latency and peak traced memory per site,
+the structured-data fast path's hit rate and estimated time saved, the CSS
+selectors evaluated per page, and the single-pass special-offer matcher against
+one soup.select per selector on a long Amazon page.
+
+Usage:
+    python benchmarks/extraction.py
+    python benchmarks/extraction.py --iterations 50 --site amazon_uk
+    python benchmarks/extraction.py --save-baseline      # store results for later comparison
+    python benchmarks/extraction.py --record             # accept current output as expected
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+from typing import Dict, List, Any
+
+import numpy as np
+from bs4 import BeautifulSoup
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import Config
+from src.offer_matcher import OfferMatcher
+from src.structured_data import FAST_PATH_STATS
+from src.uk_scraper import UKCateringScraper
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCH_DIR, 'fixtures')
+MANIFEST_PATH = os.path.join(FIXTURE_DIR, 'manifest.json')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'results', 'extraction-baseline.json')
+CHECKED_FIELDS = ('price', 'title', 'availability')
+
+
+def load_corpus(manifest: Dict[str, Any], site: str = None) -> List[Dict[str, Any]]:
+    corpus = []
+    for path, entry in sorted(manifest.items()):
+        if site and entry['site'] != site:
+            continue
+        with open(os.path.join(FIXTURE_DIR, path), encoding='utf-8') as f:
+            corpus.append({'path': path, 'site': entry['site'], 'html': f.read(),
+                           'expected': entry.get('expected')})
+    return corpus
+
+
+def check_results(scraper: UKCateringScraper, corpus: List[Dict[str, Any]]) -> List[str]:
+    """Compare extractor output with the manifest, returning a line per mismatch."""
+    mismatches = []
+    for page in corpus:
+        data = scraper.extract_page(page['html'], page['site'])
+        for field in CHECKED_FIELDS:
+            expected = (page['expected'] or {}).get(field)
+            if data.get(field) != expected:
+                mismatches.append(f"{page['path']}: {field} = {data.get(field)!r}, expected {expected!r}")
+    return mismatches
+
+
+def time_pages(scraper: UKCateringScraper, corpus: List[Dict[str, Any]], iterations: int) -> Dict[str, List[float]]:
+    """Per-page latencies in seconds, grouped by site."""
+    timings = {page['site']: [] for page in corpus}
+    for _ in range(iterations):
+        for page in corpus:
+            started = time.perf_counter()
+            scraper.extract_page(page['html'], page['site'])
+            timings[page['site']].append(time.perf_counter() - started)
+    return timings
+
+
+def peak_memory(scraper: UKCateringScraper, corpus: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Peak traced allocation in MiB while extracting one page of each site."""
+    peaks = {}
+    for page in corpus:
+        gc.collect()
+        tracemalloc.start()
+        scraper.extract_page(page['html'], page['site'])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks[page['site']] = max(peaks.get(page['site'], 0.0), peak / 2 ** 20)
+    return peaks
+
+
+def time_offer_matching(scraper: UKCateringScraper, iterations: int) -> Dict[str, float]:
+    """Best-of timings of the single-pass offer matcher and of one select per selector, in ms."""
+    with open(os.path.join(FIXTURE_DIR, 'amazon_uk', 'deal_price.html'), encoding='utf-8') as f:
+        html = f.read()
+    body_start = html.index('>', html.index('<body')) + 1
+    body_end = html.rindex('</body>')
+    # A long page: the product section repeated, as with carousels and "customers also bought"
+    soup = BeautifulSoup(html[:body_end] + html[body_start:body_end] * 8 + html[body_end:], 'html.parser')
+    selectors = scraper._special_offer_selectors('amazon_uk')
+    matcher = OfferMatcher(selectors)
+
+    def per_selector():
+        for selector in selectors:
+            try:
+                soup.select(selector)
+            except Exception:
+                pass
+
+    def best_ms(run):
+        timings = []
+        for _ in range(max(3, iterations // 4)):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return min(timings) * 1000
+
+    return {'single_pass_ms': best_ms(lambda: matcher.candidates(soup)), 'per_selector_ms': best_ms(per_selector)}
+
+
+def summarise(latencies: List[float], peak_mib: float) -> Dict[str, float]:
+    values = np.asarray(latencies)
+    return {
+        'pages': int(values.size),
+        'pages_per_sec': float(values.size / values.sum()),
+        'p50_ms': float(np.percentile(values, 50) * 1000),
+        'p99_ms': float(np.percentile(values, 99) * 1000),
+        'peak_mib': float(peak_mib)
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[str]:
+    """Metrics that got worse than the baseline by more than ``tolerance`` (a fraction)."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current['pages_per_sec'] < previous['pages_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {current['pages_per_sec']:.1f} pages/s "
+                               f"vs {previous['pages_per_sec']:.1f} baseline")
+        for metric in ('p50_ms', 'p99_ms', 'peak_mib'):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {current[metric]:.2f} vs {previous[metric]:.2f} baseline")
+    return regressions
+
+
+def record_manifest(scraper: UKCateringScraper, manifest: Dict[str, Any]):
+    for path, entry in manifest.items():
+        with open(os.path.join(FIXTURE_DIR, path), encoding='utf-8') as f:
+            data = scraper.extract_page(f.read(), entry['site'])
+        entry['expected'] = {field: data.get(field) for field in CHECKED_FIELDS}
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    print(f"Recorded expected output for {len(manifest)} pages in {MANIFEST_PATH}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='UK extractor benchmark over recorded fixtures')
+    parser.add_argument('--iterations', type=int, default=20, help='Passes over the corpus to time')
+    parser.add_argument('--site', choices=['jjfoodservice', 'atoz_catering', 'amazon_uk'])
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Write these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown or memory growth before reporting a regression (fraction)')
+    parser.add_argument('--record', action='store_true', help='Accept current extractor output as expected')
+    args = parser.parse_args()
+
+    # Extractors log every hit at INFO; keep the benchmark about extraction, not log formatting
+    logging.basicConfig(level=logging.WARNING)
+    warnings.simplefilter('ignore', FutureWarning)
+
+    with open(MANIFEST_PATH) as f:
+        manifest = json.load(f)
+    scraper = UKCateringScraper(Config())
+
+    if args.record:
+        record_manifest(scraper, manifest)
+        return
+
+    corpus = load_corpus(manifest, args.site)
+    mismatches = check_results(scraper, corpus)
+
+    time_pages(scraper, corpus, 1)  # warm-up: imports, selector compilation, caches
+    FAST_PATH_STATS.reset()
+    scraper.selector_stats.reset_pages()
+    timings = time_pages(scraper, corpus, args.iterations)
+    fast_path = FAST_PATH_STATS.report()
+    evaluations = scraper.selector_stats.report()
+    if evaluations:
+        pages = sum(row['pages'] for row in evaluations.values())
+        evaluations['all'] = {'pages': pages, 'evaluations_per_page': sum(
+            row['pages'] * row['evaluations_per_page'] for row in evaluations.values()) / pages}
+    peaks = peak_memory(scraper, corpus)
+
+    results = {site: summarise(latencies, peaks[site]) for site, latencies in sorted(timings.items())}
+    results['all'] = summarise([t for latencies in timings.values() for t in latencies], max(peaks.values()))
+
+    print(f"{'site':<15} {'pages':>6} {'pages/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'peak MiB':>9} {'sel/page':>9}")
+    for name, row in results.items():
+        per_page = evaluations.get(name, {}).get('evaluations_per_page')
+        print(f"{name:<15} {row['pages']:>6} {row['pages_per_sec']:>9.1f} {row['p50_ms']:>8.2f} "
+              f"{row['p99_ms']:>8.2f} {row['peak_mib']:>9.2f} "
+              f"{'' if per_page is None else f'{per_page:.1f}':>9}")
+
+    if fast_path:
+        print(f"\n{'fast path':<15} {'tried':>6} {'hits':>6} {'hit rate':>9} {'fast ms':>8} "
+              f"{'cascade ms':>11} {'saved s':>8}")
+        for name, row in fast_path.items():
+            print(f"{name:<15} {row['pages']:>6} {row['hits']:>6} {row['hit_rate']:>9.0%} {row['fast_ms']:>8.3f} "
+                  f"{row['fallback_ms']:>11.2f} {row['saved_seconds']:>8.2f}")
+
+    if args.site in (None, 'amazon_uk'):
+        offers = time_offer_matching(scraper, args.iterations)
+        print(f"\nspecial offers on a long Amazon page: single pass {offers['single_pass_ms']:.1f} ms, "
+              f"per selector {offers['per_selector_ms']:.1f} ms "
+              f"({offers['per_selector_ms'] / offers['single_pass_ms']:.1f}x)")
+
+    failed = False
+    if mismatches:
+        failed = True
+        print(f"\n{len(mismatches)} extraction mismatches against the manifest:")
+        for line in mismatches:
+            print(f"  {line}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            failed = True
+            print(f"\nRegressions beyond {args.tolerance:.0%} of {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+        else:
+            print(f"\nNo regressions against {args.baseline}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
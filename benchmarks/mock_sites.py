@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the supplier sites, serving the recorded fixture pages
+
+Product pages are served at /<site>/product/<id>, cycling through that site's
+fixtures in benchmarks/fixtures; recorded JSON API responses from
+benchmarks/fixtures/api/<site> are served at /<site>/api/products/<id>. Latency,
+random 403s and a per-site rate limit (429 with Retry-After) can be configured
+to exercise the scraper's retry paths.
+GET /_stats returns request counters and POST /_stats resets them.
+
+Usage:
+    python benchmarks/mock_sites.py --port 8080 --latency 0.05 --jitter 0.05
+    python benchmarks/mock_sites.py --forbidden-rate 0.02 --rate-limit 20
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from aiohttp import web
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture_pages() -> Dict[str, list]:
+    with open(os.path.join(FIXTURE_DIR, 'manifest.json')) as f:
+        manifest = json.load(f)
+    pages = {}
+    for path, entry in sorted(manifest.items()):
+        with open(os.path.join(FIXTURE_DIR, path), encoding='utf-8') as f:
+            pages.setdefault(entry['site'], []).append(f.read())
+    return pages
+
+
+def load_api_fixtures() -> Dict[str, list]:
+    api_dir = os.path.join(FIXTURE_DIR, 'api')
+    responses = {}
+    for site in sorted(os.listdir(api_dir)) if os.path.isdir(api_dir) else []:
+        for name in sorted(os.listdir(os.path.join(api_dir, site))):
+            with open(os.path.join(api_dir, site, name), encoding='utf-8') as f:
+                responses.setdefault(site, []).append(f.read())
+    return responses
+
+
+class MockSiteServer:
+    """aiohttp application that imitates the supplier sites' behaviour under load."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, forbidden_rate: float = 0.0,
+                 rate_limit: Optional[float] = None, retry_after: int = 1, seed: int = 42):
+        self.latency = latency
+        self.jitter = jitter
+        self.forbidden_rate = forbidden_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.pages = load_fixture_pages()
+        self.api_responses = load_api_fixtures()
+        self._rng = random.Random(seed)
+        self._buckets = {}
+        self.reset()
+
+    def reset(self):
+        self.stats = {site: {'requests': 0, 'ok': 0, 'forbidden': 0, 'rate_limited': 0, 'not_found': 0, 'api': 0}
+                      for site in self.pages}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _take_token(self, site: str) -> bool:
+        """Token bucket per site holding up to one second of requests."""
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(site, (self.rate_limit, now))
+        tokens = min(self.rate_limit, tokens + (now - updated) * self.rate_limit)
+        if tokens < 1:
+            self._buckets[site] = (tokens, now)
+            return False
+        self._buckets[site] = (tokens - 1, now)
+        return True
+
+    async def product_page(self, request: web.Request) -> web.Response:
+        site = request.match_info['site']
+        if site not in self.pages:
+            return web.Response(status=404)
+        return await self._respond(request, site, self.pages[site], 'text/html')
+
+    async def api_product(self, request: web.Request) -> web.Response:
+        site = request.match_info['site']
+        if site not in self.api_responses:
+            return web.Response(status=404)
+        self.stats[site]['api'] += 1
+        return await self._respond(request, site, self.api_responses[site], 'application/json')
+
+    async def _respond(self, request: web.Request, site: str, bodies: list, content_type: str) -> web.Response:
+        stats = self.stats[site]
+        stats['requests'] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency or self.jitter:
+                await asyncio.sleep(self.latency + self._rng.uniform(0, self.jitter))
+
+            if not self._take_token(site):
+                stats['rate_limited'] += 1
+                return web.Response(status=429, headers={'Retry-After': str(self.retry_after)})
+            if self._rng.random() < self.forbidden_rate:
+                stats['forbidden'] += 1
+                return web.Response(status=403, text='Access denied')
+
+            stats['ok'] += 1
+            body = bodies[int(request.match_info['product_id']) % len(bodies)]
+            return web.Response(text=body, content_type=content_type)
+        finally:
+            self.in_flight -= 1
+
+    async def stats_handler(self, request: web.Request) -> web.Response:
+        if request.method == 'POST':
+            self.reset()
+        return web.json_response({'sites': self.stats, 'max_in_flight': self.max_in_flight})
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/{site}/product/{product_id:\\d+}', self.product_page)
+        app.router.add_get('/{site}/api/products/{product_id:\\d+}', self.api_product)
+        app.router.add_route('*', '/_stats', self.stats_handler)
+        return app
+
+
+def _serve(port: int, options: Dict[str, Any], ready):
+    async def start():
+        runner = web.AppRunner(MockSiteServer(**options).make_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', port)
+        await site.start()
+        ready.send(site._server.sockets[0].getsockname()[1])
+        await asyncio.Event().wait()
+
+    asyncio.run(start())
+
+
+def start_in_process(**options) -> Tuple[multiprocessing.Process, str]:
+    """Run a MockSiteServer in a child process so it does not compete with the scraper's event loop."""
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(0, options, child), daemon=True)
+    process.start()
+    if not parent.poll(30):
+        process.terminate()
+        raise RuntimeError("Mock site server did not start")
+    return process, f'http://127.0.0.1:{parent.recv()}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock supplier sites serving fixture pages')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='Base response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random delay up to this many seconds')
+    parser.add_argument('--forbidden-rate', type=float, default=0.0, help='Fraction of requests answered 403')
+    parser.add_argument('--rate-limit', type=float, help='Requests per second per site before answering 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with 429s')
+    args = parser.parse_args()
+
+    server = MockSiteServer(args.latency, args.jitter, args.forbidden_rate, args.rate_limit, args.retry_after)
+    print(f"Serving {', '.join(server.pages)} on http://127.0.0.1:{args.port}/<site>/product/<id>")
+    web.run_app(server.make_app(), host='127.0.0.1', port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
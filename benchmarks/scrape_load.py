@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+End-to-end scrape load test against the local mock supplier sites
+
+Runs ScraperManager.scrape_all_products over synthetic catalogues whose URLs
+point at benchmarks/mock_sites.py (started in a child process). Reports
+throughput, result outcomes, what the server saw (403s, 429s, retries,
+concurrency) and peak memory for each catalogue size.
+
+Usage:
+    python benchmarks/scrape_load.py
+    python benchmarks/scrape_load.py --products 10 100 1000 10000 --latency 0.05 --jitter 0.05
+    python benchmarks/scrape_load.py --forbidden-rate 0.02 --rate-limit 20 --retry-attempts 2
+    python benchmarks/scrape_load.py --adaptive --rate-limit 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import sys
+import os
+import time
+import urllib.request
+import warnings
+from collections import Counter
+from typing import Dict, List, Any
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_sites import start_in_process
+from src.config import Config
+from src.scraper import FETCH_FAILED
+from src.scraper_manager import ScraperManager
+
+SITES = ['jjfoodservice', 'atoz_catering', 'amazon_uk']
+
+
+def make_catalogue(count: int, base_url: str, sites: List[str]) -> List[Dict[str, Any]]:
+    return [{
+        'id': product_id,
+        'name': f'Load test product {product_id}',
+        'urls': {site: f'{base_url}/{site}/product/{product_id}' for site in sites}
+    } for product_id in range(1, count + 1)]
+
+
+def server_stats(base_url: str, reset: bool = False) -> Dict[str, Any]:
+    request = urllib.request.Request(f'{base_url}/_stats', method='POST' if reset else 'GET')
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+def outcome(result: Dict[str, Any]) -> str:
+    if result.get('success'):
+        return 'ok'
+    if result.get('error') == FETCH_FAILED:
+        return 'fetch_failed'
+    return 'no_price'
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def run_size(config: Config, base_url: str, count: int, sites: List[str]) -> Dict[str, Any]:
+    catalogue = make_catalogue(count, base_url, sites)
+    server_stats(base_url, reset=True)
+
+    started = time.perf_counter()
+    results = asyncio.run(ScraperManager(config).scrape_all_products(catalogue))
+    elapsed = time.perf_counter() - started
+
+    outcomes = Counter(outcome(result) for site_results in results.values() for result in site_results.values())
+    stats = server_stats(base_url)
+    requests = sum(site['requests'] for site in stats['sites'].values())
+    jobs = sum(outcomes.values())
+    return {
+        'products': count,
+        'jobs': jobs,
+        'elapsed': elapsed,
+        'jobs_per_sec': jobs / elapsed if elapsed else 0.0,
+        'outcomes': outcomes,
+        'requests': requests,
+        'retries': requests - jobs,
+        'forbidden': sum(site['forbidden'] for site in stats['sites'].values()),
+        'rate_limited': sum(site['rate_limited'] for site in stats['sites'].values()),
+        'max_in_flight': stats['max_in_flight'],
+        'peak_rss_mib': peak_rss_mib()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scrape load test against local mock sites')
+    parser.add_argument('--products', type=int, nargs='+', default=[10, 100, 1000],
+                        help='Catalogue sizes to run, smallest first (up to 10000)')
+    parser.add_argument('--sites', nargs='+', choices=SITES, default=SITES)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--forbidden-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, help='Per-site requests per second allowed by the mock')
+    parser.add_argument('--delay', type=float, default=0.0, help='scraping.delay_between_requests for the run')
+    parser.add_argument('--max-concurrent', type=int, help='scraping.max_concurrent_requests (default from config)')
+    parser.add_argument('--retry-attempts', type=int, help='scraping.retry_attempts (default from config)')
+    parser.add_argument('--adaptive', action='store_true', help='Enable adaptive per-site concurrency')
+    parser.add_argument('--adaptive-max', type=int, help='Largest per-site window with --adaptive')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Stream pages and stop reading once the site markers are found')
+    args = parser.parse_args()
+
+    # Failures are counted in the table; per-request error logs would drown it
+    logging.basicConfig(level=logging.CRITICAL)
+    warnings.simplefilter('ignore', FutureWarning)
+
+    config = Config()
+    scraping = config._config.setdefault('scraping', {})
+    scraping['delay_between_requests'] = args.delay
+    if args.max_concurrent:
+        scraping['max_concurrent_requests'] = args.max_concurrent
+    if args.retry_attempts:
+        scraping['retry_attempts'] = args.retry_attempts
+    if args.adaptive:
+        adaptive = scraping.setdefault('adaptive_concurrency', {})
+        adaptive['enabled'] = True
+        if args.adaptive_max:
+            adaptive['max'] = args.adaptive_max
+    if args.streaming:
+        scraping.setdefault('streaming', {})['enabled'] = True
+
+    process, base_url = start_in_process(latency=args.latency, jitter=args.jitter,
+                                         forbidden_rate=args.forbidden_rate, rate_limit=args.rate_limit)
+    print(f"Mock sites on {base_url}: latency {args.latency}s+{args.jitter}s, "
+          f"403 rate {args.forbidden_rate:.0%}, rate limit {args.rate_limit or 'none'}, "
+          f"concurrency {'adaptive' if args.adaptive else config.max_concurrent_requests}, "
+          f"retries {config.retry_attempts}")
+    print(f"{'products':>8} {'jobs':>6} {'secs':>8} {'jobs/s':>7} {'ok':>6} {'no price':>8} {'failed':>6} "
+          f"{'requests':>8} {'retries':>7} {'403':>5} {'429':>5} {'conc':>4} {'RSS MiB':>8}")
+    try:
+        for count in sorted(args.products):
+            row = run_size(config, base_url, count, args.sites)
+            print(f"{row['products']:>8} {row['jobs']:>6} {row['elapsed']:>8.1f} {row['jobs_per_sec']:>7.1f} "
+                  f"{row['outcomes']['ok']:>6} {row['outcomes']['no_price']:>8} {row['outcomes']['fetch_failed']:>6} "
+                  f"{row['requests']:>8} {row['retries']:>7} {row['forbidden']:>5} {row['rate_limited']:>5} "
+                  f"{row['max_in_flight']:>4} {row['peak_rss_mib']:>8.1f}")
+    finally:
+        process.terminate()
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Generate a large price tracker database with realistic synthetic price history
+
+Each product is sold by one to three of the UK sites at a site-specific markup.
+Prices follow small day-to-day moves, occasional permanent price rises,
+week-long promotions and the odd out-of-stock spell, and some scrapes are
+missing. The schema comes from DatabaseManager, so indexes and triggers
+match a real install.
+
+Usage:
+    python benchmarks/synthetic_db.py --products 1000 --years 1 --output /tmp/price_tracker_1k.db
+    python benchmarks/synthetic_db.py --products 10000 --years 3 --scrapes-per-day 4 --output big.db
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database import DatabaseManager
+
+SITES = ['jjfoodservice', 'atoz_catering', 'amazon_uk']
+SITE_URLS = {
+    'jjfoodservice': 'https://www.jjfoodservice.com/product/{}',
+    'atoz_catering': 'https://www.atoz-catering.co.uk/products/product/{}',
+    'amazon_uk': 'https://www.amazon.co.uk/dp/B0{:08d}',
+}
+WORDS = ('Chicken Breast Fillets Frozen Halal Basmati Rice Sunflower Oil Vegetable Mozzarella Cheddar '
+         'Grated Catering Tomato Ketchup Mayonnaise Chips Chunky Peri Lamb Doner Flour Sugar Napkins').split()
+PACKS = ['1kg', '2.5kg', '5kg', '10kg', '20L', '12x400g', '6x2.5kg', '500 pack']
+BATCH_ROWS = 200_000
+
+
+def simulate_series(rng: np.random.Generator, base: float, steps: int) -> tuple:
+    """Prices and availability for one (product, site) series of ``steps`` scrapes."""
+    # Small daily noise around a level that only ever steps up (supplier price rises)
+    rises = rng.random(steps) < 1 / 90
+    level = base * np.cumprod(np.where(rises, 1 + rng.uniform(0.02, 0.12, steps), 1.0))
+    noise = 1 + rng.normal(0, 0.01, steps)
+
+    # Promotions: 10-30% off for about a week, a few times a year
+    promo = np.ones(steps)
+    for start in np.flatnonzero(rng.random(steps) < 1 / 60):
+        promo[start:start + rng.integers(3, 10)] = 1 - rng.uniform(0.1, 0.3)
+
+    prices = np.round(np.clip(level * noise * promo, 0.5, None), 2)
+
+    available = np.ones(steps, dtype=bool)
+    for start in np.flatnonzero(rng.random(steps) < 1 / 120):
+        available[start:start + rng.integers(1, 5)] = False
+    return prices, available
+
+
+def generate(db_path: str, products: int, years: float, scrapes_per_day: int = 1,
+             seed: int = 42, missing_rate: float = 0.03) -> dict:
+    """Create ``db_path`` and fill it; returns row counts."""
+    if os.path.exists(db_path):
+        raise FileExistsError(f"{db_path} already exists")
+    rng = np.random.default_rng(seed)
+    DatabaseManager(db_path)  # schema, indexes and triggers
+
+    steps = int(years * 365 * scrapes_per_day)
+    interval = timedelta(days=1) / scrapes_per_day
+    end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    start = end - interval * (steps - 1)
+    timestamps = [str(start + interval * i) for i in range(steps)]
+    created_at = str(start - timedelta(days=1))
+
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA synchronous = OFF')
+    # Bulk load without per-row trigger and index maintenance; DatabaseManager recreates them below
+    indexes = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'price_history' "
+                           "AND sql IS NOT NULL").fetchall()
+    for name, _ in indexes:
+        conn.execute(f'DROP INDEX {name}')
+    for event in ('insert', 'update', 'delete'):
+        for table in DatabaseManager.VERSIONED_TABLES:
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_version_{event}')
+
+    history_rows = 0
+    batch = []
+    for product_id in range(1, products + 1):
+        name = ' '.join(rng.choice(WORDS, size=rng.integers(2, 5))) + ' ' + rng.choice(PACKS)
+        sites = [site for site in SITES if rng.random() < 0.7] or [SITES[rng.integers(len(SITES))]]
+        base = float(np.clip(rng.lognormal(2.5, 0.6), 1.5, 250))
+        target = round(base * 0.9, 2) if rng.random() < 0.3 else None
+        urls = {site: SITE_URLS[site].format(product_id) for site in sites}
+        conn.execute('''
+            INSERT INTO products (id, name, description, target_price, urls, created_at, updated_at, active)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (product_id, name, f'Synthetic product {product_id}', target, json.dumps(urls),
+              created_at, created_at, 1 if rng.random() < 0.97 else 0))
+
+        for site in sites:
+            prices, available = simulate_series(rng, base * rng.uniform(0.9, 1.15), steps)
+            scraped = rng.random(steps) >= missing_rate
+            for i in np.flatnonzero(scraped):
+                batch.append((product_id, site, float(prices[i]), 'GBP', bool(available[i]), timestamps[i]))
+            if len(batch) >= BATCH_ROWS:
+                history_rows += _flush(conn, batch)
+
+    history_rows += _flush(conn, batch)
+    conn.execute("UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP")
+    conn.commit()
+    conn.close()
+
+    # Recreate the dropped indexes and triggers, then refresh planner statistics
+    DatabaseManager(db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('ANALYZE')
+    return {'products': products, 'price_history': history_rows, 'scrapes_per_series': steps}
+
+
+def _flush(conn: sqlite3.Connection, batch: list) -> int:
+    conn.executemany('''
+        INSERT INTO price_history (product_id, site_name, price, currency, availability, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', batch)
+    count = len(batch)
+    batch.clear()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic price tracker database')
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--years', type=float, default=1.0)
+    parser.add_argument('--scrapes-per-day', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', required=True, help='Path of the database to create')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(args.output, args.products, args.years, args.scrapes_per_day, args.seed)
+    size_mib = os.path.getsize(args.output) / 2 ** 20
+    print(f"Created {args.output}: {counts['products']} products, {counts['price_history']:,} price rows "
+          f"({size_mib:.0f} MiB) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,20 @@ Tracks product prices across multiple e-commerce sites
 import asyncio
 import logging
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import argparse
 
 from src.scraper_manager import ScraperManager
 from src.database import DatabaseManager
 from src.config import Config
 from src.notification import NotificationManager
+from src.scrape_recorder import scrape_and_record
+from src.scrape_worker import ScrapeWorker, enqueue_due_jobs
+from src.job_queue import ScrapeJobQueue
+from src.price_analytics import analyse_catalogue
+from src.metrics import write_textfile_from_env
+from src import metrics, tracing
+from src.profiling import ProfileSession, PROFILE_MODES
 from src.web_ui import create_app
 
 # Configure logging
@@ -28,61 +35,89 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-async def run_scraper():
-    """Run the price scraping process."""
+async def run_scraper(trace_path: Optional[str] = None, scrape_all: bool = False):
+    """Run the price scraping process, writing a Chrome trace to ``trace_path`` if given.
+    
+    With scheduling enabled only the due product/site jobs are scraped, unless ``scrape_all`` is set.
+    """
     try:
         config = Config()
         db_manager = DatabaseManager(config.database_path)
-        scraper_manager = ScraperManager(config)
+        scraper_manager = ScraperManager(config, db_manager)
         notification_manager = NotificationManager(config)
         
         logger.info("Starting price tracking session")
         
-        # Load products from database
-        products = db_manager.get_all_products()
-        if not products:
-            logger.warning("No products found in database. Add products first.")
+        trace_path = tracing.start_from_env(path=trace_path)
+        summary = await scrape_and_record(config, db_manager, scraper_manager, notification_manager,
+                                          scrape_all=scrape_all)
+        await notification_manager.close()
+        tracing.export_and_stop(trace_path)
+        if not summary['products']:
             return
         
-        # Scrape prices for all products
-        results = await scraper_manager.scrape_all_products(products)
-        
-        # Process results and save to database
-        price_alerts = []
-        for product_id, site_prices in results.items():
-            for site_name, price_data in site_prices.items():
-                if price_data['success']:
-                    # Save price to database
-                    db_manager.save_price_history(
-                        product_id=product_id,
-                        site_name=site_name,
-                        price=price_data['price'],
-                        currency=price_data.get('currency', 'USD'),
-                        availability=price_data.get('availability', True),
-                        timestamp=datetime.now()
-                    )
-                    
-                    # Check for price alerts
-                    product = db_manager.get_product(product_id)
-                    if product and price_data['price'] <= product['target_price']:
-                        price_alerts.append({
-                            'product': product,
-                            'site': site_name,
-                            'current_price': price_data['price'],
-                            'target_price': product['target_price']
-                        })
-        
-        # Send notifications for price alerts
-        if price_alerts:
-            await notification_manager.send_price_alerts(price_alerts)
+        # Scrape runs are separate processes; hand their metrics to node_exporter
+        metrics_file = write_textfile_from_env()
+        if metrics_file:
+            logger.info(f"Metrics written to {metrics_file}")
         
-        logger.info(f"Scraping completed. Found {len(price_alerts)} price alerts.")
+        logger.info(f"Scraping completed. {len(summary['alerts'])} new price alerts, "
+                    f"{summary['notified']} notified.")
         
     except Exception as e:
         logger.error(f"Error during scraping: {e}")
         raise
 
 
+async def run_worker(worker_id: Optional[str] = None, exit_when_empty: bool = False):
+    """Scrape jobs from the shared queue until stopped, or until it is empty with ``exit_when_empty``."""
+    config = Config()
+    db_manager = DatabaseManager(config.database_path)
+    notification_manager = NotificationManager(config)
+    try:
+        await ScrapeWorker(config, db_manager, worker_id).run(exit_when_empty, notification_manager)
+    finally:
+        await notification_manager.close()
+
+
+def run_coordinator(scrape_all: bool = False):
+    """Queue the due scrape jobs for workers to pick up."""
+    config = Config()
+    db_manager = DatabaseManager(config.database_path)
+    added = enqueue_due_jobs(config, db_manager, scrape_all)
+    counts = ScrapeJobQueue(db_manager, config.worker_config).counts()
+    print(f"Queued {added} jobs. Queue: {counts['pending']} pending, {counts['leased']} leased, "
+          f"{counts['done']} done, {counts['failed']} failed")
+
+
+def run_analysis(days: int = 90):
+    """Print each product/site series' latest price, change and robust z-score, outliers first."""
+    config = Config()
+    db_manager = DatabaseManager(config.database_path)
+    anomaly_config = config.anomaly_config
+    report = analyse_catalogue(db_manager, days=days, window=int(anomaly_config.get('window', 10)),
+                               z_threshold=float(anomaly_config.get('z_threshold', 6.0)))
+    if not report:
+        print(f"No prices in the last {days} days.")
+        return report
+    
+    names = {product['id']: product['name'] for product in db_manager.get_all_products()}
+    report.sort(key=lambda row: (not row['outlier'], -abs(row['change_percent'] or 0)))
+    
+    print(f"📈 Price changes over the last {days} days ({len(report)} series, "
+          f"{sum(row['outlier'] for row in report)} outliers)\n")
+    print(f"{'product':30} {'site':15} {'latest':>8} {'change':>8} {'median':>8} {'z':>7}  obs")
+    for row in report:
+        change = f"{row['change_percent']:+.1f}%" if row['change_percent'] is not None else '-'
+        median = f"£{row['rolling_median']:.2f}" if row['rolling_median'] is not None else '-'
+        z = f"{row['z_score']:.1f}" if row['z_score'] is not None else '-'
+        flag = '  ⚠️' if row['outlier'] else ''
+        latest = f"£{row['latest_price']:.2f}"
+        print(f"{names.get(row['product_id'], row['product_id'])!s:30.30} {row['site_name']:15} "
+              f"{latest:>8} {change:>8} {median:>8} {z:>7}  {row['observations']}{flag}")
+    return report
+
+
 def run_shopping_lists():
     """Generate and optionally send daily shopping lists."""
     from src.config import Config
@@ -93,18 +128,21 @@ def run_shopping_lists():
     config = Config()
     db_manager = DatabaseManager(config.database_path)
     notification_manager = NotificationManager(config)
-    shopping_generator = AutoShoppingListGenerator(db_manager, notification_manager)
+    shopping_generator = AutoShoppingListGenerator(db_manager, notification_manager,
+                                                   delivery_rules=config.delivery_rules)
     
     print("🛒 Generating automated shopping lists...")
     
     # Generate shopping lists
     shopping_lists = shopping_generator.generate_shopping_lists()
-    summary = shopping_generator.get_summary_stats()
+    summary = shopping_generator.get_summary_stats(shopping_lists)
     
     # Display results
     print(f"\n📊 Summary:")
     print(f"  • {summary['total_products']} products tracked")
     print(f"  • £{summary['total_cost']:.2f} total cost")
+    if summary['total_delivery']:
+        print(f"  • £{summary['total_delivery']:.2f} delivery charges")
     print(f"  • £{summary['total_savings']:.2f} total savings")
     print(f"  • {summary['store_count']} stores involved")
     
@@ -124,7 +162,85 @@ def run_shopping_lists():
     return shopping_lists
 
 
-def run_web_ui():
+def check_startup(config: Config) -> bool:
+    """Verify the database and templates are usable before serving requests."""
+    import os
+    
+    if config.has_config_error():
+        # The web UI serves a setup page in this case, so it is not fatal
+        logger.warning(f"Configuration problem: {config.get_config_error()}")
+        return True
+    
+    try:
+        db_manager = DatabaseManager(config.database_path)
+        with db_manager.get_connection() as conn:
+            conn.execute('SELECT 1')
+    except Exception as e:
+        logger.error(f"Startup check failed: database {config.database_path} is not usable: {e}")
+        return False
+    
+    template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+    if not os.path.isdir(template_dir):
+        logger.error(f"Startup check failed: templates directory not found at {template_dir}")
+        return False
+    
+    logger.info("Startup check passed")
+    return True
+
+
+def run_production_server(host: str, port: int, workers: int, threads: int):
+    """Serve the web UI with gunicorn using threaded worker processes."""
+    from gunicorn.app.base import BaseApplication
+    
+    class ProductionServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            # Each worker builds its own app so DB connections are never shared across forks
+            return create_app()
+    
+    import os
+    options = {
+        'bind': f"{host}:{port}",
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread',
+        # Webhook-triggered scrapes can hold a request open for minutes
+        'timeout': int(os.environ.get('WEB_TIMEOUT', 600)),
+        # Let in-flight requests finish on SIGTERM before workers are killed
+        'graceful_timeout': int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30)),
+        'keepalive': 5,
+        'accesslog': '-',
+        'errorlog': '-',
+    }
+    
+    logger.info(f"Starting Price Tracker production server on {host}:{port} "
+                f"({workers} workers x {threads} threads)")
+    ProductionServer(options).run()
+
+
+def production_concurrency(workers: int, threads: int) -> Tuple[int, int]:
+    """Worker processes and threads to run, keeping to one process while /metrics is served.
+    
+    Metrics live in each process, so with several workers each /metrics scrape would
+    report whichever worker answered. The requested capacity is kept as threads instead.
+    """
+    if workers > 1 and metrics.endpoint_enabled():
+        logger.warning(f"/metrics needs a single worker process; running 1 worker x {workers * threads} "
+                       f"threads instead of {workers} x {threads}. Set METRICS_ENABLED=false to run "
+                       f"several workers without /metrics")
+        return 1, workers * threads
+    return workers, threads
+
+
+def run_web_ui(server: Optional[str] = None, workers: Optional[int] = None,
+               threads: Optional[int] = None):
     """Run the web UI for managing products and viewing price history."""
     import os
     
@@ -133,6 +249,22 @@ def run_web_ui():
     port = int(os.environ.get('FLASK_PORT', 5000))
     debug = os.environ.get('FLASK_ENV', 'production').lower() != 'production'
     
+    if server is None:
+        server = os.environ.get('WEB_SERVER', 'development' if debug else 'production')
+    
+    if not check_startup(Config()):
+        raise SystemExit(1)
+    
+    if server == 'production':
+        workers = workers or int(os.environ.get('WEB_WORKERS', min(2 * (os.cpu_count() or 1) + 1, 8)))
+        threads = threads or int(os.environ.get('WEB_THREADS', 4))
+        workers, threads = production_concurrency(workers, threads)
+        try:
+            run_production_server(host, port, workers, threads)
+            return
+        except ImportError:
+            logger.warning("gunicorn is not installed; falling back to the development server")
+    
     app = create_app()
     logger.info(f"Starting Price Tracker web server on {host}:{port}")
     app.run(host=host, port=port, debug=debug)
@@ -140,18 +272,57 @@ def run_web_ui():
 
 def main():
     parser = argparse.ArgumentParser(description='Price Tracker')
-    parser.add_argument('--mode', choices=['scrape', 'web', 'shopping'], default='web',
-                       help='Run mode: scrape prices, start web UI, or generate shopping lists')
+    parser.add_argument('--mode', choices=['scrape', 'web', 'shopping', 'worker', 'coordinator', 'analyse'],
+                       default='web',
+                       help='Run mode: scrape prices, start web UI, generate shopping lists, '
+                            'scrape queued jobs, queue the due jobs for workers, or report price changes')
     parser.add_argument('--config', help='Path to config file')
+    parser.add_argument('--server', choices=['development', 'production'],
+                       help='Web server to use (default: production unless FLASK_ENV is set otherwise)')
+    parser.add_argument('--workers', type=int,
+                       help='Number of web worker processes (production server; one while /metrics is served)')
+    parser.add_argument('--threads', type=int, help='Number of threads per web worker (production server)')
+    parser.add_argument('--trace', metavar='FILE',
+                       help='Write a Chrome trace of the scrape run to FILE ({run_id} is filled in)')
+    parser.add_argument('--all', action='store_true',
+                       help='Scrape every product and site, ignoring the schedule (scrape and coordinator modes)')
+    parser.add_argument('--worker-id', help='Name for this worker in the job queue (default: host-pid)')
+    parser.add_argument('--exit-when-empty', action='store_true',
+                       help='Stop the worker once the job queue is empty instead of polling')
+    parser.add_argument('--days', type=int, default=90, help='History to analyse in days (analyse mode)')
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=PROFILE_MODES,
+                       help='Profile a scrape or shopping run with cProfile (default) or the sampling profiler')
+    parser.add_argument('--profile-dir', default='profiles', help='Directory for profile output')
     
     args = parser.parse_args()
     
+    if args.profile and args.mode == 'web':
+        parser.error('--profile applies to scrape and shopping runs; '
+                     'set PROFILE_ADMIN_TOKEN to profile single web requests')
+    
+    if args.profile:
+        session = ProfileSession(args.profile, args.profile_dir, label=args.mode)
+        logger.info(f"Profiling {args.mode} run {session.run_id} with {args.profile}")
+        with session:
+            run_mode(args)
+        print(session.summary())
+    else:
+        run_mode(args)
+
+
+def run_mode(args):
     if args.mode == 'scrape':
-        asyncio.run(run_scraper())
+        asyncio.run(run_scraper(trace_path=args.trace, scrape_all=args.all))
+    elif args.mode == 'worker':
+        asyncio.run(run_worker(args.worker_id, args.exit_when_empty))
+    elif args.mode == 'coordinator':
+        run_coordinator(scrape_all=args.all)
     elif args.mode == 'shopping':
         run_shopping_lists()
+    elif args.mode == 'analyse':
+        run_analysis(days=args.days)
     else:
-        run_web_ui()
+        run_web_ui(server=args.server, workers=args.workers, threads=args.threads)
 
 
 if __name__ == "__main__":
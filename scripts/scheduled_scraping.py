@@ -15,6 +15,9 @@ from src.config import Config
 from src.database import DatabaseManager
 from src.scraper_manager import ScraperManager
 from src.notification import NotificationManager
+from src.scrape_recorder import scrape_and_record
+from src.metrics import write_textfile_from_env
+from src import tracing
 
 # Configure logging
 logging.basicConfig(
@@ -36,63 +39,24 @@ async def run_scheduled_scraping():
         # Initialize components
         config = Config()
         db_manager = DatabaseManager(config.database_path)
-        scraper_manager = ScraperManager(config)
+        scraper_manager = ScraperManager(config, db_manager)
         notification_manager = NotificationManager(config)
         
-        # Get all products
-        products = db_manager.get_all_products()
-        if not products:
-            logger.warning("No products found in database")
+        # Only the product/site jobs whose next-due time has come are scraped
+        trace_path = tracing.start_from_env()
+        summary = await scrape_and_record(config, db_manager, scraper_manager, notification_manager)
+        await notification_manager.close()
+        tracing.export_and_stop(trace_path)
+        if not summary['products']:
             return
         
-        logger.info(f"Found {len(products)} products to scrape")
+        # Scrape runs are separate processes; hand their metrics to node_exporter
+        metrics_file = write_textfile_from_env()
+        if metrics_file:
+            logger.info(f"Metrics written to {metrics_file}")
         
-        # Scrape all products
-        results = await scraper_manager.scrape_all_products(products)
-        
-        # Process results
-        total_success = 0
-        total_failed = 0
-        price_alerts = []
-        
-        for product_id, site_results in results.items():
-            product = db_manager.get_product(product_id)
-            
-            for site_name, result in site_results.items():
-                if result['success']:
-                    total_success += 1
-                    
-                    # Save to database
-                    db_manager.save_price_history(
-                        product_id=product_id,
-                        site_name=site_name,
-                        price=result['price'],
-                        currency=result.get('currency', 'USD'),
-                        availability=result.get('availability', True),
-                        timestamp=datetime.now()
-                    )
-                    
-                    # Check for price alerts
-                    if product and product['target_price'] and result['price'] <= product['target_price']:
-                        price_alerts.append({
-                            'product': product,
-                            'site': site_name,
-                            'current_price': result['price'],
-                            'target_price': product['target_price']
-                        })
-                        
-                        logger.info(f"Price alert: {product['name']} on {site_name} - ${result['price']:.2f}")
-                else:
-                    total_failed += 1
-                    logger.error(f"Failed to scrape {product['name']} on {site_name}: {result.get('error', 'Unknown error')}")
-        
-        # Send notifications for price alerts
-        if price_alerts:
-            await notification_manager.send_price_alerts(price_alerts)
-            logger.info(f"Sent notifications for {len(price_alerts)} price alerts")
-        
-        logger.info(f"Scraping completed: {total_success} successful, {total_failed} failed")
-        logger.info(f"Found {len(price_alerts)} price alerts")
+        logger.info(f"Scraping completed: {summary['successful']} successful, {summary['failed']} failed")
+        logger.info(f"Found {len(summary['alerts'])} new price alerts, sent {summary['notified']} notifications")
         
     except Exception as e:
         logger.error(f"Error during scheduled scraping: {e}", exc_info=True)
@@ -0,0 +1,221 @@
+"""
+Stateful price alerts with hysteresis, debounce and digest batching
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from .database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+class AlertEngine:
+    """Decides when a price alert should fire, using the price_alerts table as state.
+
+    Each row in price_alerts is one alert episode for a product on a site. An
+    episode opens when the price crosses to or below the target and stays open
+    (without re-alerting) while the price remains low. It clears only once the
+    price rises more than ``hysteresis_percent`` above the target, so a price
+    hovering around the target does not flap. After clearing, a new episode can
+    open no sooner than ``rearm_minutes`` later, and only once the price has been
+    at or below target for ``confirm_observations`` consecutive scrapes.
+
+    Opened episodes are queued (``notified = 0``) and sent together by dispatch(),
+    at most once per ``digest_window_minutes``. A dispatch claims the rows it sends
+    (``notified = 2``) before sending, so overlapping dispatches, from streamed
+    results or from other worker processes, never send the same alert twice.
+    """
+
+    # A claim older than this is taken to belong to a dispatch that died mid-send
+    CLAIM_TIMEOUT = timedelta(minutes=10)
+
+    def __init__(self, db_manager: DatabaseManager, alert_config: Optional[Dict[str, Any]] = None):
+        alert_config = alert_config or {}
+        self.db_manager = db_manager
+        self.hysteresis = float(alert_config.get('hysteresis_percent', 2.0)) / 100
+        self.confirm_observations = max(1, int(alert_config.get('confirm_observations', 1)))
+        self.rearm_after = timedelta(minutes=float(alert_config.get('rearm_minutes', 60)))
+        self.digest_window = timedelta(minutes=float(alert_config.get('digest_window_minutes', 0)))
+
+    def evaluate(self, product: Dict[str, Any], site_name: str, price: float,
+                 observed_at: datetime = None) -> Optional[Dict[str, Any]]:
+        """Update alert state for a newly saved price, returning the alert if one opened."""
+        target_price = product.get('target_price')
+        if not target_price or price is None:
+            return None
+
+        observed_at = observed_at or datetime.now()
+
+        # Check and insert under one write lock, so two processes evaluating the same
+        # product and site cannot both find no open alert and both open one
+        conn = self.db_manager.get_connection()
+        conn.isolation_level = None
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            alert_id = self._update_episode(conn, product, site_name, price, target_price, observed_at)
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        if alert_id is None:
+            return None
+
+        logger.info(f"Price alert: {product['name']} on {site_name} - £{price:.2f} (target £{target_price:.2f})")
+        return {
+            'id': alert_id,
+            'product': product,
+            'site': site_name,
+            'current_price': price,
+            'target_price': target_price,
+            'url': product.get('urls', {}).get(site_name, '')
+        }
+
+    def _update_episode(self, conn, product: Dict[str, Any], site_name: str, price: float,
+                        target_price: float, observed_at: datetime) -> Optional[int]:
+        """Clear or open the product's alert episode on ``conn``, returning the ID of one just opened."""
+        active = conn.execute('''
+            SELECT id FROM price_alerts
+            WHERE product_id = ? AND site_name = ? AND cleared_at IS NULL
+            ORDER BY id DESC LIMIT 1
+        ''', (product['id'], site_name)).fetchone()
+
+        if active:
+            if price > target_price * (1 + self.hysteresis):
+                conn.execute('''
+                    UPDATE price_alerts SET cleared_at = ? WHERE id = ?
+                ''', (observed_at, active[0]))
+                logger.debug(f"Price alert cleared for {product['name']} on {site_name}")
+            return None
+
+        if price > target_price:
+            return None
+
+        if not self._confirmed(conn, product['id'], site_name, target_price):
+            return None
+
+        last_cleared = conn.execute('''
+            SELECT MAX(cleared_at) FROM price_alerts
+            WHERE product_id = ? AND site_name = ?
+        ''', (product['id'], site_name)).fetchone()[0]
+        if last_cleared and observed_at - datetime.fromisoformat(last_cleared) < self.rearm_after:
+            return None
+
+        cursor = conn.execute('''
+            INSERT INTO price_alerts
+            (product_id, site_name, alert_price, target_price, triggered_at, notified)
+            VALUES (?, ?, ?, ?, ?, 0)
+        ''', (product['id'], site_name, price, target_price, observed_at))
+        return cursor.lastrowid
+
+    def _confirmed(self, conn, product_id: int, site_name: str, target_price: float) -> bool:
+        """True if the last confirm_observations saved prices are all at or below target."""
+        if self.confirm_observations == 1:
+            return True
+        prices = [row[0] for row in conn.execute('''
+            SELECT price FROM price_history
+            WHERE product_id = ? AND site_name = ?
+            ORDER BY timestamp DESC LIMIT ?
+        ''', (product_id, site_name, self.confirm_observations))]
+        return len(prices) == self.confirm_observations and all(p <= target_price for p in prices)
+
+    def pending_alerts(self) -> List[Dict[str, Any]]:
+        """Get opened alerts that have not been sent and whose price is still low.
+
+        Alerts claimed by a dispatch that has not finished within ``CLAIM_TIMEOUT``
+        count as pending again.
+        """
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.execute('''
+                SELECT a.id, a.product_id, a.site_name, a.alert_price, a.target_price,
+                       p.name, p.urls
+                FROM price_alerts a
+                JOIN products p ON p.id = a.product_id
+                WHERE (a.notified = 0 OR (a.notified = 2 AND a.claimed_at < ?))
+                  AND a.cleared_at IS NULL
+                ORDER BY a.triggered_at
+            ''', (datetime.now() - self.CLAIM_TIMEOUT,))
+            rows = cursor.fetchall()
+
+        alerts = []
+        for alert_id, product_id, site_name, alert_price, target_price, name, urls_json in rows:
+            urls = json.loads(urls_json) if urls_json else {}
+            alerts.append({
+                'id': alert_id,
+                'product': {'id': product_id, 'name': name, 'urls': urls},
+                'site': site_name,
+                'current_price': alert_price,
+                'target_price': target_price if target_price is not None else alert_price,
+                'url': urls.get(site_name, '')
+            })
+        return alerts
+
+    def digest_due(self, now: datetime = None) -> bool:
+        """True if no alert digest has been sent within the digest window."""
+        if not self.digest_window:
+            return True
+        now = now or datetime.now()
+        with self.db_manager.get_connection() as conn:
+            last_sent = conn.execute('SELECT MAX(notified_at) FROM price_alerts').fetchone()[0]
+        return last_sent is None or now - datetime.fromisoformat(last_sent) >= self.digest_window
+
+    async def dispatch(self, notification_manager) -> int:
+        """Send pending alerts as one digest if the window allows, returning how many were sent."""
+        if not self.digest_due():
+            logger.info("Holding price alerts until the next digest window")
+            return 0
+
+        alerts = self.pending_alerts()
+        claimed = self._claim([alert['id'] for alert in alerts])
+        alerts = [alert for alert in alerts if alert['id'] in claimed]
+        if not alerts:
+            return 0
+
+        try:
+            if notification_manager.has_enabled_channel():
+                if not await notification_manager.send_price_alerts(alerts):
+                    # Left pending; retried on the next dispatch
+                    self._release(claimed)
+                    return 0
+                logger.info(f"Sent notifications for {len(alerts)} price alerts")
+            else:
+                logger.info(f"{len(alerts)} price alerts recorded; no notification channels enabled")
+        except BaseException:
+            self._release(claimed)
+            raise
+
+        self._mark_notified(claimed)
+        return len(alerts)
+
+    def _claim(self, alert_ids: List[int]) -> set:
+        """Mark pending alerts as being sent, returning the ids this call claimed."""
+        now = datetime.now()
+        claimed = set()
+        with self.db_manager.get_connection() as conn:
+            for alert_id in alert_ids:
+                cursor = conn.execute('''
+                    UPDATE price_alerts SET notified = 2, claimed_at = ?
+                    WHERE id = ? AND (notified = 0 OR (notified = 2 AND claimed_at < ?))
+                ''', (now, alert_id, now - self.CLAIM_TIMEOUT))
+                if cursor.rowcount:
+                    claimed.add(alert_id)
+        return claimed
+
+    def _release(self, alert_ids: set):
+        """Put claimed alerts back in the queue after a failed send."""
+        with self.db_manager.get_connection() as conn:
+            conn.executemany('''
+                UPDATE price_alerts SET notified = 0, claimed_at = NULL WHERE id = ? AND notified = 2
+            ''', [(alert_id,) for alert_id in alert_ids])
+
+    def _mark_notified(self, alert_ids: set):
+        now = datetime.now()
+        with self.db_manager.get_connection() as conn:
+            conn.executemany('''
+                UPDATE price_alerts SET notified = 1, notified_at = ? WHERE id = ?
+            ''', [(now, alert_id) for alert_id in alert_ids])
@@ -0,0 +1,119 @@
+"""
+Site adapters that read product data from a JSON API instead of scraping HTML
+
+A site opts in with an ``api`` block in its configuration:
+
+    "api": {
+        "type": "json",
+        "url_pattern": "/product/(?P<code>[^/?#]+)",
+        "url": "https://www.example.co.uk/api/products/{code}",
+        "fields": {
+            "price": ["product.prices.delivery", "product.prices.collection"],
+            "title": "product.name",
+            "availability": "product.stock.status"
+        }
+    }
+
+``url_pattern`` is searched in the product page URL and its named groups fill
+in ``url``. Each field is a dotted path into the response, or a list of paths
+tried in order; list items are addressed by index (``offers.0.price``).
+Adapter types are looked up in ``ADAPTERS``, so other kinds of API can be
+added alongside ``JsonApiAdapter``.
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Union
+
+from .structured_data import parse_availability, parse_price
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def resolve_path(data: Any, path: str) -> Any:
+    """Value at a dotted ``path`` in decoded JSON, or None if any step is missing."""
+    for step in path.split('.'):
+        if isinstance(data, dict):
+            data = data.get(step, _MISSING)
+        elif isinstance(data, list) and step.lstrip('-').isdigit() and -len(data) <= int(step) < len(data):
+            data = data[int(step)]
+        else:
+            return None
+        if data is _MISSING:
+            return None
+    return data
+
+
+class JsonApiAdapter:
+    """Fetches a product's JSON from the site's API and maps it to price, title and availability."""
+
+    def __init__(self, site_name: str, api_config: Dict[str, Any]):
+        self.site_name = site_name
+        self.url_template = api_config['url']
+        self.url_pattern = re.compile(api_config.get('url_pattern', '(?P<url>.+)'))
+        self.fields = api_config.get('fields', {})
+        self.headers = {'Accept': 'application/json', **api_config.get('headers', {})}
+        self.price_scale = float(api_config.get('price_scale', 1))
+        self.availability_values = {str(key).lower(): value
+                                    for key, value in api_config.get('availability_values', {}).items()}
+
+    def api_url(self, page_url: str) -> Optional[str]:
+        """API URL for a product page URL, or None if the page URL does not match ``url_pattern``."""
+        match = self.url_pattern.search(page_url)
+        if not match:
+            return None
+        return self.url_template.format(**match.groupdict())
+
+    def _field(self, data: Any, field: str) -> Any:
+        paths: Union[str, List[str]] = self.fields.get(field, [])
+        for path in [paths] if isinstance(paths, str) else paths:
+            value = resolve_path(data, path)
+            if value is not None:
+                return value
+        return None
+
+    def _availability(self, value: Any) -> bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, (int, float)):
+            return value > 0
+        if value is None:
+            return True
+        text = str(value).lower()
+        if text in self.availability_values:
+            return bool(self.availability_values[text])
+        available = parse_availability(text.replace('_', ' ').replace('-', ' '))
+        return True if available is None else available
+
+    def extract(self, body: str) -> Dict[str, Any]:
+        """Price, title, availability and currency from an API response body."""
+        data = json.loads(body)
+        price = parse_price(self._field(data, 'price'))
+        if price is not None and self.price_scale != 1:
+            price = round(price * self.price_scale, 2)
+        title = self._field(data, 'title')
+        currency = self._field(data, 'currency')
+        return {
+            'price': price,
+            'title': str(title).strip() if title is not None else None,
+            'availability': self._availability(self._field(data, 'availability')),
+            'currency': str(currency).upper() if currency else 'GBP'
+        }
+
+
+ADAPTERS = {'json': JsonApiAdapter}
+
+
+def create_adapter(site_name: str, site_config: Optional[Dict[str, Any]]) -> Optional[JsonApiAdapter]:
+    """The API adapter configured for a site, or None if it is scraped as HTML."""
+    api_config = (site_config or {}).get('api')
+    if not api_config or not api_config.get('enabled', True):
+        return None
+    adapter_type = api_config.get('type', 'json')
+    if adapter_type not in ADAPTERS:
+        logger.warning(f"Unknown API adapter type '{adapter_type}' for {site_name}; scraping HTML instead")
+        return None
+    return ADAPTERS[adapter_type](site_name, api_config)
@@ -0,0 +1,322 @@
+"""
+Basket optimisation across stores with delivery fees and minimum order values
+"""
+
+import itertools
+import logging
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tolerance for comparing basket costs in pounds
+COST_EPSILON = 1e-9
+
+
+@dataclass
+class DeliveryRule:
+    """Delivery charges for one store."""
+    fee: float = 0.0
+    minimum_order: float = 0.0
+    free_delivery_threshold: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> 'DeliveryRule':
+        """Build a rule from a site's "delivery" config section."""
+        config = config or {}
+        threshold = config.get('free_delivery_threshold')
+        return cls(
+            fee=float(config.get('fee', 0.0) or 0.0),
+            minimum_order=float(config.get('minimum_order', 0.0) or 0.0),
+            free_delivery_threshold=float(threshold) if threshold is not None else None
+        )
+
+    def charge(self, subtotal: float) -> float:
+        """Delivery charge for an order with the given subtotal."""
+        if self.free_delivery_threshold is not None and subtotal >= self.free_delivery_threshold:
+            return 0.0
+        return self.fee
+
+    def is_trivial(self) -> bool:
+        """True if this rule never affects which store is cheapest."""
+        return self.fee == 0 and self.minimum_order == 0
+
+
+@dataclass
+class BasketResult:
+    """Store assignment chosen for a basket."""
+    assignment: Dict[int, str]
+    item_cost: float
+    delivery_cost: float
+    store_subtotals: Dict[str, float]
+    store_delivery: Dict[str, float]
+    feasible: bool = True
+    optimal: bool = False
+    nodes_explored: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def total_cost(self) -> float:
+        return self.item_cost + self.delivery_cost
+
+
+@dataclass
+class _Basket:
+    """Working state for one candidate assignment."""
+    prices: Dict[int, Dict[str, float]]
+    assignment: Dict[int, str] = field(default_factory=dict)
+    subtotals: Dict[str, float] = field(default_factory=dict)
+
+    def assign(self, product_id: int, store: str):
+        previous = self.assignment.get(product_id)
+        if previous is not None:
+            self.subtotals[previous] -= self.prices[product_id][previous]
+            if self.subtotals[previous] <= COST_EPSILON:
+                del self.subtotals[previous]
+        self.assignment[product_id] = store
+        self.subtotals[store] = self.subtotals.get(store, 0.0) + self.prices[product_id][store]
+
+
+class BasketOptimiser:
+    """Chooses which store to buy each product from to minimise the total basket cost.
+
+    The total includes each used store's delivery charge and must meet each used
+    store's minimum order. A greedy pass (cheapest store per item within each subset
+    of stores, then repair and local search) gives a fast incumbent. A depth-first
+    branch-and-bound over items then tries to improve or prove it within a node and
+    time budget; if the budget runs out the best basket found so far is returned.
+    """
+
+    def __init__(self, rules: Dict[str, DeliveryRule], store_priority: Dict[str, int] = None,
+                 node_limit: int = 200000, time_limit: float = 0.25):
+        self.rules = rules
+        self.store_priority = store_priority or {}
+        self.node_limit = node_limit
+        self.time_limit = time_limit
+
+    def optimise(self, prices: Dict[int, Dict[str, float]]) -> BasketResult:
+        """Pick a store for every product given each product's price per store."""
+        started = time.perf_counter()
+        prices = {product_id: options for product_id, options in prices.items() if options}
+        if not prices:
+            return BasketResult({}, 0.0, 0.0, {}, {}, optimal=True)
+
+        best = self._greedy(prices)
+        optimal, nodes = False, 0
+
+        if len(prices) < sys.getrecursionlimit() - 100:
+            search = _BranchAndBound(self, prices, best, started)
+            best, optimal, nodes = search.run()
+
+        if best is None:
+            # No store split meets the minimum orders; fall back to cheapest per item
+            logger.warning("No basket satisfies the stores' minimum order values")
+            basket = _Basket(prices)
+            for product_id in prices:
+                basket.assign(product_id, self._cheapest_store(prices[product_id], prices[product_id]))
+            return self._result(basket, feasible=False, optimal=False, nodes=nodes, started=started)
+
+        return self._result(best, feasible=True, optimal=optimal, nodes=nodes, started=started)
+
+    def cost(self, basket: _Basket) -> float:
+        """Total cost of a basket, or infinity if a used store is below its minimum order."""
+        total = 0.0
+        for store, subtotal in basket.subtotals.items():
+            rule = self.rules.get(store, DeliveryRule())
+            if subtotal + COST_EPSILON < rule.minimum_order:
+                return float('inf')
+            total += subtotal + rule.charge(subtotal)
+        return total
+
+    def _rule(self, store: str) -> DeliveryRule:
+        return self.rules.get(store, DeliveryRule())
+
+    def _cheapest_store(self, options: Dict[str, float], allowed) -> str:
+        return min((store for store in options if store in allowed),
+                   key=lambda store: (options[store], self.store_priority.get(store, 999)))
+
+    def _greedy(self, prices: Dict[int, Dict[str, float]]) -> Optional[_Basket]:
+        """Best basket over all store subsets using cheapest-in-subset, repair and local search."""
+        stores = sorted({store for options in prices.values() for store in options})
+        candidates = []
+        for size in range(1, len(stores) + 1):
+            for subset in itertools.combinations(stores, size):
+                allowed = set(subset)
+                if any(not allowed.intersection(options) for options in prices.values()):
+                    continue
+                lower_bound = sum(min(options[s] for s in options if s in allowed)
+                                  for options in prices.values())
+                candidates.append((lower_bound, subset))
+
+        best, best_cost = None, float('inf')
+        for lower_bound, subset in sorted(candidates):
+            if lower_bound >= best_cost - COST_EPSILON:
+                break
+            basket = self._greedy_subset(prices, set(subset))
+            if basket is None:
+                continue
+            basket_cost = self.cost(basket)
+            if basket_cost < best_cost - COST_EPSILON:
+                best, best_cost = basket, basket_cost
+        return best
+
+    def _greedy_subset(self, prices: Dict[int, Dict[str, float]], allowed: set) -> Optional[_Basket]:
+        basket = _Basket(prices)
+        for product_id, options in prices.items():
+            basket.assign(product_id, self._cheapest_store(options, allowed))
+
+        # Repair minimum orders, then try to reach free delivery where it pays off
+        for store in sorted(allowed):
+            rule = self._rule(store)
+            if 0 < basket.subtotals.get(store, 0.0) < rule.minimum_order:
+                if not self._top_up(basket, store, rule.minimum_order, allowed):
+                    return None
+        for store in sorted(allowed):
+            rule = self._rule(store)
+            threshold = rule.free_delivery_threshold
+            if rule.fee and threshold and 0 < basket.subtotals.get(store, 0.0) < threshold:
+                trial = _Basket(prices, dict(basket.assignment), dict(basket.subtotals))
+                if self._top_up(trial, store, threshold, allowed) and self.cost(trial) < self.cost(basket):
+                    basket = trial
+
+        self._local_search(basket, allowed)
+        return basket if self.cost(basket) < float('inf') else None
+
+    def _top_up(self, basket: _Basket, store: str, target: float, allowed: set) -> bool:
+        """Move items into a store, cheapest extra cost per pound first, until it reaches target."""
+        moves = []
+        for product_id, current in basket.assignment.items():
+            options = basket.prices[product_id]
+            if current == store or store not in options:
+                continue
+            extra = options[store] - options[current]
+            moves.append((extra / options[store], product_id))
+
+        for _, product_id in sorted(moves):
+            if basket.subtotals.get(store, 0.0) + COST_EPSILON >= target:
+                break
+            donor = basket.assignment[product_id]
+            remaining = basket.subtotals[donor] - basket.prices[product_id][donor]
+            if COST_EPSILON < remaining < self._rule(donor).minimum_order:
+                continue
+            basket.assign(product_id, store)
+
+        return basket.subtotals.get(store, 0.0) + COST_EPSILON >= target
+
+    def _local_search(self, basket: _Basket, allowed: set, max_passes: int = 5):
+        """Apply single-item moves between stores while they lower the total cost."""
+        current_cost = self.cost(basket)
+        for _ in range(max_passes):
+            improved = False
+            for product_id, options in basket.prices.items():
+                original = basket.assignment[product_id]
+                for store in options:
+                    if store == original or store not in allowed:
+                        continue
+                    basket.assign(product_id, store)
+                    new_cost = self.cost(basket)
+                    if new_cost < current_cost - COST_EPSILON:
+                        current_cost, original, improved = new_cost, store, True
+                    else:
+                        basket.assign(product_id, original)
+            if not improved:
+                break
+
+    def _result(self, basket: _Basket, feasible: bool, optimal: bool, nodes: int,
+                started: float) -> BasketResult:
+        subtotals = {store: round(subtotal, 2) for store, subtotal in basket.subtotals.items()}
+        delivery = {store: self._rule(store).charge(subtotal) for store, subtotal in basket.subtotals.items()}
+        return BasketResult(
+            assignment=dict(basket.assignment),
+            item_cost=round(sum(basket.subtotals.values()), 2),
+            delivery_cost=round(sum(delivery.values()), 2),
+            store_subtotals=subtotals,
+            store_delivery=delivery,
+            feasible=feasible,
+            optimal=optimal,
+            nodes_explored=nodes,
+            elapsed=time.perf_counter() - started
+        )
+
+
+class _BranchAndBound:
+    """Depth-first search over item assignments with cost lower bounds."""
+
+    def __init__(self, optimiser: BasketOptimiser, prices: Dict[int, Dict[str, float]],
+                 incumbent: Optional[_Basket], started: float):
+        self.optimiser = optimiser
+        self.prices = prices
+        self.started = started
+        self.best = incumbent
+        self.best_cost = optimiser.cost(incumbent) if incumbent else float('inf')
+        self.nodes = 0
+        self.exhausted = False
+
+        # Branch on the items where the store choice matters most first
+        def regret(product_id):
+            ordered = sorted(prices[product_id].values())
+            return ordered[1] - ordered[0] if len(ordered) > 1 else 0.0
+        self.order = sorted(prices, key=regret, reverse=True)
+        self.stores = sorted({store for options in prices.values() for store in options})
+
+        # Suffix sums: cheapest remaining item cost, and most each store could still receive
+        count = len(self.order)
+        self.min_remaining = [0.0] * (count + 1)
+        self.max_remaining = {store: [0.0] * (count + 1) for store in self.stores}
+        for index in range(count - 1, -1, -1):
+            options = prices[self.order[index]]
+            self.min_remaining[index] = self.min_remaining[index + 1] + min(options.values())
+            for store in self.stores:
+                self.max_remaining[store][index] = (self.max_remaining[store][index + 1]
+                                                    + options.get(store, 0.0))
+
+    def run(self) -> Tuple[Optional[_Basket], bool, int]:
+        self._search(0, {}, {}, 0.0)
+        return self.best, not self.exhausted, self.nodes
+
+    def _lower_bound(self, index: int, subtotals: Dict[str, float], item_cost: float) -> float:
+        bound = item_cost + self.min_remaining[index]
+        for store, subtotal in subtotals.items():
+            rule = self.optimiser._rule(store)
+            reachable = subtotal + self.max_remaining[store][index]
+            if reachable + COST_EPSILON < rule.minimum_order:
+                return float('inf')
+            if rule.fee and (rule.free_delivery_threshold is None
+                             or reachable + COST_EPSILON < rule.free_delivery_threshold):
+                bound += rule.fee
+        return bound
+
+    def _search(self, index: int, assignment: Dict[int, str], subtotals: Dict[str, float],
+                item_cost: float):
+        if self.exhausted:
+            return
+        self.nodes += 1
+        if (self.nodes >= self.optimiser.node_limit
+                or (self.nodes % 1000 == 0
+                    and time.perf_counter() - self.started > self.optimiser.time_limit)):
+            self.exhausted = True
+            return
+
+        if self._lower_bound(index, subtotals, item_cost) >= self.best_cost - COST_EPSILON:
+            return
+
+        if index == len(self.order):
+            basket = _Basket(self.prices, dict(assignment), dict(subtotals))
+            basket_cost = self.optimiser.cost(basket)
+            if basket_cost < self.best_cost - COST_EPSILON:
+                self.best, self.best_cost = basket, basket_cost
+            return
+
+        product_id = self.order[index]
+        options = self.prices[product_id]
+        for store in sorted(options, key=lambda s: (options[s], self.optimiser.store_priority.get(s, 999))):
+            price = options[store]
+            assignment[product_id] = store
+            subtotals[store] = subtotals.get(store, 0.0) + price
+            self._search(index + 1, assignment, subtotals, item_cost + price)
+            subtotals[store] -= price
+            if subtotals[store] <= COST_EPSILON:
+                del subtotals[store]
+            del assignment[product_id]
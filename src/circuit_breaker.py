@@ -0,0 +1,177 @@
+"""
+Per-site circuit breaker for scraping
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, Optional
+
+from .database import DatabaseManager
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """Stops scraping a site after a run of failed fetches, using the site_circuit_breakers table as state.
+
+    A site's circuit opens after ``failure_threshold`` consecutive jobs whose page
+    could not be fetched; while open, jobs for that site fail immediately instead
+    of working through every retry. Once ``cooldown_minutes`` have passed the
+    circuit goes half-open and lets a single probe job through: if the page is
+    fetched the circuit closes, otherwise it opens for another cooldown. State is
+    saved on every change, so a site blocked in one run stays skipped by the next
+    until its cooldown is over. Each change re-reads the site's row first, so
+    scrape workers in separate processes share one circuit per site.
+    """
+
+    def __init__(self, db_manager: Optional[DatabaseManager] = None,
+                 breaker_config: Optional[Dict[str, Any]] = None):
+        breaker_config = breaker_config or {}
+        self.db_manager = db_manager
+        self.enabled = breaker_config.get('enabled', True)
+        self.failure_threshold = max(1, int(breaker_config.get('failure_threshold', 5)))
+        self.cooldown = timedelta(minutes=float(breaker_config.get('cooldown_minutes', 30)))
+        self._sites: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self):
+        if self.db_manager is None:
+            return
+        now = datetime.now()
+        with self.db_manager.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT site_name, state, consecutive_failures, opened_at FROM site_circuit_breakers
+            ''').fetchall()
+        for site_name, *row in rows:
+            self._set_from_row(site_name, row, now)
+
+    def _refresh(self, conn, site_name: str, now: datetime):
+        """Replace the site's state with the row other workers may have saved since."""
+        row = conn.execute('''
+            SELECT state, consecutive_failures, opened_at FROM site_circuit_breakers
+            WHERE site_name = ?
+        ''', (site_name,)).fetchone()
+        if row is not None:
+            self._set_from_row(site_name, row, now)
+
+    def _set_from_row(self, site_name: str, row, now: datetime):
+        state, failures, opened_at = row
+        opened_at = datetime.fromisoformat(opened_at) if opened_at else None
+        if state == HALF_OPEN and now - opened_at >= self.cooldown:
+            # A probe whose worker never reported back counts as failed
+            state = OPEN
+        self._sites[site_name] = {'state': state, 'failures': failures, 'opened_at': opened_at}
+        metrics.CIRCUIT_STATE.set(STATE_VALUES[state], site=site_name)
+
+    def _site(self, site_name: str) -> Dict[str, Any]:
+        return self._sites.setdefault(site_name, {'state': CLOSED, 'failures': 0, 'opened_at': None})
+
+    def _update(self, site_name: str, change: Callable[[Dict[str, Any], datetime], bool], now: datetime) -> bool:
+        """Apply ``change`` to the site's latest saved state and save it if it returns True.
+
+        The read and the write share one BEGIN IMMEDIATE transaction, so workers
+        recording outcomes for the same site at once add to each other's failure
+        counts instead of overwriting them.
+        """
+        if self.db_manager is None:
+            changed = change(self._site(site_name), now)
+        else:
+            conn = self.db_manager.get_connection()
+            conn.isolation_level = None
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                self._refresh(conn, site_name, now)
+                site = self._site(site_name)
+                changed = change(site, now)
+                if changed:
+                    conn.execute('''
+                        INSERT OR REPLACE INTO site_circuit_breakers
+                        (site_name, state, consecutive_failures, opened_at, updated_at)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (site_name, site['state'], site['failures'], site['opened_at'], datetime.now()))
+                conn.execute('COMMIT')
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+            finally:
+                conn.close()
+        metrics.CIRCUIT_STATE.set(STATE_VALUES[self._site(site_name)['state']], site=site_name)
+        return changed
+
+    def state(self, site_name: str) -> str:
+        return self._site(site_name)['state']
+
+    def allow(self, site_name: str, now: datetime = None) -> bool:
+        """Whether a job for ``site_name`` may run now; False means fail it without fetching."""
+        if not self.enabled:
+            return True
+        now = now or datetime.now()
+        if self.db_manager is not None:
+            # Pick up a circuit another worker has opened or closed
+            with self.db_manager.get_connection() as conn:
+                self._refresh(conn, site_name, now)
+        site = self._site(site_name)
+        if site['state'] == CLOSED:
+            return True
+        if site['state'] == HALF_OPEN:
+            return False  # one probe at a time
+        if now - site['opened_at'] < self.cooldown:
+            return False
+
+        def start_probe(site, now):
+            if site['state'] != OPEN or now - site['opened_at'] < self.cooldown:
+                return False
+            # opened_at now marks the probe's start, so a lost probe times out after a cooldown
+            site.update(state=HALF_OPEN, opened_at=now)
+            logger.info(f"Circuit for {site_name} half-open, sending a probe request")
+            return True
+
+        # Only the worker whose transaction moves the circuit to half-open sends the probe
+        return self._update(site_name, start_probe, now)
+
+    def record_success(self, site_name: str):
+        def close(site, now):
+            if site['state'] == CLOSED and site['failures'] == 0:
+                return False
+            if site['state'] != CLOSED:
+                logger.info(f"Circuit for {site_name} closed after a successful fetch")
+            site.update(state=CLOSED, failures=0, opened_at=None)
+            return True
+
+        self._update(site_name, close, datetime.now())
+
+    def record_failure(self, site_name: str, now: datetime = None):
+        def count(site, now):
+            site['failures'] += 1
+            probe_failed = site['state'] == HALF_OPEN
+            if probe_failed or (site['state'] == CLOSED and site['failures'] >= self.failure_threshold):
+                site.update(state=OPEN, opened_at=now)
+                logger.warning(f"Circuit for {site_name} opened after {site['failures']} failed fetches; "
+                               f"skipping it for {self.cooldown}")
+            return True
+
+        self._update(site_name, count, now or datetime.now())
+
+    def rejected_result(self, url: str, site_name: str) -> Dict[str, Any]:
+        """Result returned for a job the open circuit did not let through."""
+        metrics.CIRCUIT_REJECTIONS.inc(site=site_name)
+        return {
+            'success': False,
+            'price': None,
+            'currency': 'GBP',
+            'title': None,
+            'availability': None,
+            'url': url,
+            'error': f"Circuit open for {site_name}; skipped"
+        }
+
+    def states(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(site) for name, site in self._sites.items()}
@@ -0,0 +1,168 @@
+"""
+Adaptive per-site request concurrency
+
+Each site gets an AIMD (additive increase, multiplicative decrease) window:
+every successful response widens it by about one slot per window's worth of
+successes, and a 429, 403 or timeout shrinks it by ``decrease_factor``. A
+Retry-After header also pauses new requests to that site until it has passed.
+Throttles from requests that started before the last decrease are not counted
+again, so one burst of 429s halves the window once rather than repeatedly.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Longest Retry-After honoured, so one response cannot stall a site indefinitely
+MAX_RETRY_AFTER = 300.0
+
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(float(value), MAX_RETRY_AFTER)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    seconds = (when - (now or datetime.now(timezone.utc))).total_seconds()
+    return min(max(0.0, seconds), MAX_RETRY_AFTER)
+
+
+class SiteWindow:
+    """Concurrency window for one site."""
+
+    def __init__(self, site: str, initial: float, minimum: int, maximum: int,
+                 increase: float, decrease_factor: float):
+        self.site = site
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.last_decrease = float('-inf')
+        self._waiters = deque()
+        metrics.SITE_CONCURRENCY_LIMIT.set(self.limit, site=site)
+
+    async def acquire(self) -> float:
+        """Wait for a free slot and return the monotonic time the request started."""
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return now
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()  # pass the slot we were given to the next waiter
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+        metrics.SITE_CONCURRENCY_LIMIT.set(self.limit, site=self.site)
+        self._wake()
+
+    def on_throttle(self, started: float, reason: str, retry_after: Optional[float] = None):
+        now = time.monotonic()
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+        if started < self.last_decrease:
+            return  # already backed off for the window this request was part of
+        previous = self.limit
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+        self.last_decrease = now
+        metrics.SITE_CONCURRENCY_LIMIT.set(self.limit, site=self.site)
+        metrics.CONCURRENCY_BACKOFFS.inc(site=self.site, reason=reason)
+        logger.info(f"Backing off {self.site} after {reason}: concurrency {previous:.1f} -> {self.limit:.1f}"
+                    + (f", paused {retry_after:.0f}s" if retry_after else ""))
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class RequestSlot:
+    """Handed to a request holding a slot so it can report how the site responded."""
+
+    def __init__(self, window: Optional[SiteWindow] = None, started: float = 0.0):
+        self.window = window
+        self.started = started
+
+    def success(self):
+        if self.window:
+            self.window.on_success()
+
+    def throttled(self, reason: str, retry_after: Optional[float] = None):
+        if self.window:
+            self.window.on_throttle(self.started, reason, retry_after)
+
+
+class ConcurrencyController:
+    """Per-site AIMD windows, created on first use from the adaptive_concurrency settings."""
+
+    def __init__(self, concurrency_config: Optional[Dict[str, Any]] = None):
+        concurrency_config = concurrency_config or {}
+        self.initial = float(concurrency_config.get('initial', 1))
+        self.minimum = int(concurrency_config.get('min', 1))
+        self.maximum = int(concurrency_config.get('max', 8))
+        self.increase = float(concurrency_config.get('increase', 1.0))
+        self.decrease_factor = float(concurrency_config.get('decrease_factor', 0.5))
+        self.windows: Dict[str, SiteWindow] = {}
+
+    def window(self, site: str) -> SiteWindow:
+        if site not in self.windows:
+            self.windows[site] = SiteWindow(site, self.initial, self.minimum, self.maximum,
+                                            self.increase, self.decrease_factor)
+        return self.windows[site]
+
+    @asynccontextmanager
+    async def slot(self, site: str):
+        window = self.window(site)
+        started = await window.acquire()
+        try:
+            yield RequestSlot(window, started)
+        finally:
+            window.release()
+
+    def limits(self) -> Dict[str, float]:
+        return {site: window.limit for site, window in self.windows.items()}
+
+
+@asynccontextmanager
+async def unlimited_slot():
+    """Slot used when adaptive concurrency is disabled."""
+    yield RequestSlot()
@@ -34,6 +34,14 @@ class Config:
                 "max_concurrent_requests": 1,
                 "timeout": 30,
                 "retry_attempts": 3,
+                "anomaly_detection": {
+                    "enabled": True,
+                    "window": 10,
+                    "max_ratio": 3.0,
+                    "z_threshold": 6.0,
+                    "min_change_percent": 50.0,
+                    "confirm_after": 3
+                },
                 "user_agents": [
                     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
                 ]
@@ -52,6 +60,12 @@ class Config:
                 "webhook": {
                     "enabled": False,
                     "url": ""
+                },
+                "alerts": {
+                    "hysteresis_percent": 2.0,
+                    "confirm_observations": 1,
+                    "rearm_minutes": 60,
+                    "digest_window_minutes": 0
                 }
             },
             "sites": {}
@@ -113,6 +127,14 @@ class Config:
                     "max_concurrent_requests": 1,
                     "timeout": 30,
                     "retry_attempts": 3,
+                    "anomaly_detection": {
+                        "enabled": True,
+                        "window": 10,
+                        "max_ratio": 3.0,
+                        "z_threshold": 6.0,
+                        "min_change_percent": 50.0,
+                        "confirm_after": 3
+                    },
                     "special_pricing": {
                         "enabled": True,
                         "prefer_delivery_prices": True,
@@ -142,12 +164,19 @@ class Config:
                     "webhook": {
                         "enabled": False,
                         "url": ""
+                    },
+                    "alerts": {
+                        "hysteresis_percent": 2.0,
+                        "confirm_observations": 1,
+                        "rearm_minutes": 60,
+                        "digest_window_minutes": 0
                     }
                 },
                 "sites": {
                     "jjfoodservice": {
                         "enabled": True,
                         "base_url": "https://www.jjfoodservice.com",
+                        "delivery": {"fee": 0.0, "minimum_order": 0.0, "free_delivery_threshold": None},
                         "selectors": {
                             "price": [".price-delivery", ".delivery-price", ".price"],
                             "delivery_price": [".price-delivery", ".delivery-price"],
@@ -159,6 +188,7 @@ class Config:
                     "atoz_catering": {
                         "enabled": True,
                         "base_url": "https://www.atoz-catering.co.uk",
+                        "delivery": {"fee": 0.0, "minimum_order": 0.0, "free_delivery_threshold": None},
                         "selectors": {
                             "price": [".my-price.price-offer", ".delivery-price", ".price"],
                             "delivery_price": [".delivery-price", ".price-delivery"],
@@ -170,6 +200,7 @@ class Config:
                     "amazon_uk": {
                         "enabled": True,
                         "base_url": "https://www.amazon.co.uk",
+                        "delivery": {"fee": 0.0, "minimum_order": 0.0, "free_delivery_threshold": None},
                         "selectors": {
                             "price": [".a-price-whole", ".a-price .a-offscreen", "#priceblock_ourprice"],
                             "special_offer": ["#priceblock_dealprice", ".a-price-strike .a-offscreen", ".a-price-was"],
@@ -312,7 +343,9 @@ class Config:
             'DELAY_BETWEEN_REQUESTS': ['scraping', 'delay_between_requests'],
             'MAX_CONCURRENT_REQUESTS': ['scraping', 'max_concurrent_requests'],
             'REQUEST_TIMEOUT': ['scraping', 'timeout'],
-            'RETRY_ATTEMPTS': ['scraping', 'retry_attempts']
+            'RETRY_ATTEMPTS': ['scraping', 'retry_attempts'],
+            'ADAPTIVE_CONCURRENCY': ['scraping', 'adaptive_concurrency', 'enabled'],
+            'ADAPTIVE_CONCURRENCY_MAX': ['scraping', 'adaptive_concurrency', 'max']
         }
         
         for env_var, config_path in scraping_env_vars.items():
@@ -384,6 +417,46 @@ class Config:
         """Get number of retry attempts."""
         return self.scraping_config.get('retry_attempts', 3)
     
+    @property
+    def concurrency_config(self) -> Dict[str, Any]:
+        """Get adaptive per-site concurrency settings."""
+        return self.scraping_config.get('adaptive_concurrency', {})
+    
+    @property
+    def selector_ordering_config(self) -> Dict[str, Any]:
+        """Get adaptive selector ordering settings."""
+        return self.scraping_config.get('selector_ordering', {})
+    
+    @property
+    def structured_data_config(self) -> Dict[str, Any]:
+        """Get structured-data (JSON-LD, microdata, Open Graph) fast path settings."""
+        return self.scraping_config.get('structured_data', {})
+    
+    @property
+    def streaming_config(self) -> Dict[str, Any]:
+        """Get streamed page fetch settings."""
+        return self.scraping_config.get('streaming', {})
+    
+    @property
+    def circuit_breaker_config(self) -> Dict[str, Any]:
+        """Get per-site circuit breaker settings."""
+        return self.scraping_config.get('circuit_breaker', {})
+    
+    @property
+    def schedule_config(self) -> Dict[str, Any]:
+        """Get volatility-aware scrape scheduling settings."""
+        return self.scraping_config.get('schedule', {})
+    
+    @property
+    def worker_config(self) -> Dict[str, Any]:
+        """Get shared job queue and scrape worker settings."""
+        return self.scraping_config.get('workers', {})
+    
+    @property
+    def anomaly_config(self) -> Dict[str, Any]:
+        """Get settings for rejecting implausible scraped prices."""
+        return self.scraping_config.get('anomaly_detection', {})
+    
     @property
     def user_agents(self) -> list:
         """Get list of user agents."""
@@ -396,11 +469,22 @@ class Config:
         """Get notification configuration."""
         return self._config.get('notifications', {})
     
+    @property
+    def alert_config(self) -> Dict[str, Any]:
+        """Get price alert hysteresis, debounce and digest settings."""
+        return self.notification_config.get('alerts', {})
+    
     @property
     def sites_config(self) -> Dict[str, Any]:
         """Get sites configuration."""
         return self._config.get('sites', {})
     
+    @property
+    def delivery_rules(self) -> Dict[str, Dict[str, Any]]:
+        """Get delivery fee and minimum order settings per site."""
+        return {site: config['delivery'] for site, config in self.sites_config.items()
+                if config.get('delivery')}
+    
     def get_site_config(self, site_name: str) -> Optional[Dict[str, Any]]:
         """Get configuration for a specific site."""
         return self.sites_config.get(site_name)
@@ -4,16 +4,22 @@ Database management for price tracking
 
 import sqlite3
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import json
 import logging
 
+from .metrics import instrument_methods, DB_QUERY_SECONDS
+
 logger = logging.getLogger(__name__)
 
 
+@instrument_methods(DB_QUERY_SECONDS, exclude=('get_connection',))
 class DatabaseManager:
     """Manages SQLite database operations for price tracking."""
     
+    # Tables whose writes bump a counter in data_versions
+    VERSIONED_TABLES = ('products', 'price_history')
+    
     def __init__(self, db_path: str):
         self.db_path = db_path
         self._init_database()
@@ -21,6 +27,9 @@ class DatabaseManager:
     def _init_database(self):
         """Initialize database tables."""
         with sqlite3.connect(self.db_path) as conn:
+            # WAL lets web workers read while a scrape is writing
+            conn.execute('PRAGMA journal_mode=WAL')
+            
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS products (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -59,6 +68,89 @@ class DatabaseManager:
                 )
             ''')
             
+            # Scraped prices rejected as implausible by PriceAnomalyDetector
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS price_anomalies (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    product_id INTEGER NOT NULL,
+                    site_name TEXT NOT NULL,
+                    price REAL NOT NULL,
+                    baseline_median REAL,
+                    reason TEXT,
+                    detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (product_id) REFERENCES products (id)
+                )
+            ''')
+            
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_price_anomalies_product_site
+                ON price_anomalies (product_id, site_name, detected_at)
+            ''')
+            
+            # Per-site circuit breaker state used by CircuitBreaker
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS site_circuit_breakers (
+                    site_name TEXT PRIMARY KEY,
+                    state TEXT NOT NULL DEFAULT 'closed',
+                    consecutive_failures INTEGER NOT NULL DEFAULT 0,
+                    opened_at TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Next-due times used by ScrapeScheduler
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS scrape_schedule (
+                    product_id INTEGER NOT NULL,
+                    site_name TEXT NOT NULL,
+                    next_due_at TIMESTAMP NOT NULL,
+                    interval_minutes REAL,
+                    last_scraped_at TIMESTAMP,
+                    PRIMARY KEY (product_id, site_name),
+                    FOREIGN KEY (product_id) REFERENCES products (id)
+                )
+            ''')
+            
+            # Work shared by scrape workers through ScrapeJobQueue
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS scrape_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    product_id INTEGER NOT NULL,
+                    site_name TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    priority REAL NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    leased_by TEXT,
+                    lease_expires_at TIMESTAMP,
+                    enqueued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TIMESTAMP,
+                    result TEXT,  -- JSON scrape result
+                    FOREIGN KEY (product_id) REFERENCES products (id)
+                )
+            ''')
+            
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_scrape_jobs_status_priority
+                ON scrape_jobs (status, priority DESC, id)
+            ''')
+            
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_scrape_jobs_product_site
+                ON scrape_jobs (product_id, site_name, status)
+            ''')
+            
+            # Alert episode state used by AlertEngine
+            self._ensure_column(conn, 'price_alerts', 'target_price', 'REAL')
+            self._ensure_column(conn, 'price_alerts', 'cleared_at', 'TIMESTAMP')
+            self._ensure_column(conn, 'price_alerts', 'notified_at', 'TIMESTAMP')
+            self._ensure_column(conn, 'price_alerts', 'claimed_at', 'TIMESTAMP')
+            
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_price_alerts_product_site
+                ON price_alerts (product_id, site_name, cleared_at)
+            ''')
+            
             conn.execute('''
                 CREATE INDEX IF NOT EXISTS idx_price_history_product_id 
                 ON price_history (product_id)
@@ -68,6 +160,43 @@ class DatabaseManager:
                 CREATE INDEX IF NOT EXISTS idx_price_history_timestamp 
                 ON price_history (timestamp)
             ''')
+            
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_price_history_product_site_time
+                ON price_history (product_id, site_name, timestamp)
+            ''')
+            
+            # Change counters used for ETags and cache invalidation
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS data_versions (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            for table in self.VERSIONED_TABLES:
+                conn.execute('''
+                    INSERT OR IGNORE INTO data_versions (name) VALUES (?)
+                ''', (table,))
+                
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    conn.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+                        AFTER {event} ON {table}
+                        BEGIN
+                            UPDATE data_versions
+                            SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+                            WHERE name = '{table}';
+                        END
+                    ''')
+    
+    @staticmethod
+    def _ensure_column(conn, table: str, column: str, definition: str):
+        """Add a column to an existing table if an older database lacks it."""
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if column not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
     
     def add_product(self, name: str, urls: Dict[str, str], 
                    description: str = None, target_price: float = None) -> int:
@@ -236,6 +365,94 @@ class DatabaseManager:
             
             return stats
         
+    def get_products_page(self, after_id: int = 0, limit: int = 100,
+                          site_name: str = None, active: Optional[bool] = True) -> List[Dict[str, Any]]:
+        """Get a page of products ordered by ID, starting after the given ID."""
+        conditions = ['id > ?']
+        params = [after_id]
+        
+        if active is not None:
+            conditions.append('active = ?')
+            params.append(1 if active else 0)
+        
+        if site_name:
+            conditions.append('json_extract(urls, ?) IS NOT NULL')
+            params.append(f'$."{site_name}"')
+        
+        params.append(limit)
+        
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.execute(f'''
+                SELECT * FROM products
+                WHERE {' AND '.join(conditions)}
+                ORDER BY id
+                LIMIT ?
+            ''', params)
+            
+            products = []
+            for row in cursor.fetchall():
+                product = dict(row)
+                product['urls'] = json.loads(product['urls'])
+                products.append(product)
+            
+            return products
+    
+    def get_price_history_page(self, product_id: int, days: int = 30, site_name: str = None,
+                               before: Optional[Tuple[str, int]] = None,
+                               limit: int = 500) -> List[Dict[str, Any]]:
+        """Get a page of price history, newest first, starting before a (timestamp, id) key."""
+        start_date = datetime.now() - timedelta(days=days)
+        conditions = ['product_id = ?', 'timestamp >= ?']
+        params = [product_id, start_date]
+        
+        if site_name:
+            conditions.append('site_name = ?')
+            params.append(site_name)
+        
+        if before:
+            before_timestamp, before_id = before
+            conditions.append('(timestamp < ? OR (timestamp = ? AND id < ?))')
+            params.extend([before_timestamp, before_timestamp, before_id])
+        
+        params.append(limit)
+        
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.execute(f'''
+                SELECT * FROM price_history
+                WHERE {' AND '.join(conditions)}
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            ''', params)
+            
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_price_history_signature(self, product_id: int, days: int = 30) -> Tuple[int, int]:
+        """Get (row count, max id) of a product's price history window."""
+        start_date = datetime.now() - timedelta(days=days)
+        
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute('''
+                SELECT COUNT(*), COALESCE(MAX(id), 0) FROM price_history
+                WHERE product_id = ? AND timestamp >= ?
+            ''', (product_id, start_date))
+            
+            count, max_id = cursor.fetchone()
+            return count, max_id
+    
+    def get_data_versions(self) -> Dict[str, Dict[str, Any]]:
+        """Get the change counter and last write time of each versioned table."""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute('''
+                SELECT name, version, updated_at FROM data_versions
+            ''')
+            
+            return {
+                row[0]: {'version': row[1], 'updated_at': row[2]}
+                for row in cursor.fetchall()
+            }
+        
     def get_connection(self):
         """Get a database connection."""
         return sqlite3.connect(self.db_path)
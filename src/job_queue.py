@@ -0,0 +1,130 @@
+"""
+Shared scrape job queue with leases, backed by the SQLite database
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from .database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ScrapeJobQueue:
+    """(product, site, url) jobs shared by several worker processes, using the scrape_jobs table.
+
+    A worker leases jobs for ``lease_seconds``; the lease is taken inside a
+    ``BEGIN IMMEDIATE`` transaction, so two workers never get the same job. A job
+    whose lease runs out (its worker died or hung) goes back to the queue, until
+    it has been leased ``max_attempts`` times, after which it is marked failed.
+    A worker renews the leases on jobs it is still running, so a slow batch keeps
+    them. Results are only accepted from the worker currently holding the lease.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, queue_config: Optional[Dict[str, Any]] = None):
+        queue_config = queue_config or {}
+        self.db_manager = db_manager
+        self.lease_time = timedelta(seconds=float(queue_config.get('lease_seconds', 300)))
+        self.max_attempts = int(queue_config.get('max_attempts', 3))
+
+    def enqueue(self, jobs: Iterable[Tuple[int, str, str, float]], now: datetime = None) -> int:
+        """Add (product_id, site_name, url, priority) jobs, skipping any already queued or running."""
+        now = now or datetime.now()
+        with self.db_manager.get_connection() as conn:
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT INTO scrape_jobs (product_id, site_name, url, priority, status, enqueued_at)
+                SELECT ?, ?, ?, ?, 'pending', ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM scrape_jobs
+                    WHERE product_id = ? AND site_name = ? AND status IN ('pending', 'leased')
+                )
+            ''', [(product_id, site_name, url, priority, now, product_id, site_name)
+                  for product_id, site_name, url, priority in jobs])
+            return conn.total_changes - before
+
+    def lease(self, worker_id: str, limit: int = 1, now: datetime = None) -> List[Dict[str, Any]]:
+        """Claim up to ``limit`` of the highest-priority available jobs for ``worker_id``."""
+        now = now or datetime.now()
+        conn = self.db_manager.get_connection()
+        conn.isolation_level = None
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Jobs whose lease ran out on their last allowed attempt are given up on
+            conn.execute('''
+                UPDATE scrape_jobs SET status = 'failed', finished_at = ?,
+                       result = '{"success": false, "error": "Lease expired"}'
+                WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= ?
+            ''', (now, now, self.max_attempts))
+            rows = conn.execute('''
+                SELECT id, product_id, site_name, url, attempts FROM scrape_jobs
+                WHERE status = 'pending' OR (status = 'leased' AND lease_expires_at < ?)
+                ORDER BY priority DESC, id
+                LIMIT ?
+            ''', (now, limit)).fetchall()
+            conn.executemany('''
+                UPDATE scrape_jobs
+                SET status = 'leased', leased_by = ?, lease_expires_at = ?, attempts = attempts + 1
+                WHERE id = ?
+            ''', [(worker_id, now + self.lease_time, row[0]) for row in rows])
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        return [{'id': job_id, 'product_id': product_id, 'site_name': site_name, 'url': url,
+                 'attempt': attempts + 1}
+                for job_id, product_id, site_name, url, attempts in rows]
+
+    def renew(self, job_ids: Iterable[int], worker_id: str, now: datetime = None) -> List[int]:
+        """Extend ``worker_id``'s leases on ``job_ids``, returning the jobs whose lease was already lost."""
+        now = now or datetime.now()
+        lost = []
+        with self.db_manager.get_connection() as conn:
+            for job_id in job_ids:
+                cursor = conn.execute('''
+                    UPDATE scrape_jobs SET lease_expires_at = ?
+                    WHERE id = ? AND status = 'leased' AND leased_by = ?
+                ''', (now + self.lease_time, job_id, worker_id))
+                if cursor.rowcount == 0:
+                    lost.append(job_id)
+        if lost:
+            logger.warning(f"Worker {worker_id} lost the lease on jobs {lost}")
+        return lost
+
+    def complete(self, job_id: int, worker_id: str, result: Dict[str, Any], now: datetime = None) -> bool:
+        """Store a job's result; False if the lease had already passed to another worker."""
+        now = now or datetime.now()
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.execute('''
+                UPDATE scrape_jobs SET status = ?, result = ?, finished_at = ?
+                WHERE id = ? AND status = 'leased' AND leased_by = ?
+            ''', (DONE if result.get('success') else FAILED, json.dumps(result, default=str), now,
+                  job_id, worker_id))
+            accepted = cursor.rowcount == 1
+        if not accepted:
+            logger.warning(f"Result for job {job_id} from {worker_id} ignored; its lease was lost")
+        return accepted
+
+    def counts(self) -> Dict[str, int]:
+        with self.db_manager.get_connection() as conn:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM scrape_jobs GROUP BY status').fetchall())
+        return {status: counts.get(status, 0) for status in (PENDING, LEASED, DONE, FAILED)}
+
+    def purge_finished(self, older_than: timedelta = timedelta(days=7), now: datetime = None) -> int:
+        """Delete finished jobs older than ``older_than``."""
+        cutoff = (now or datetime.now()) - older_than
+        with self.db_manager.get_connection() as conn:
+            return conn.execute('''
+                DELETE FROM scrape_jobs WHERE status IN ('done', 'failed') AND finished_at < ?
+            ''', (cutoff,)).rowcount
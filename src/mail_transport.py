@@ -0,0 +1,257 @@
+"""
+Pooled SMTP delivery that does not block the asyncio event loop
+"""
+
+import asyncio
+import logging
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from typing import Dict, Any, List, Optional
+
+from .utils import get_retry_delay
+from .metrics import NOTIFICATION_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+def is_permanent_smtp_error(error: Exception) -> bool:
+    """True for SMTP failures that retrying will not fix (rejected sender/recipient, 5xx)."""
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)):
+        return True
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600
+    return False
+
+
+class SMTPSession:
+    """A reusable, authenticated SMTP connection shared by all senders in the process."""
+
+    def __init__(self, email_config: Dict[str, Any], idle_timeout: float = 60.0):
+        self.email_config = email_config
+        self.idle_timeout = idle_timeout
+        self._server = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Open the connection, upgrade to TLS and log in according to the email config."""
+        host = self.email_config.get('smtp_server')
+        port = int(self.email_config.get('smtp_port', 587))
+        timeout = self.email_config.get('timeout', 30)
+
+        if port == 465:
+            server = smtplib.SMTP_SSL(host, port, timeout=timeout)
+        else:
+            server = smtplib.SMTP(host, port, timeout=timeout)
+            if self.email_config.get('use_tls', True):
+                server.starttls()
+
+        # Use SMTP credentials from config (may be different from sender email)
+        smtp_username = self.email_config.get('smtp_username') or self.email_config.get('sender_email')
+        smtp_password = self.email_config.get('smtp_password') or self.email_config.get('sender_password')
+        if smtp_username and smtp_password:
+            server.login(smtp_username, smtp_password)
+
+        logger.debug(f"Opened SMTP session to {host}:{port}")
+        return server
+
+    def _ensure_connected(self):
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            # The server has probably dropped an idle connection; check before reusing it
+            try:
+                if self._server.noop()[0] != 250:
+                    self._close()
+            except smtplib.SMTPException:
+                self._close()
+            except OSError:
+                self._close()
+
+        if self._server is None:
+            self._server = self._connect()
+
+    def send(self, message: Message):
+        """Send one message, reconnecting once if the server dropped the connection."""
+        with self._lock:
+            for attempt in range(2):
+                self._ensure_connected()
+                try:
+                    self._server.sendmail(message['From'], message['To'], message.as_string())
+                    self._last_used = time.monotonic()
+                    return
+                except smtplib.SMTPServerDisconnected:
+                    self._close()
+                    if attempt == 1:
+                        raise
+                except (smtplib.SMTPException, OSError) as e:
+                    if not is_permanent_smtp_error(e):
+                        # Transient failures may leave the session in an unknown state
+                        self._close()
+                    raise
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._server = None
+
+
+class _LoopQueue:
+    """A transport's outgoing queue and delivery worker on one event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, transport: 'MailTransport'):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=transport.queue_size)
+        self.worker = loop.create_task(transport._run_worker(self.queue))
+
+
+class MailTransport:
+    """Queues outgoing email and delivers it in batches over a pooled SMTP session.
+
+    SMTP I/O runs on a single background thread so coroutines never block on the
+    network. Messages queued while a batch is being sent are delivered together on
+    the same session. Transient failures are retried with exponential backoff.
+
+    Threads that each run their own event loop get their own queue and worker but
+    share the SMTP session, which stays open until the last of them has closed.
+    """
+
+    def __init__(self, email_config: Dict[str, Any], queue_size: int = 100, batch_size: int = 10,
+                 max_retries: int = 3, retry_base_delay: float = 1.0):
+        self.session = SMTPSession(email_config, idle_timeout=email_config.get('idle_timeout', 60))
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='smtp')
+        self._queues = {}
+        self._queues_lock = threading.Lock()
+
+    async def send(self, message: Message) -> bool:
+        """Queue a message and wait until it has been delivered or given up on."""
+        queue = self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        # Waits here when the queue is full, pushing back on producers
+        await queue.put((message, future))
+        NOTIFICATION_QUEUE_DEPTH.set(queue.qsize(), channel='email')
+        return await future
+
+    def send_sync(self, message: Message) -> bool:
+        """Deliver a message from synchronous code, reusing the pooled session."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.session.send(message)
+                return True
+            except (smtplib.SMTPException, OSError) as e:
+                if is_permanent_smtp_error(e) or attempt == self.max_retries:
+                    logger.error(f"Failed to send email '{message['Subject']}': {e}")
+                    return False
+                logger.warning(f"Email attempt {attempt + 1} failed, retrying: {e}")
+                time.sleep(get_retry_delay(attempt, self.retry_base_delay))
+        return False
+
+    async def close(self):
+        """Deliver anything queued on the running loop, then close the SMTP session
+        unless another loop is still using it."""
+        with self._queues_lock:
+            state = self._queues.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state.queue.join()
+            state.worker.cancel()
+
+        with self._queues_lock:
+            self._drop_closed_loops()
+            if self._queues:
+                return
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.session.close)
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        """Start the delivery worker for the current event loop if needed."""
+        loop = asyncio.get_running_loop()
+        with self._queues_lock:
+            state = self._queues.get(loop)
+            if state is None or state.worker.done():
+                # Each loop gets its own queue; the SMTP session itself is shared
+                self._drop_closed_loops()
+                state = self._queues[loop] = _LoopQueue(loop, self)
+            return state.queue
+
+    def _drop_closed_loops(self):
+        """Forget loops that were closed without close(); called with the lock held."""
+        for finished in [loop for loop in self._queues if loop.is_closed()]:
+            logger.debug("Dropping mail queue of a closed event loop")
+            del self._queues[finished]
+
+    async def _run_worker(self, queue: asyncio.Queue):
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            NOTIFICATION_QUEUE_DEPTH.set(queue.qsize(), channel='email')
+
+            try:
+                await self._deliver_with_retries(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _deliver_with_retries(self, batch: List):
+        loop = asyncio.get_running_loop()
+        pending = batch
+
+        for attempt in range(self.max_retries + 1):
+            errors = await loop.run_in_executor(
+                self._executor, self._deliver_batch, [message for message, _ in pending]
+            )
+
+            retry = []
+            for (message, future), error in zip(pending, errors):
+                if error is None:
+                    self._resolve(future, True)
+                elif is_permanent_smtp_error(error) or attempt == self.max_retries:
+                    logger.error(f"Failed to send email '{message['Subject']}': {error}")
+                    self._resolve(future, False)
+                else:
+                    retry.append((message, future))
+
+            pending = retry
+            if not pending:
+                return
+
+            delay = get_retry_delay(attempt, self.retry_base_delay)
+            logger.warning(f"Retrying {len(pending)} email(s) in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def _deliver_batch(self, messages: List[Message]) -> List[Optional[Exception]]:
+        """Send messages over one session, returning the error (or None) for each."""
+        errors = []
+        for message in messages:
+            try:
+                self.session.send(message)
+                errors.append(None)
+            except (smtplib.SMTPException, OSError) as e:
+                errors.append(e)
+
+        sent = errors.count(None)
+        if sent:
+            logger.debug(f"Delivered {sent}/{len(messages)} email(s) in one SMTP session")
+        return errors
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: bool):
+        if not future.done():
+            future.set_result(result)
@@ -0,0 +1,293 @@
+"""
+In-process metrics registry with Prometheus text exposition
+"""
+
+import functools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds in seconds; +Inf is always added
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+NETWORK_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+RUN_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value) -> List[str]:
+        return [f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}']
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """A value that only goes up."""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    """Counts observations into cumulative buckets, with their sum and count."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of a with-block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def _render_sample(self, key, state) -> List[str]:
+        bucket_counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, bucket_counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.label_names, key, 'le="+Inf"')
+        lines.append(f'{self.name}_bucket{labels} {count}')
+        plain = _format_labels(self.label_names, key)
+        lines.append(f'{self.name}_sum{plain} {_format_value(total)}')
+        lines.append(f'{self.name}_count{plain} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric of the process and renders them for Prometheus.
+
+    Values are per process: behind several gunicorn workers, each ``/metrics``
+    request sees only the worker that answered it.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        """Text exposition format 0.0.4."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        """Write all metrics to a file atomically, for node_exporter's textfile collector."""
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        """Reset every metric's values (the metrics stay registered)."""
+        with self._lock:
+            for metric in self._metrics.values():
+                metric.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+FETCH_SECONDS = REGISTRY.histogram(
+    'price_tracker_fetch_seconds', 'Time to fetch a product page, including retries.',
+    ('site', 'outcome'), NETWORK_BUCKETS)
+FETCH_RETRIES = REGISTRY.counter(
+    'price_tracker_fetch_retries_total', 'Page fetch attempts after the first one.', ('site',))
+HTTP_ERRORS = REGISTRY.counter(
+    'price_tracker_http_errors_total', 'Non-200 responses and request exceptions while fetching pages.',
+    ('site', 'status'))
+RESPONSE_BYTES = REGISTRY.counter(
+    'price_tracker_response_bytes_total', 'Page body bytes read with streamed fetching.', ('site',))
+STREAM_EARLY_STOPS = REGISTRY.counter(
+    'price_tracker_stream_early_stops_total', 'Streamed page downloads stopped before the end of the body.',
+    ('site', 'reason'))
+PARSE_SECONDS = REGISTRY.histogram(
+    'price_tracker_parse_seconds', 'Time to parse fetched HTML.', ('site',))
+EXTRACT_SECONDS = REGISTRY.histogram(
+    'price_tracker_extract_seconds', 'Time spent in a site extractor after parsing.', ('site', 'extractor'))
+SELECTOR_EVALUATIONS = REGISTRY.histogram(
+    'price_tracker_selector_evaluations', 'CSS selectors evaluated to extract one page.', ('site',), COUNT_BUCKETS)
+STRUCTURED_DATA_PAGES = REGISTRY.counter(
+    'price_tracker_structured_data_pages_total', 'Pages tried with the structured-data fast path, by outcome.',
+    ('site', 'outcome'))
+STRUCTURED_DATA_SECONDS_SAVED = REGISTRY.counter(
+    'price_tracker_structured_data_seconds_saved_total',
+    'Estimated parse and selector time skipped by structured-data hits.', ('site',))
+SCRAPE_RESULTS = REGISTRY.counter(
+    'price_tracker_scrape_results_total', 'Scrape results by site and outcome.', ('site', 'outcome'))
+SCRAPE_QUEUE_DEPTH = REGISTRY.gauge(
+    'price_tracker_scrape_queue_depth', 'Scrape jobs waiting for a concurrency slot.')
+SCRAPES_IN_FLIGHT = REGISTRY.gauge(
+    'price_tracker_scrapes_in_flight', 'Scrape jobs currently running.')
+SITE_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    'price_tracker_site_concurrency_limit', 'Current adaptive concurrency window per site.', ('site',))
+CONCURRENCY_BACKOFFS = REGISTRY.counter(
+    'price_tracker_concurrency_backoffs_total', 'Times a site window was reduced, by cause.', ('site', 'reason'))
+CIRCUIT_STATE = REGISTRY.gauge(
+    'price_tracker_circuit_state', 'Per-site circuit breaker state (0 closed, 1 half-open, 2 open).', ('site',))
+CIRCUIT_REJECTIONS = REGISTRY.counter(
+    'price_tracker_circuit_rejections_total', 'Scrape jobs failed immediately by an open circuit.', ('site',))
+SCRAPE_RUN_SECONDS = REGISTRY.histogram(
+    'price_tracker_scrape_run_seconds', 'Duration of a full scrape of all products.', (), RUN_BUCKETS)
+SCRAPE_RUN_LAST_COMPLETED = REGISTRY.gauge(
+    'price_tracker_scrape_run_last_completed_timestamp_seconds', 'Unix time the last full scrape finished.')
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    'price_tracker_db_query_seconds', 'Latency of DatabaseManager methods.', ('method',))
+NOTIFICATION_QUEUE_DEPTH = REGISTRY.gauge(
+    'price_tracker_notification_queue_depth', 'Notifications waiting to be delivered.', ('channel',))
+
+
+def instrument_methods(histogram: Histogram, label: str = 'method', exclude: Iterable[str] = ()):
+    """Class decorator that times every public method into ``histogram``, labelled by method name."""
+    exclude = set(exclude)
+
+    def decorate(cls):
+        for name, attribute in list(vars(cls).items()):
+            if name.startswith('_') or name in exclude:
+                continue
+            if isinstance(attribute, (staticmethod, classmethod, property)) or not callable(attribute):
+                continue
+            setattr(cls, name, _timed(attribute, histogram, {label: name}))
+        return cls
+
+    return decorate
+
+
+def _timed(function, histogram: Histogram, labels: Dict[str, str]):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with histogram.time(**labels):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def endpoint_enabled() -> bool:
+    """Whether the web UI serves /metrics; turned off with METRICS_ENABLED=false."""
+    return os.environ.get('METRICS_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+
+
+def write_textfile_from_env(registry: Optional[MetricsRegistry] = None) -> Optional[str]:
+    """Write metrics to $METRICS_TEXTFILE if it is set, returning the path written."""
+    path = os.environ.get('METRICS_TEXTFILE')
+    if not path:
+        return None
+    (registry or REGISTRY).write_textfile(path)
+    return path
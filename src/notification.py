@@ -2,14 +2,16 @@
 Notification system for price alerts
 """
 
-import smtplib
+import asyncio
 import logging
-import aiohttp
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import List, Dict, Any
 from datetime import datetime
 
+from .mail_transport import MailTransport
+from .webhook_dispatcher import WebhookDispatcher
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,21 +21,35 @@ class NotificationManager:
     def __init__(self, config):
         self.config = config
         self.notification_config = config.notification_config
+        self.mail_transport = MailTransport(self.notification_config.get('email', {}))
+        self.webhook_dispatcher = WebhookDispatcher.from_config(self.notification_config.get('webhook', {}))
+    
+    def has_enabled_channel(self) -> bool:
+        """True if email or webhook notifications are enabled."""
+        return any(
+            self.notification_config.get(channel, {}).get('enabled', False)
+            for channel in ('email', 'webhook')
+        )
     
-    async def send_price_alerts(self, alerts: List[Dict[str, Any]]):
-        """Send notifications for price alerts."""
+    async def send_price_alerts(self, alerts: List[Dict[str, Any]]) -> bool:
+        """Send notifications for price alerts, returning True if any channel delivered them."""
         if not alerts:
-            return
+            return False
+        
+        sends = []
         
         # Send email notifications
         if self.notification_config.get('email', {}).get('enabled', False):
-            await self._send_email_alerts(alerts)
+            sends.append(self._send_email_alerts(alerts))
         
         # Send webhook notifications
         if self.notification_config.get('webhook', {}).get('enabled', False):
-            await self._send_webhook_alerts(alerts)
+            sends.append(self._send_webhook_alerts(alerts))
+        
+        results = await asyncio.gather(*sends)
+        return any(results)
     
-    async def _send_email_alerts(self, alerts: List[Dict[str, Any]]):
+    async def _send_email_alerts(self, alerts: List[Dict[str, Any]]) -> bool:
         """Send email notifications for price alerts."""
         email_config = self.notification_config.get('email', {})
         
@@ -50,31 +66,23 @@ class NotificationManager:
             
             msg.attach(MIMEText(body, 'html'))
             
-            # Send email
-            server = smtplib.SMTP(email_config.get('smtp_server'), email_config.get('smtp_port'))
-            server.starttls()
-            # Use SMTP credentials from config (may be different from sender email)
-            smtp_username = email_config.get('smtp_username') or email_config.get('sender_email')
-            smtp_password = email_config.get('smtp_password') or email_config.get('sender_password')
-            server.login(smtp_username, smtp_password)
-            
-            text = msg.as_string()
-            server.sendmail(email_config.get('sender_email'), 
-                          email_config.get('recipient_email'), text)
-            server.quit()
-            
-            logger.info(f"Email alert sent for {len(alerts)} products")
+            # Queue on the pooled SMTP session without blocking the event loop
+            if await self.mail_transport.send(msg):
+                logger.info(f"Email alert sent for {len(alerts)} products")
+                return True
             
         except Exception as e:
             logger.error(f"Failed to send email alert: {e}")
+        
+        return False
     
-    async def _send_webhook_alerts(self, alerts: List[Dict[str, Any]]):
+    async def _send_webhook_alerts(self, alerts: List[Dict[str, Any]]) -> bool:
         """Send webhook notifications for price alerts."""
         webhook_config = self.notification_config.get('webhook', {})
         webhook_url = webhook_config.get('url')
         
         if not webhook_url:
-            return
+            return False
         
         try:
             payload = {
@@ -92,15 +100,15 @@ class NotificationManager:
                     'savings': alert['target_price'] - alert['current_price']
                 })
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(webhook_url, json=payload) as response:
-                    if response.status == 200:
-                        logger.info(f"Webhook alert sent for {len(alerts)} products")
-                    else:
-                        logger.error(f"Webhook failed with status {response.status}")
+            # Coalesced with other events published at the same time
+            if await self.webhook_dispatcher.publish(payload):
+                logger.info(f"Webhook alert sent for {len(alerts)} products")
+                return True
                         
         except Exception as e:
             logger.error(f"Failed to send webhook alert: {e}")
+        
+        return False
     
     def _create_email_body(self, alerts: List[Dict[str, Any]]) -> str:
         """Create HTML email body for price alerts."""
@@ -172,8 +180,9 @@ class NotificationManager:
                     'current_price': 19.99,
                     'target_price': 25.00
                 }]
-                await self._send_email_alerts(test_alerts)
-                test_result['email']['success'] = True
+                test_result['email']['success'] = await self._send_email_alerts(test_alerts)
+                if not test_result['email']['success']:
+                    test_result['email']['error'] = 'Email could not be delivered, see logs'
             except Exception as e:
                 test_result['email']['error'] = str(e)
         
@@ -187,8 +196,9 @@ class NotificationManager:
                     'current_price': 19.99,
                     'target_price': 25.00
                 }]
-                await self._send_webhook_alerts(test_alerts)
-                test_result['webhook']['success'] = True
+                test_result['webhook']['success'] = await self._send_webhook_alerts(test_alerts)
+                if not test_result['webhook']['success']:
+                    test_result['webhook']['error'] = 'Webhook could not be delivered, see logs'
             except Exception as e:
                 test_result['webhook']['error'] = str(e)
         
@@ -196,43 +206,87 @@ class NotificationManager:
     
     def send_email(self, subject: str, message: str, html_message: str = None) -> bool:
         """Send a simple email notification (synchronous version)."""
-        email_config = self.notification_config.get('email', {})
-        
-        if not email_config.get('enabled', False):
-            logger.warning("Email notifications are disabled")
+        msg = self._build_email(subject, message, html_message)
+        if msg is None:
             return False
         
         try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['From'] = email_config.get('sender_email')
-            msg['To'] = email_config.get('recipient_email')
-            msg['Subject'] = subject
-            
-            # Add text content
-            if message:
-                msg.attach(MIMEText(message, 'plain'))
-            
-            # Add HTML content if provided
-            if html_message:
-                msg.attach(MIMEText(html_message, 'html'))
-            
-            # Send email
-            server = smtplib.SMTP(email_config.get('smtp_server'), email_config.get('smtp_port'))
-            server.starttls()
-            # Use SMTP credentials from config (may be different from sender email)
-            smtp_username = email_config.get('smtp_username') or email_config.get('sender_email')
-            smtp_password = email_config.get('smtp_password') or email_config.get('sender_password')
-            server.login(smtp_username, smtp_password)
-            
-            text = msg.as_string()
-            server.sendmail(email_config.get('sender_email'), 
-                          email_config.get('recipient_email'), text)
-            server.quit()
-            
-            logger.info(f"Email sent successfully: {subject}")
-            return True
+            if self.mail_transport.send_sync(msg):
+                logger.info(f"Email sent successfully: {subject}")
+                return True
+            return False
             
         except Exception as e:
             logger.error(f"Failed to send email: {e}")
             return False
+    
+    async def send_email_async(self, subject: str, message: str, html_message: str = None) -> bool:
+        """Send a simple email notification without blocking the event loop."""
+        msg = self._build_email(subject, message, html_message)
+        if msg is None:
+            return False
+        
+        if await self.mail_transport.send(msg):
+            logger.info(f"Email sent successfully: {subject}")
+            return True
+        return False
+    
+    def _build_email(self, subject: str, message: str, html_message: str = None):
+        """Build a text/HTML email, or return None if email is disabled."""
+        email_config = self.notification_config.get('email', {})
+        
+        if not email_config.get('enabled', False):
+            logger.warning("Email notifications are disabled")
+            return None
+        
+        msg = MIMEMultipart('alternative')
+        msg['From'] = email_config.get('sender_email')
+        msg['To'] = email_config.get('recipient_email')
+        msg['Subject'] = subject
+        
+        # Add text content
+        if message:
+            msg.attach(MIMEText(message, 'plain'))
+        
+        # Add HTML content if provided
+        if html_message:
+            msg.attach(MIMEText(html_message, 'html'))
+        
+        return msg
+    
+    async def send_webhook(self, data: Dict[str, Any]) -> bool:
+        """Send an event to the configured webhook, batched with any sent at the same time."""
+        webhook_config = self.notification_config.get('webhook', {})
+        
+        if not webhook_config.get('enabled', False) or not webhook_config.get('url'):
+            logger.warning("Webhook notifications are disabled")
+            return False
+        
+        return await self.webhook_dispatcher.publish(data)
+    
+    async def send_notification(self, subject: str, message: str, html_message: str = None) -> bool:
+        """Send a message through every enabled channel, returning True if any succeeded."""
+        sends = []
+        
+        if self.notification_config.get('email', {}).get('enabled', False):
+            sends.append(self.send_email_async(subject, message, html_message))
+        
+        if self.notification_config.get('webhook', {}).get('enabled', False):
+            sends.append(self.send_webhook({
+                'type': 'notification',
+                'timestamp': datetime.now().isoformat(),
+                'subject': subject,
+                'message': message
+            }))
+        
+        if not sends:
+            logger.warning("No notification channels are enabled")
+            return False
+        
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        return any(result is True for result in results)
+    
+    async def close(self):
+        """Deliver anything still queued and close pooled connections."""
+        await self.webhook_dispatcher.close()
+        await self.mail_transport.close()
@@ -0,0 +1,107 @@
+"""
+Single-pass matching of many special-offer selectors against one document
+
+``soup.select`` walks the whole tree once per selector, and the special-offer
+list has around 25 of them, several with ``:contains("£")``. Only elements
+whose text contains a pound sign can give an offer price, so
+``OfferMatcher`` first marks every element with a "£" somewhere below it.
+That takes one pass over the strings, adding each match's ancestors. It then
+walks only the marked part of the tree, testing each element against all the
+precompiled selectors, with their now redundant ``:contains("£")`` tests removed,
+and checks the individual selectors only for elements that match their union.
+"""
+
+import logging
+import re
+from typing import List, Optional, Tuple
+
+import soupsieve
+from bs4 import BeautifulSoup, Tag
+
+logger = logging.getLogger(__name__)
+
+_MARKER_CHECK = re.compile(r':(-soup-)?contains\(\s*["\']([^"\']*)["\']\s*\)')
+
+# (selector, [(element, its stripped text)]) in selector order, elements in document order
+Candidates = List[Tuple[str, List[Tuple[Tag, str]]]]
+
+
+class OfferMatcher:
+    """Precompiled special-offer selectors evaluated together in one traversal.
+
+    ``candidates`` gives, for each selector, the same elements as
+    ``soup.select(selector)`` that have a "£" in their stripped text. A selector
+    that fails to compile or match is left out, as the per-selector loop skipped
+    it.
+    """
+
+    def __init__(self, selectors: List[str], marker: str = '£'):
+        self.marker = marker
+        self.rules = []
+        for selector in selectors:
+            try:
+                self.rules.append((selector, soupsieve.compile(self._without_marker_check(selector))))
+            except Exception as e:
+                logger.debug(f"Error with special offer selector {selector}: {e}")
+        # Most marked elements match none of the selectors: one test against
+        # their union rules those out without a matcher setup per selector
+        self.any_rule = soupsieve.compile(', '.join(rule.pattern for _, rule in self.rules)) if self.rules else None
+
+    def _without_marker_check(self, selector: str) -> str:
+        """Drop ``:contains("£")`` tests, which re-read the element's whole subtree.
+
+        Every candidate must already have the marker in its text, and that text is
+        part of what ``:contains`` reads, so the test cannot change the result.
+        This is not true under ``:not()``, so such selectors are left unchanged.
+        """
+        if ':not(' in selector:
+            return selector
+        return _MARKER_CHECK.sub(lambda match: '' if match.group(2) == self.marker else match.group(0), selector)
+
+    def _marked(self, soup: BeautifulSoup) -> set:
+        """ids of the elements with the marker somewhere in their strings."""
+        marked = set()
+        for string in soup.find_all(string=lambda text: self.marker in text):
+            parent = string.parent
+            while parent is not None and id(parent) not in marked:
+                marked.add(id(parent))
+                parent = parent.parent
+        return marked
+
+    def candidates(self, soup: BeautifulSoup) -> Candidates:
+        if not self.rules:
+            return []
+        marked = self._marked(soup)
+        any_rule = self.any_rule
+        matches: List[Optional[List[Tag]]] = [[] for _ in self.rules]
+        texts = {}
+
+        # Pre-order walk of the marked elements only, so matches stay in document order
+        stack = [child for child in reversed(soup.contents) if isinstance(child, Tag) and id(child) in marked]
+        while stack:
+            element = stack.pop()
+            stack.extend(child for child in reversed(element.contents)
+                         if isinstance(child, Tag) and id(child) in marked)
+            if any_rule is not None:
+                try:
+                    if not any_rule.match(element):
+                        continue
+                except Exception:
+                    any_rule = None  # let the individual rules find, and drop, the one that fails
+            for index, (selector, rule) in enumerate(self.rules):
+                if matches[index] is None:
+                    continue
+                try:
+                    matched = rule.match(element)
+                except Exception as e:
+                    logger.debug(f"Error with special offer selector {selector}: {e}")
+                    matches[index] = None
+                    continue
+                if matched:
+                    if id(element) not in texts:
+                        texts[id(element)] = element.get_text(strip=True)
+                    if self.marker in texts[id(element)]:
+                        matches[index].append(element)
+
+        return [(selector, [(element, texts[id(element)]) for element in elements])
+                for (selector, _), elements in zip(self.rules, matches) if elements is not None]
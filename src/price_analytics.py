@@ -0,0 +1,280 @@
+"""
+Vectorised price-change and anomaly analysis over price history
+"""
+
+import logging
+import warnings
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from .database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 1.4826
+
+
+@dataclass
+class PriceSeries:
+    """Every (product, site) price series packed into flat arrays.
+
+    Rows are sorted by series and then by time; ``starts[k]`` and ``ends[k]``
+    delimit series ``k`` (identified by ``keys[k]``) and ``series_index`` maps
+    each row back to its series.
+    """
+    keys: List[Tuple[int, str]]
+    prices: np.ndarray
+    timestamps: np.ndarray
+    row_ids: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+    series_index: np.ndarray
+
+    @property
+    def size(self) -> int:
+        return len(self.prices)
+
+
+def load_price_series(db_manager: DatabaseManager, days: Optional[int] = None,
+                      latest: Optional[int] = None) -> PriceSeries:
+    """Load positive prices for all active products in one query.
+
+    ``days`` limits the history by age and ``latest`` keeps only the most recent
+    N rows of each series.
+    """
+    conditions = ['h.price > 0', 'p.active = 1']
+    params = []
+    if days is not None:
+        conditions.append('h.timestamp >= ?')
+        params.append(datetime.now() - timedelta(days=days))
+
+    if latest is None:
+        # Served in order straight from idx_price_history_product_site_time
+        query = f'''
+            SELECT h.id, h.product_id, h.site_name, h.price, h.timestamp
+            FROM price_history h
+            JOIN products p ON p.id = h.product_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY h.product_id, h.site_name, h.timestamp, h.id
+        '''
+    else:
+        query = f'''
+            SELECT id, product_id, site_name, price, timestamp FROM (
+                SELECT h.id, h.product_id, h.site_name, h.price, h.timestamp,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY h.product_id, h.site_name ORDER BY h.timestamp DESC, h.id DESC
+                       ) as rn
+                FROM price_history h
+                JOIN products p ON p.id = h.product_id
+                WHERE {' AND '.join(conditions)}
+            )
+            WHERE rn <= ?
+            ORDER BY product_id, site_name, timestamp, id
+        '''
+        params.append(latest)
+
+    with db_manager.get_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+
+    if not rows:
+        empty = np.array([], dtype=np.int64)
+        return PriceSeries([], np.array([], dtype=float), np.array([], dtype='datetime64[us]'),
+                           empty, empty, empty, empty)
+
+    row_ids, product_ids, site_names, prices, timestamps = zip(*rows)
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    site_codes, site_lookup = _encode(site_names)
+
+    # A new series starts wherever the (product, site) pair changes
+    boundary = np.ones(len(rows), dtype=bool)
+    boundary[1:] = (product_ids[1:] != product_ids[:-1]) | (site_codes[1:] != site_codes[:-1])
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], len(rows))
+
+    return PriceSeries(
+        keys=[(int(product_ids[i]), str(site_lookup[site_codes[i]])) for i in starts],
+        prices=np.asarray(prices, dtype=float),
+        timestamps=np.array([str(ts).replace(' ', 'T') for ts in timestamps], dtype='datetime64[us]'),
+        row_ids=np.asarray(row_ids, dtype=np.int64),
+        starts=starts,
+        ends=ends,
+        series_index=np.cumsum(boundary) - 1
+    )
+
+
+def _encode(values) -> Tuple[np.ndarray, List[str]]:
+    lookup, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return codes.reshape(-1), list(lookup)
+
+
+def rolling_median_mad(series: PriceSeries, window: int,
+                       include_current: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rolling median, MAD and sample count for every row, never crossing series boundaries.
+
+    With ``include_current=False`` the window covers the ``window`` rows before
+    each row, which is the baseline a new price should be judged against.
+    """
+    if series.size == 0:
+        empty = np.array([], dtype=float)
+        return empty, empty, np.array([], dtype=np.int64)
+
+    positions = np.arange(series.size)
+    offset = 0 if include_current else 1
+    # window x rows matrix of indices into prices, newest first
+    index = positions[:, None] - offset - np.arange(window)[None, :]
+    valid = index >= series.starts[series.series_index][:, None]
+
+    values = np.where(valid, series.prices[np.clip(index, 0, None)], np.nan)
+    counts = valid.sum(axis=1)
+
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        # Rows with an empty window give 'All-NaN slice' warnings and a NaN median
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(values, axis=1)
+        mad = np.nanmedian(np.abs(values - median[:, None]), axis=1)
+    return median, mad, counts
+
+
+def percent_change(series: PriceSeries) -> np.ndarray:
+    """Percent change from the previous price in the same series (NaN for the first)."""
+    change = np.full(series.size, np.nan)
+    if series.size > 1:
+        previous = series.prices[:-1]
+        same_series = series.series_index[1:] == series.series_index[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change[1:] = np.where(same_series, (series.prices[1:] - previous) / previous * 100, np.nan)
+    return change
+
+
+def robust_z_scores(prices: np.ndarray, median: np.ndarray, mad: np.ndarray) -> np.ndarray:
+    """Distance from the median in scaled-MAD units; infinite when MAD is zero and the price differs."""
+    spread = mad * MAD_SCALE
+    deviation = prices - median
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(spread > 0, deviation / spread, np.where(deviation == 0, 0.0, np.sign(deviation) * np.inf))
+    return z
+
+
+class PriceAnomalyDetector:
+    """Flags scraped prices that are implausible compared with a series' recent history.
+
+    A price is suspicious when it is at least ``max_ratio`` times above or below
+    the rolling median, or when its robust z-score exceeds ``z_threshold`` and it
+    also differs from the median by more than ``min_change_percent``. Series with
+    fewer than ``min_history`` prices are never flagged. A suspicious level that
+    repeats ``confirm_after`` times in a row is accepted as a genuine change.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, anomaly_config: Optional[Dict[str, Any]] = None):
+        anomaly_config = anomaly_config or {}
+        self.db_manager = db_manager
+        self.enabled = anomaly_config.get('enabled', True)
+        self.window = int(anomaly_config.get('window', 10))
+        self.min_history = int(anomaly_config.get('min_history', 3))
+        self.max_ratio = float(anomaly_config.get('max_ratio', 3.0))
+        self.z_threshold = float(anomaly_config.get('z_threshold', 6.0))
+        self.min_change = float(anomaly_config.get('min_change_percent', 50.0)) / 100
+        self.confirm_after = int(anomaly_config.get('confirm_after', 3))
+        self._baselines = None
+
+    def load_baselines(self) -> Dict[Tuple[int, str], Tuple[float, float, int]]:
+        """Compute (median, MAD, count) of the latest ``window`` prices of every series in one pass."""
+        series = load_price_series(self.db_manager, latest=self.window)
+        median, mad, counts = rolling_median_mad(series, self.window)
+
+        last_rows = series.ends - 1
+        self._baselines = {
+            key: (float(median[row]), float(mad[row]), int(counts[row]))
+            for key, row in zip(series.keys, last_rows)
+        }
+        logger.debug(f"Loaded price baselines for {len(self._baselines)} series")
+        return self._baselines
+
+    def check(self, product_id: int, site_name: str, price: float) -> Optional[str]:
+        """Return why a price looks wrong, or None if it is plausible."""
+        if not self.enabled or price is None:
+            return None
+        if self._baselines is None:
+            self.load_baselines()
+
+        baseline = self._baselines.get((product_id, site_name))
+        if baseline is None or baseline[2] < self.min_history or baseline[0] <= 0:
+            return None
+
+        median, mad, _ = baseline
+        reason = self._classify(price, median, mad)
+        if reason is None:
+            return None
+
+        if self._confirmed_by_repeats(product_id, site_name, price):
+            logger.info(f"Accepting repeated price change for product {product_id} on {site_name}: "
+                        f"£{median:.2f} -> £{price:.2f}")
+            return None
+        return reason
+
+    def _classify(self, price: float, median: float, mad: float) -> Optional[str]:
+        ratio = price / median
+        if ratio >= self.max_ratio or ratio <= 1 / self.max_ratio:
+            return f"price £{price:.2f} is {ratio:.2f}x the recent median £{median:.2f}"
+
+        z = robust_z_scores(np.array([price]), np.array([median]), np.array([mad]))[0]
+        if abs(z) > self.z_threshold and abs(ratio - 1) > self.min_change:
+            return f"price £{price:.2f} is {abs(ratio - 1) * 100:.0f}% from the recent median £{median:.2f}"
+        return None
+
+    def _confirmed_by_repeats(self, product_id: int, site_name: str, price: float) -> bool:
+        """True if the previous rejected prices for this series were all at this level."""
+        if self.confirm_after <= 1:
+            return True
+        with self.db_manager.get_connection() as conn:
+            previous = [row[0] for row in conn.execute('''
+                SELECT price FROM price_anomalies
+                WHERE product_id = ? AND site_name = ? AND detected_at > COALESCE(
+                    (SELECT MAX(timestamp) FROM price_history WHERE product_id = ? AND site_name = ?), ''
+                )
+                ORDER BY id DESC LIMIT ?
+            ''', (product_id, site_name, product_id, site_name, self.confirm_after - 1))]
+        return (len(previous) == self.confirm_after - 1
+                and all(abs(p - price) <= 0.1 * price for p in previous))
+
+    def record(self, product_id: int, site_name: str, price: float, reason: str):
+        """Keep a rejected price so repeats can be recognised and bad scrapes reviewed."""
+        baseline = (self._baselines or {}).get((product_id, site_name), (None, None, 0))
+        with self.db_manager.get_connection() as conn:
+            conn.execute('''
+                INSERT INTO price_anomalies
+                (product_id, site_name, price, baseline_median, reason, detected_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (product_id, site_name, price, baseline[0], reason, datetime.now()))
+
+
+def analyse_catalogue(db_manager: DatabaseManager, days: int = 90, window: int = 10,
+                      z_threshold: float = 6.0) -> List[Dict[str, Any]]:
+    """Latest price, change and z-score of every (product, site) series, computed in one pass."""
+    series = load_price_series(db_manager, days=days)
+    if series.size == 0:
+        return []
+
+    change = percent_change(series)
+    median, mad, counts = rolling_median_mad(series, window, include_current=False)
+    z = robust_z_scores(series.prices, median, mad)
+
+    report = []
+    for key, start, end in zip(series.keys, series.starts, series.ends):
+        last = end - 1
+        report.append({
+            'product_id': key[0],
+            'site_name': key[1],
+            'observations': int(end - start),
+            'latest_price': float(series.prices[last]),
+            'latest_at': str(series.timestamps[last]),
+            'change_percent': None if np.isnan(change[last]) else round(float(change[last]), 2),
+            'rolling_median': None if np.isnan(median[last]) else float(median[last]),
+            'z_score': None if counts[last] == 0 or np.isnan(z[last]) else float(z[last]),
+            'outlier': bool(counts[last] > 0 and abs(z[last]) > z_threshold)
+        })
+    return report
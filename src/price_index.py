@@ -0,0 +1,216 @@
+"""
+Incrementally maintained index of the latest and best price per product
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Iterable, Set
+
+from .database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# If multiple stores have the same lowest price, prefer in order: JJ Food Service, A to Z, Amazon
+STORE_PRIORITY = {'jjfoodservice': 1, 'atoz_catering': 2, 'amazon_uk': 3}
+
+# Keep IN (...) lists well below SQLite's bound parameter limit
+QUERY_CHUNK_SIZE = 500
+
+
+class BestPriceIndex:
+    """Keeps each active product's latest price per store, and its best and worst store, in memory.
+
+    refresh() only re-reads the products whose price history gained rows since the
+    last refresh, found by scanning price_history IDs above the last one seen. Updates
+    and deletes are detected through the data_versions counters and fall back to a
+    full rebuild.
+    """
+
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+        self._lock = threading.Lock()
+        self._products = {}        # product_id -> {'name', 'urls'} for active products
+        self._latest = {}          # product_id -> {site_name: {'price', 'timestamp', 'id'}}
+        self._best_options = {}    # product_id -> cheapest options (ties included)
+        self._last_history_id = 0
+        self._versions = None
+
+    def refresh(self) -> Set[int]:
+        """Bring the index up to date, returning the IDs of products whose prices changed."""
+        with self._lock:
+            conn = self.db_manager.get_connection()
+            try:
+                # One read transaction so the counters and rows come from the same snapshot
+                conn.execute('BEGIN')
+                versions = self._read_versions(conn)
+
+                if self._versions is None:
+                    changed = self._rebuild(conn)
+                else:
+                    changed = set()
+                    if versions['products'] != self._versions['products']:
+                        changed |= self._load_products(conn)
+                    if versions['price_history'] != self._versions['price_history']:
+                        history_writes = versions['price_history'] - self._versions['price_history']
+                        changed |= self._apply_new_history(conn, history_writes)
+
+                self._versions = versions
+                conn.commit()
+            finally:
+                conn.close()
+
+            for product_id in changed:
+                self._update_best_options(product_id)
+
+            if changed:
+                logger.debug(f"Price index refreshed {len(changed)} products")
+            return changed
+
+    def best_prices(self) -> Dict[int, List[Dict[str, Any]]]:
+        """Get the cheapest current option(s) for each active product that has prices."""
+        self.refresh()
+        with self._lock:
+            return {
+                product_id: options
+                for product_id, options in self._best_options.items()
+                if product_id in self._products
+            }
+
+    def latest_prices(self) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        """Get the latest price per store for each active product that has prices."""
+        self.refresh()
+        with self._lock:
+            return {
+                product_id: dict(self._latest[product_id])
+                for product_id in self._products
+                if self._latest.get(product_id)
+            }
+
+    def product_info(self, product_id: int) -> Dict[str, Any]:
+        """Get the cached name and URLs of an active product."""
+        with self._lock:
+            return self._products.get(product_id, {})
+
+    def _read_versions(self, conn) -> Dict[str, int]:
+        cursor = conn.execute('SELECT name, version FROM data_versions')
+        return {name: version for name, version in cursor.fetchall()}
+
+    def _rebuild(self, conn) -> Set[int]:
+        """Load every active product and its latest prices from scratch."""
+        self._latest = {}
+        self._best_options = {}
+        self._load_products(conn)
+
+        self._last_history_id = conn.execute(
+            'SELECT COALESCE(MAX(id), 0) FROM price_history'
+        ).fetchone()[0]
+        self._load_latest(conn, None)
+
+        logger.info(f"Price index rebuilt for {len(self._latest)} products")
+        return set(self._latest) | set(self._products)
+
+    def _load_products(self, conn) -> Set[int]:
+        """Reload active product metadata, returning the products that were added, removed or edited."""
+        products = {}
+        for product_id, name, urls_json in conn.execute(
+            'SELECT id, name, urls FROM products WHERE active = 1'
+        ):
+            products[product_id] = {
+                'name': name,
+                'urls': json.loads(urls_json) if urls_json else {}
+            }
+
+        changed = {
+            product_id for product_id in set(products) | set(self._products)
+            if products.get(product_id) != self._products.get(product_id)
+        }
+        self._products = products
+        return changed
+
+    def _apply_new_history(self, conn, history_writes: int) -> Set[int]:
+        """Re-read latest prices for products with new price_history rows."""
+        rows = conn.execute('''
+            SELECT product_id, COUNT(*), MAX(id)
+            FROM price_history
+            WHERE id > ?
+            GROUP BY product_id
+        ''', (self._last_history_id,)).fetchall()
+
+        inserted = sum(row[1] for row in rows)
+        if inserted != history_writes:
+            # Rows were updated or deleted, which the ID scan cannot see
+            logger.info("Price history was modified in place; rebuilding price index")
+            return self._rebuild(conn)
+
+        changed = {row[0] for row in rows}
+        if rows:
+            self._last_history_id = max(row[2] for row in rows)
+            self._load_latest(conn, changed)
+        return changed
+
+    def _load_latest(self, conn, product_ids: Iterable[int] = None):
+        """Load the latest positive price per store for the given products (or all products)."""
+        query = '''
+            SELECT product_id, site_name, price, timestamp, id FROM (
+                SELECT product_id, site_name, price, timestamp, id,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY product_id, site_name ORDER BY timestamp DESC
+                       ) as rn
+                FROM price_history
+                WHERE price IS NOT NULL AND price > 0 {product_filter}
+            )
+            WHERE rn = 1
+        '''
+
+        if product_ids is None:
+            batches = [conn.execute(query.format(product_filter=''))]
+        else:
+            ids = sorted(product_ids)
+            for product_id in ids:
+                self._latest.pop(product_id, None)
+            batches = []
+            for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+                chunk = ids[start:start + QUERY_CHUNK_SIZE]
+                placeholders = ', '.join('?' * len(chunk))
+                batches.append(conn.execute(
+                    query.format(product_filter=f'AND product_id IN ({placeholders})'), chunk
+                ))
+
+        for cursor in batches:
+            for product_id, site_name, price, timestamp, row_id in cursor:
+                self._latest.setdefault(product_id, {})[site_name] = {
+                    'price': price,
+                    'timestamp': timestamp,
+                    'id': row_id
+                }
+
+    def _update_best_options(self, product_id: int):
+        """Recompute the cheapest option(s) and the most expensive price for one product."""
+        latest = self._latest.get(product_id)
+        product = self._products.get(product_id)
+        if not latest or not product:
+            self._best_options.pop(product_id, None)
+            return
+
+        min_price = min(entry['price'] for entry in latest.values())
+        max_price = max(entry['price'] for entry in latest.values())
+
+        options = []
+        for site_name in sorted(latest):
+            entry = latest[site_name]
+            if entry['price'] != min_price:
+                continue
+            options.append({
+                'product_name': product['name'],
+                'store_name': site_name,
+                'price': entry['price'],
+                'scraped_at': datetime.fromisoformat(entry['timestamp']),
+                'store_url': product['urls'].get(site_name, ""),
+                'min_price': min_price,
+                'max_price': max_price
+            })
+
+        options.sort(key=lambda option: STORE_PRIORITY.get(option['store_name'], 999))
+        self._best_options[product_id] = options
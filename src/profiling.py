@@ -0,0 +1,193 @@
+"""
+On-demand profiling of scrape runs, shopping-list runs and single web requests
+"""
+
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'sample')
+
+
+def new_run_id() -> str:
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval from a background thread.
+
+    Unlike cProfile it adds almost no overhead to the profiled code, and idle time
+    (waiting on sockets in the event loop) shows up as it does in production. The
+    samples are written as collapsed stacks, the input format of flamegraph.pl and
+    https://www.speedscope.app.
+    """
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.thread_id = self.thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def write_collapsed(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfileSession:
+    """Profiles the calling thread between ``start`` and ``stop`` (or as a context manager).
+
+    ``cprofile`` mode writes ``<label>-<run_id>.prof`` (pstats, for snakeviz or
+    ``python -m pstats``) and ``sample`` mode writes ``<label>-<run_id>.collapsed``.
+    """
+
+    def __init__(self, mode: str = 'cprofile', output_dir: str = 'profiles', label: str = 'run',
+                 run_id: Optional[str] = None, interval: float = 0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}, expected one of {PROFILE_MODES}")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.label = label
+        self.run_id = run_id or new_run_id()
+        self.interval = interval
+        self.paths = []
+        self._profiler = None
+        self._started = None
+
+    def start(self):
+        if self.mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = SamplingProfiler(self.interval)
+            self._profiler.start()
+        self._started = time.perf_counter()
+
+    def stop(self) -> List[str]:
+        """Stop profiling and write the output files, returning their paths."""
+        elapsed = time.perf_counter() - self._started
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"{self.label}-{self.run_id}")
+
+        if self.mode == 'cprofile':
+            self._profiler.disable()
+            path = f"{base}.prof"
+            self._profiler.dump_stats(path)
+        else:
+            self._profiler.stop()
+            path = f"{base}.collapsed"
+            self._profiler.write_collapsed(path)
+
+        self.paths = [path]
+        logger.info(f"Profile of {self.label} ({elapsed:.2f}s, {self.mode}) written to {path}")
+        return self.paths
+
+    def summary(self, limit: int = 20) -> str:
+        """The top functions by cumulative time (cprofile) or by sample count (sample)."""
+        if self.mode == 'cprofile':
+            output = io.StringIO()
+            pstats.Stats(self._profiler, stream=output).sort_stats('cumulative').print_stats(limit)
+            return output.getvalue()
+
+        leaves = Counter()
+        for stack, count in self._profiler.samples.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return '\n'.join(f"{count / total:6.1%}  {frame}" for frame, count in leaves.most_common(limit))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+
+class RequestProfilerMiddleware:
+    """WSGI middleware that profiles single requests on demand.
+
+    A request carrying ``X-Profile-Token`` equal to the admin token, and
+    ``X-Profile: cprofile|sample`` (or a ``_profile`` query parameter), is run
+    under a ProfileSession. The run id is returned in the ``X-Profile-Run``
+    response header. Other requests pass straight through. Profiled requests are
+    serialised because only one profiler can be active in a process.
+    """
+
+    def __init__(self, wsgi_app, token: str, output_dir: str = 'profiles'):
+        self.wsgi_app = wsgi_app
+        self.token = token
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+
+    def _requested_mode(self, environ: Dict) -> Optional[str]:
+        provided = environ.get('HTTP_X_PROFILE_TOKEN', '')
+        if not self.token or not provided or not hmac.compare_digest(
+                provided.encode('latin-1'), self.token.encode('utf-8')):
+            return None
+
+        mode = environ.get('HTTP_X_PROFILE')
+        if not mode:
+            mode = parse_qs(environ.get('QUERY_STRING', '')).get('_profile', [None])[0]
+        return mode if mode in PROFILE_MODES else None
+
+    def __call__(self, environ, start_response):
+        mode = self._requested_mode(environ)
+        if mode is None:
+            return self.wsgi_app(environ, start_response)
+
+        label = 'request' + re.sub(r'[^A-Za-z0-9.-]+', '_', environ.get('PATH_INFO', '/')).rstrip('_')
+        session = ProfileSession(mode, self.output_dir, label=label)
+
+        def profiled_start_response(status, headers, exc_info=None):
+            return start_response(status, headers + [('X-Profile-Run', session.run_id)], exc_info)
+
+        with self._lock:
+            with session:
+                # Consume the body inside the profile so streamed responses are measured too
+                iterable = self.wsgi_app(environ, profiled_start_response)
+                try:
+                    body = b''.join(iterable)
+                finally:
+                    if hasattr(iterable, 'close'):
+                        iterable.close()
+        return [body]
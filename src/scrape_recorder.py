@@ -0,0 +1,172 @@
+"""
+Saving scrape results and turning them into price alerts
+"""
+
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from .alerts import AlertEngine
+from .database import DatabaseManager
+from .price_analytics import PriceAnomalyDetector
+from .scrape_scheduler import ScrapeScheduler
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeRecorder:
+    """Saves successful scrape results to price history and runs them through the alert engine.
+
+    Shared by the command-line scraper, the scheduled scraping script, the
+    scrape webhook and the web UI's manual scrapes so they all record prices and
+    raise alerts the same way.
+    Prices the anomaly detector finds implausible are kept out of price history.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, alert_engine: Optional[AlertEngine] = None,
+                 anomaly_detector: Optional[PriceAnomalyDetector] = None):
+        self.db_manager = db_manager
+        self.alert_engine = alert_engine or AlertEngine(db_manager)
+        self.anomaly_detector = anomaly_detector
+    
+    def screen(self, product: Dict[str, Any], site_name: str, result: Dict[str, Any]) -> Optional[str]:
+        """Check a result against recent prices, recording it as an anomaly if it looks wrong."""
+        if self.anomaly_detector is None:
+            return None
+        
+        with tracing.span('screen'):
+            reason = self.anomaly_detector.check(product['id'], site_name, result['price'])
+        if reason:
+            self.anomaly_detector.record(product['id'], site_name, result['price'], reason)
+            logger.warning(f"Suspicious price for {product['name']} on {site_name} not saved: {reason}")
+        return reason
+
+    def record(self, product: Dict[str, Any], site_name: str,
+               result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Save one successful, screened result, returning a newly opened alert if there is one."""
+        timestamp = datetime.now()
+        with tracing.span('db_write'):
+            self.db_manager.save_price_history(
+                product_id=product['id'],
+                site_name=site_name,
+                price=result['price'],
+                currency=result.get('currency', 'GBP'),
+                availability=result.get('availability', True),
+                timestamp=timestamp
+            )
+        with tracing.span('alert'):
+            return self.alert_engine.evaluate(product, site_name, result['price'], timestamp)
+
+    def record_result(self, product: Optional[Dict[str, Any]], product_id: int, site_name: str,
+                      result: Dict[str, Any], summary: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Screen and save one result, counting it in ``summary``; returns a newly opened alert."""
+        if not result.get('success'):
+            summary['failed'] += 1
+            name = product['name'] if product else f"product {product_id}"
+            logger.error(f"Failed to scrape {name} on {site_name}: {result.get('error', 'Unknown error')}")
+            return None
+
+        summary['successful'] += 1
+        if product is None:
+            # Deleted or deactivated while the scrape was running
+            return None
+
+        with tracing.job(product_id, site_name):
+            if self.screen(product, site_name, result):
+                summary['suspicious'] += 1
+                return None
+
+            alert = self.record(product, site_name, result)
+        if alert:
+            summary['alerts'].append(alert)
+        return alert
+
+    def record_results(self, results: Dict[int, Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Save a batch of results from ScraperManager.scrape_all_products."""
+        summary = self._new_summary()
+
+        for product_id, site_results in results.items():
+            product = self.db_manager.get_product(product_id)
+
+            for site_name, result in site_results.items():
+                self.record_result(product, product_id, site_name, result, summary)
+
+        return summary
+
+    def streaming(self, notification_manager=None) -> Tuple[Callable, Dict[str, Any]]:
+        """An ``on_result`` callback for scrape_all_products, and the summary it fills in.
+
+        Each result is saved as soon as its job finishes, and a newly opened alert is
+        dispatched straight away (subject to the digest window) instead of after the
+        whole catalogue has been scraped. Screening, saving and alert evaluation are
+        SQLite work, so they run in a thread to keep the other scrapes moving; one
+        result is recorded at a time, since SQLite takes one writer anyway and the
+        summary is updated in place.
+        """
+        summary = self._new_summary()
+        summary['notified'] = 0
+        record_lock = threading.Lock()
+
+        def record(product: Dict[str, Any], site_name: str, result: Dict[str, Any]):
+            with record_lock:
+                return self.record_result(product, product['id'], site_name, result, summary)
+
+        async def on_result(product: Dict[str, Any], site_name: str, result: Dict[str, Any]):
+            alert = await asyncio.to_thread(record, product, site_name, result)
+            if alert and notification_manager is not None:
+                # Awaited before the += so overlapping callbacks do not overwrite each other's counts
+                sent = await self.alert_engine.dispatch(notification_manager)
+                summary['notified'] += sent
+
+        return on_result, summary
+
+    @staticmethod
+    def _new_summary() -> Dict[str, Any]:
+        return {'successful': 0, 'failed': 0, 'suspicious': 0, 'alerts': []}
+
+
+async def scrape_and_record(config, db_manager: DatabaseManager, scraper_manager,
+                            notification_manager=None, scrape_all: bool = False) -> Dict[str, Any]:
+    """Scrape the catalogue once, saving and alerting on each result as its job finishes.
+
+    The single scrape run behind the command-line scraper, the scheduled scraping
+    script and the scrape webhook. With scheduling enabled only the due product/site
+    jobs are scraped, unless ``scrape_all`` is set, near-target products first; the
+    scraped jobs are then rescheduled and any alerts still pending are sent.
+    Returns the run summary, with ``products`` (how many were scraped) and
+    ``notified`` (alerts sent during and after the run).
+    """
+    products = db_manager.get_all_products()
+    if not products:
+        logger.warning("No products found in database. Add products first.")
+
+    scheduler = ScrapeScheduler(db_manager, config.schedule_config)
+    if products and scheduler.enabled and not scrape_all:
+        products = scheduler.due_products(products)
+        if not products:
+            logger.info("No products are due for scraping")
+
+    recorder = ScrapeRecorder(
+        db_manager,
+        AlertEngine(db_manager, config.alert_config),
+        PriceAnomalyDetector(db_manager, config.anomaly_config)
+    )
+    on_result, summary = recorder.streaming(notification_manager)
+    summary['products'] = len(products)
+    if not products:
+        return summary
+
+    logger.info(f"Scraping {len(products)} products")
+    results = await scraper_manager.scrape_all_products(
+        products, priorities=scheduler.priorities(products), on_result=on_result)
+    if scheduler.enabled:
+        scheduler.reschedule(products, results)
+
+    if notification_manager is not None:
+        # Alerts held back by the digest window, or opened while a dispatch was running
+        with tracing.span('notify'):
+            summary['notified'] += await recorder.alert_engine.dispatch(notification_manager)
+    return summary
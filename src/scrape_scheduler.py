@@ -0,0 +1,172 @@
+"""
+Volatility-aware scheduling of scrape jobs
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from .database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeScheduler:
+    """Gives each (product, site) its own next-due time, using the scrape_schedule table as state.
+
+    After a job is scraped its next interval is set from how often that price
+    has changed over the last ``lookback_days``. The mean time between changes
+    of more than ``change_threshold_percent`` is divided by ``oversample``, so a
+    price that changes weekly is checked a couple of times a week. The interval
+    is clamped between ``min_interval_hours`` and ``max_interval_hours``. Prices
+    within ``near_target_percent`` of the product's target price, jobs with
+    little history and failed jobs are all due again after the minimum interval.
+    Jobs with no schedule row yet are always due, as are jobs falling due within
+    ``slack_minutes`` of the run.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, schedule_config: Optional[Dict[str, Any]] = None):
+        schedule_config = schedule_config or {}
+        self.db_manager = db_manager
+        self.enabled = schedule_config.get('enabled', False)
+        self.min_interval = timedelta(hours=float(schedule_config.get('min_interval_hours', 6)))
+        self.max_interval = timedelta(hours=float(schedule_config.get('max_interval_hours', 168)))
+        self.lookback = timedelta(days=float(schedule_config.get('lookback_days', 60)))
+        self.change_threshold = float(schedule_config.get('change_threshold_percent', 0.5)) / 100
+        self.oversample = max(1.0, float(schedule_config.get('oversample', 2.0)))
+        self.near_target = float(schedule_config.get('near_target_percent', 10.0)) / 100
+        self.min_observations = int(schedule_config.get('min_observations', 3))
+        # Runs start a little early or late; a job due shortly after a run would otherwise wait a whole cycle
+        self.slack = timedelta(minutes=float(schedule_config.get('slack_minutes', 30)))
+        self.priority_band = float(schedule_config.get('priority_band_percent', 25.0)) / 100
+        self.target_weight = float(schedule_config.get('priority_target_weight', 2.0))
+
+    def due_products(self, products: List[Dict[str, Any]], now: datetime = None) -> List[Dict[str, Any]]:
+        """Products with their ``urls`` cut down to the sites that are due; products with none are dropped."""
+        cutoff = (now or datetime.now()) + self.slack
+        with self.db_manager.get_connection() as conn:
+            next_due = {(product_id, site_name): due_at for product_id, site_name, due_at in conn.execute('''
+                SELECT product_id, site_name, next_due_at FROM scrape_schedule
+            ''')}
+
+        due_products = []
+        total = due = 0
+        for product in products:
+            urls = {}
+            for site_name, url in product['urls'].items():
+                total += 1
+                due_at = next_due.get((product['id'], site_name))
+                if due_at is None or datetime.fromisoformat(due_at) <= cutoff:
+                    urls[site_name] = url
+            if urls:
+                due += len(urls)
+                due_products.append({**product, 'urls': urls})
+
+        logger.info(f"Schedule: {due} of {total} product/site jobs due")
+        return due_products
+
+    def priorities(self, products: List[Dict[str, Any]], now: datetime = None) -> Dict[Tuple[int, str], float]:
+        """Priority score per (product, site) job; ScraperManager starts higher scores first.
+
+        The score adds target closeness, weighted by ``priority_target_weight``, to
+        staleness. Closeness is 1 when the latest price is at or below the target and
+        falls to 0 at ``priority_band_percent`` above it. Staleness is the time since
+        the last saved price as a fraction of the maximum interval, and is 1 for a job
+        never scraped. Products close to their target therefore go first, so their
+        alerts are sent at the start of a run.
+        """
+        now = now or datetime.now()
+        with self.db_manager.get_connection() as conn:
+            latest = {(product_id, site_name): (price, scraped_at) for product_id, site_name, price, scraped_at in
+                      conn.execute('''
+                          SELECT product_id, site_name, price, MAX(timestamp) FROM price_history
+                          WHERE timestamp >= ?
+                          GROUP BY product_id, site_name
+                      ''', (now - self.max_interval,))}
+
+        scores = {}
+        for product in products:
+            target_price = product.get('target_price')
+            for site_name in product['urls']:
+                price, scraped_at = latest.get((product['id'], site_name), (None, None))
+                if scraped_at is None:
+                    staleness = 1.0
+                else:
+                    age = now - datetime.fromisoformat(scraped_at)
+                    staleness = min(1.0, max(0.0, age / self.max_interval))
+
+                closeness = 0.0
+                if target_price and price is not None:
+                    distance = (price - target_price) / (target_price * self.priority_band)
+                    closeness = min(1.0, max(0.0, 1.0 - distance))
+                scores[(product['id'], site_name)] = self.target_weight * closeness + staleness
+        return scores
+
+    def change_statistics(self, now: datetime = None) -> Dict[Tuple[int, str], Dict[str, Any]]:
+        """Observations, price changes, span and latest price per (product, site) over the lookback."""
+        since = (now or datetime.now()) - self.lookback
+        with self.db_manager.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT product_id, site_name, COUNT(*),
+                       SUM(CASE WHEN previous IS NOT NULL AND ABS(price - previous) > previous * ?
+                           THEN 1 ELSE 0 END),
+                       julianday(MAX(timestamp)) - julianday(MIN(timestamp)),
+                       MAX(CASE WHEN newest = 1 THEN price END)
+                FROM (
+                    SELECT product_id, site_name, price, timestamp,
+                           LAG(price) OVER (PARTITION BY product_id, site_name ORDER BY timestamp) AS previous,
+                           ROW_NUMBER() OVER (PARTITION BY product_id, site_name
+                                              ORDER BY timestamp DESC) AS newest
+                    FROM price_history
+                    WHERE timestamp >= ?
+                )
+                GROUP BY product_id, site_name
+            ''', (self.change_threshold, since)).fetchall()
+
+        return {(product_id, site_name): {'observations': observations, 'changes': changes,
+                                          'span_days': span_days or 0.0, 'latest_price': latest_price}
+                for product_id, site_name, observations, changes, span_days, latest_price in rows}
+
+    def interval(self, stats: Optional[Dict[str, Any]], target_price: Optional[float] = None) -> timedelta:
+        """How long to wait before scraping a (product, site) with these change statistics again."""
+        if not stats or stats['observations'] < self.min_observations:
+            return self.min_interval
+        if target_price and stats['latest_price'] is not None \
+                and stats['latest_price'] <= target_price * (1 + self.near_target):
+            return self.min_interval
+
+        if stats['changes']:
+            mean_days_between_changes = stats['span_days'] / stats['changes']
+            interval = timedelta(days=mean_days_between_changes / self.oversample)
+        else:
+            interval = self.max_interval
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def reschedule(self, products: List[Dict[str, Any]], results: Dict[int, Dict[str, Dict[str, Any]]],
+                   now: datetime = None) -> Dict[int, int]:
+        """Set the next due time of every job in ``results``; returns job counts by interval in hours."""
+        now = now or datetime.now()
+        stats = self.change_statistics(now)
+        targets = {product['id']: product.get('target_price') for product in products}
+
+        rows = []
+        intervals = {}
+        for product_id, site_results in results.items():
+            for site_name, result in site_results.items():
+                if result.get('success'):
+                    interval = self.interval(stats.get((product_id, site_name)), targets.get(product_id))
+                else:
+                    interval = self.min_interval
+                hours = round(interval.total_seconds() / 3600)
+                intervals[hours] = intervals.get(hours, 0) + 1
+                rows.append((product_id, site_name, now + interval, interval.total_seconds() / 60, now))
+
+        with self.db_manager.get_connection() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO scrape_schedule
+                (product_id, site_name, next_due_at, interval_minutes, last_scraped_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+
+        logger.info(f"Rescheduled {len(rows)} jobs; jobs by interval in hours: {dict(sorted(intervals.items()))}")
+        return intervals
@@ -0,0 +1,136 @@
+"""
+Scrape workers and the coordinator that feeds them through the shared job queue
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from typing import Dict, Any, List, Optional
+
+from .alerts import AlertEngine
+from .config import Config
+from .database import DatabaseManager
+from .job_queue import ScrapeJobQueue
+from .price_analytics import PriceAnomalyDetector
+from .scrape_recorder import ScrapeRecorder
+from .scrape_scheduler import ScrapeScheduler
+from .scraper_manager import ScraperManager
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_due_jobs(config: Config, db_manager: DatabaseManager, scrape_all: bool = False) -> int:
+    """Queue every due (product, site) job with its priority, returning how many were added."""
+    products = db_manager.get_all_products()
+    scheduler = ScrapeScheduler(db_manager, config.schedule_config)
+    if scheduler.enabled and not scrape_all:
+        products = scheduler.due_products(products)
+
+    priorities = scheduler.priorities(products)
+    jobs = [(product['id'], site_name, url, priorities.get((product['id'], site_name), 0.0))
+            for product in products
+            for site_name, url in product['urls'].items()
+            if config.is_site_enabled(site_name)]
+    added = ScrapeJobQueue(db_manager, config.worker_config).enqueue(jobs)
+    logger.info(f"Queued {added} of {len(jobs)} due jobs; the rest were already queued")
+    return added
+
+
+class ScrapeWorker:
+    """Leases batches of jobs from the shared queue, scrapes them and records the results.
+
+    Each batch goes through ScraperManager.scrape_all_products, so the circuit
+    breaker, adaptive concurrency and priority order apply as in a single-process
+    run. The leases on unfinished jobs are renewed every ``heartbeat_seconds``
+    while the batch runs. As each job finishes its result is written back to the
+    queue, and only if the lease was still held is it saved and alerted on; the
+    scraped jobs are then rescheduled.
+    """
+
+    def __init__(self, config: Config, db_manager: DatabaseManager, worker_id: Optional[str] = None):
+        worker_config = config.worker_config
+        self.config = config
+        self.db_manager = db_manager
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = int(worker_config.get('batch_size', 10))
+        self.poll_interval = float(worker_config.get('poll_seconds', 5))
+        self.queue = ScrapeJobQueue(db_manager, worker_config)
+        self.heartbeat_interval = float(worker_config.get('heartbeat_seconds',
+                                                          self.queue.lease_time.total_seconds() / 3))
+        self.scraper_manager = ScraperManager(config, db_manager)
+        self.scheduler = ScrapeScheduler(db_manager, config.schedule_config)
+        self.recorder = ScrapeRecorder(
+            db_manager,
+            AlertEngine(db_manager, config.alert_config),
+            PriceAnomalyDetector(db_manager, config.anomaly_config)
+        )
+
+    def _batch_products(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Products for a batch of jobs, each with only its leased sites in ``urls``."""
+        products = {}
+        for job in jobs:
+            product = products.get(job['product_id'])
+            if product is None:
+                product = self.db_manager.get_product(job['product_id'])
+                if product is None:
+                    self.queue.complete(job['id'], self.worker_id,
+                                        {'success': False, 'error': 'Product no longer exists'})
+                    continue
+                product = products[job['product_id']] = {**product, 'urls': {}}
+            product['urls'][job['site_name']] = job['url']
+        return list(products.values())
+
+    async def run_batch(self, notification_manager=None) -> int:
+        """Lease and scrape one batch, returning the number of jobs leased."""
+        jobs = self.queue.lease(self.worker_id, self.batch_size)
+        if not jobs:
+            return 0
+
+        job_ids = {(job['product_id'], job['site_name']): job['id'] for job in jobs}
+        # Leased highest priority first; keep that order within the batch
+        priorities = {key: -index for index, key in enumerate(job_ids)}
+        products = self._batch_products(jobs)
+        record, summary = self.recorder.streaming(notification_manager)
+        in_flight = {job_ids[(product['id'], site_name)] for product in products for site_name in product['urls']}
+
+        async def on_result(product: Dict[str, Any], site_name: str, result: Dict[str, Any]):
+            job_id = job_ids[(product['id'], site_name)]
+            in_flight.discard(job_id)
+            # A job re-leased by another worker is theirs to record; saving it here too would duplicate it
+            if self.queue.complete(job_id, self.worker_id, result):
+                await record(product, site_name, result)
+
+        async def heartbeat():
+            while in_flight:
+                await asyncio.sleep(self.heartbeat_interval)
+                for job_id in self.queue.renew(list(in_flight), self.worker_id):
+                    in_flight.discard(job_id)
+
+        renewing = asyncio.create_task(heartbeat())
+        try:
+            results = await self.scraper_manager.scrape_all_products(products, priorities, on_result)
+        finally:
+            renewing.cancel()
+        if self.scheduler.enabled:
+            self.scheduler.reschedule(products, results)
+        logger.info(f"Worker {self.worker_id} finished {len(jobs)} jobs: "
+                    f"{summary['successful']} successful, {summary['failed']} failed")
+        return len(jobs)
+
+    async def run(self, exit_when_empty: bool = False, notification_manager=None) -> int:
+        """Work through the queue, polling when it is empty; returns the number of jobs handled."""
+        handled = 0
+        logger.info(f"Scrape worker {self.worker_id} started")
+        while True:
+            leased = await self.run_batch(notification_manager)
+            handled += leased
+            if not leased:
+                if exit_when_empty:
+                    break
+                await asyncio.sleep(self.poll_interval)
+
+        if notification_manager is not None:
+            await self.recorder.alert_engine.dispatch(notification_manager)
+        logger.info(f"Scrape worker {self.worker_id} stopping after {handled} jobs")
+        return handled
@@ -7,32 +7,51 @@ import aiohttp
 import logging
 import random
 import re
-from typing import Dict, List, Optional, Any, Tuple
+import time
+from contextlib import AsyncExitStack
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Tuple
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
 
 from .config import Config
+from . import metrics, tracing
+from .circuit_breaker import CircuitBreaker
+from .concurrency import ConcurrencyController, parse_retry_after, unlimited_slot
+from .database import DatabaseManager
+from .api_adapters import create_adapter
+from .selector_stats import SelectorStats
+from .streaming import read_html
+from .structured_data import FAST_PATH_STATS, extract_structured_data
 
 logger = logging.getLogger(__name__)
 
+# Error for a job whose page could not be downloaded, as opposed to one that could not be parsed
+FETCH_FAILED = "Failed to fetch page content"
+
 
 class PriceScraper:
     """Base class for price scraping functionality."""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, concurrency: Optional[ConcurrencyController] = None):
         self.config = config
+        self.concurrency = concurrency
         self.ua = UserAgent()
         self.session = None
+        self._adapters = {}
+        self.selector_stats = SelectorStats.shared(config.selector_ordering_config)
     
     async def __aenter__(self):
         """Async context manager entry."""
-        connector = aiohttp.TCPConnector(limit=self.config.max_concurrent_requests)
+        # With adaptive concurrency the per-site windows limit requests, not the connection pool
+        limit = self.config.max_concurrent_requests if self.concurrency is None else 0
+        connector = aiohttp.TCPConnector(limit=limit)
         timeout = aiohttp.ClientTimeout(total=self.config.timeout)
         self.session = aiohttp.ClientSession(
             connector=connector,
             timeout=timeout,
-            headers={'User-Agent': self.ua.random}
+            headers={'User-Agent': self.ua.random},
+            trace_configs=[tracing.aiohttp_trace_config()]
         )
         return self
     
@@ -40,6 +59,7 @@ class PriceScraper:
         """Async context manager exit."""
         if self.session:
             await self.session.close()
+        self.selector_stats.save()
     
     def _get_headers(self, url: str = None) -> Dict[str, str]:
         """Get request headers with random user agent and site-specific headers."""
@@ -79,59 +99,200 @@ class PriceScraper:
         
         return headers
     
-    async def _fetch_page(self, url: str) -> Optional[str]:
+    async def _fetch_page(self, url: str, site_name: Optional[str] = None,
+                          extra_headers: Optional[Dict[str, str]] = None) -> Optional[str]:
         """Fetch a web page with retry logic and anti-bot measures."""
+        site = site_name or self._detect_site(url) or urlparse(url).netloc or 'unknown'
+        started = time.perf_counter()
         base_delay = random.uniform(1, 3)  # Random delay between 1-3 seconds
         
         for attempt in range(self.config.retry_attempts):
+            wait = None
             try:
                 # Add delay before each request (except first)
                 if attempt > 0:
+                    metrics.FETCH_RETRIES.inc(site=site)
                     delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
                     await asyncio.sleep(delay)
                 
-                headers = self._get_headers(url)
+                headers = {**self._get_headers(url), **(extra_headers or {})}
                 
-                async with self.session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        return await response.text()
-                    elif response.status == 403:
-                        logger.warning(f"Access denied (403) for {url} - may be blocked by anti-bot measures")
-                        # For 403 errors, wait longer before retry
-                        if attempt < self.config.retry_attempts - 1:
-                            await asyncio.sleep(random.uniform(5, 10))
-                    elif response.status == 429:
-                        logger.warning(f"Rate limited (429) for {url}")
-                        # For rate limiting, wait even longer
-                        if attempt < self.config.retry_attempts - 1:
-                            await asyncio.sleep(random.uniform(10, 20))
-                    else:
-                        logger.warning(f"HTTP {response.status} for {url}")
+                async with self._request_slot(site) as slot:
+                    try:
+                        async with self.session.get(url, headers=headers) as response:
+                            if response.status == 200:
+                                with tracing.span('download'):
+                                    html = await self._read_body(response, site)
+                                slot.success()
+                                metrics.FETCH_SECONDS.observe(time.perf_counter() - started, site=site,
+                                                              outcome='success')
+                                return html
+                            
+                            metrics.HTTP_ERRORS.inc(site=site, status=str(response.status))
+                            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                            if response.status == 403:
+                                logger.warning(f"Access denied (403) for {url} - may be blocked by anti-bot measures")
+                                slot.throttled('403', retry_after)
+                                # For 403 errors, wait longer before retry
+                                wait = retry_after if retry_after is not None else random.uniform(5, 10)
+                            elif response.status == 429:
+                                logger.warning(f"Rate limited (429) for {url}")
+                                slot.throttled('429', retry_after)
+                                # For rate limiting, wait even longer unless the site says how long
+                                wait = retry_after if retry_after is not None else random.uniform(10, 20)
+                            else:
+                                logger.warning(f"HTTP {response.status} for {url}")
+                    except asyncio.TimeoutError:
+                        slot.throttled('timeout')
+                        raise
                         
             except Exception as e:
+                metrics.HTTP_ERRORS.inc(site=site, status=type(e).__name__)
                 logger.warning(f"Attempt {attempt + 1} failed for {url}: {e}")
-                if attempt < self.config.retry_attempts - 1:
-                    await asyncio.sleep(base_delay * (2 ** attempt))
+                wait = base_delay * (2 ** attempt)
+            
+            # Wait outside the request slot so other requests to the site can use it
+            if wait and attempt < self.config.retry_attempts - 1:
+                await asyncio.sleep(wait)
         
+        metrics.FETCH_SECONDS.observe(time.perf_counter() - started, site=site, outcome='failure')
         logger.error(f"Failed to fetch {url} after {self.config.retry_attempts} attempts")
         return None
     
-    def _extract_price(self, soup: BeautifulSoup, selectors: List[str]) -> Optional[float]:
-        """Extract price from HTML using CSS selectors."""
-        for selector in selectors:
+    async def _read_body(self, response: aiohttp.ClientResponse, site: str) -> str:
+        """Page text, streamed and cut short once the site's markers are read if streaming is enabled."""
+        streaming = self.config.streaming_config
+        if not streaming.get('enabled'):
+            return await response.text()
+        
+        html, reason, size = await read_html(response, self._stream_markers(site),
+                                             int(streaming.get('chunk_bytes', 16384)),
+                                             int(streaming.get('max_body_bytes', 5_000_000)))
+        metrics.RESPONSE_BYTES.inc(size, site=site)
+        if reason != 'complete':
+            metrics.STREAM_EARLY_STOPS.inc(site=site, reason=reason)
+            logger.debug(f"Stopped reading {site} page after {size} bytes ({reason})")
+        return html
+    
+    def _stream_markers(self, site: str) -> Dict[str, List[str]]:
+        """Selectors whose elements must be read before a streamed fetch may stop.
+        
+        A site's ``stream_markers`` are used if set; otherwise the first price,
+        title and availability selector, so a stop never skips an element an
+        earlier selector in the cascade would have preferred.
+        """
+        site_config = self.config.get_site_config(site) or {}
+        markers = site_config.get('stream_markers')
+        if markers is None:
+            selectors = site_config.get('selectors', {})
+            markers = {field: selectors[field][:1] for field in ('price', 'title', 'availability')
+                       if selectors.get(field)}
+        return markers
+    
+    def _api_adapter(self, site_name: str):
+        """The site's JSON API adapter, or None if it is scraped as HTML."""
+        if site_name not in self._adapters:
+            self._adapters[site_name] = create_adapter(site_name, self.config.get_site_config(site_name))
+        return self._adapters[site_name]
+    
+    async def _scrape_api(self, url: str, site_name: str) -> Optional[Dict[str, Any]]:
+        """Product data from the site's JSON API.
+        
+        Returns None when the site has no adapter for this URL, or the response
+        has no usable price, so the page is scraped as HTML instead. If the API
+        cannot be fetched at all the result carries FETCH_FAILED.
+        """
+        adapter = self._api_adapter(site_name)
+        api_url = adapter.api_url(url) if adapter else None
+        if not api_url:
+            return None
+        
+        with tracing.span('fetch', url=api_url):
+            body = await self._fetch_page(api_url, site_name, adapter.headers)
+        if not body:
+            return {'price': None, 'error': FETCH_FAILED}
+        
+        try:
+            with metrics.EXTRACT_SECONDS.time(site=site_name, extractor='api'), \
+                    tracing.span('extract', extractor='api'):
+                data = adapter.extract(body)
+        except ValueError as e:
+            logger.warning(f"Unreadable {site_name} API response for {url}: {e}; scraping the page instead")
+            return None
+        if data['price'] is None:
+            logger.warning(f"No price in {site_name} API response for {url}; scraping the page instead")
+            return None
+        return data
+    
+    def _api_result(self, result: Dict[str, Any], api_data: Dict[str, Any], site_name: str) -> Dict[str, Any]:
+        """Fill a scrape result from ``_scrape_api`` output."""
+        if api_data.get('error'):
+            result['error'] = api_data['error']
+            return result
+        result.update({
+            'success': True,
+            'price': api_data['price'],
+            'title': api_data['title'],
+            'availability': api_data['availability'],
+            'currency': api_data['currency']
+        })
+        logger.info(f"Successfully read {site_name} API: £{api_data['price']}")
+        return result
+    
+    def _extract_structured(self, html_content: str, site_name: str) -> Optional[Dict[str, Any]]:
+        """Structured-data fast path; None when it misses or is turned off for the site."""
+        site_config = self.config.get_site_config(site_name) or {}
+        if not self.config.structured_data_config.get('enabled', True) or \
+                not site_config.get('structured_data', True):
+            return None
+        
+        started = time.perf_counter()
+        with metrics.EXTRACT_SECONDS.time(site=site_name, extractor='structured_data'), \
+                tracing.span('extract', extractor='structured_data'):
+            data = extract_structured_data(html_content)
+        FAST_PATH_STATS.record(site_name, data is not None, time.perf_counter() - started)
+        if data is not None:
+            logger.debug(f"{site_name}: price £{data['price']} from {data.pop('source')}")
+        return data
+    
+    def _request_slot(self, site: str):
+        """Concurrency slot for one request to ``site``; unlimited when adaptive concurrency is off."""
+        if self.concurrency is None:
+            return unlimited_slot()
+        return self.concurrency.slot(site)
+    
+    def _cascade(self, site_name: str, field: str, selectors: List[str],
+                 attempt: Callable[[str], Any]) -> Any:
+        """Return the first non-None ``attempt(selector)``, trying the most successful selectors first.
+        
+        Every evaluation is recorded in the selector statistics, which decide the
+        order on later pages; errors count as misses.
+        """
+        for selector in self.selector_stats.order(site_name, field, selectors):
+            started = time.perf_counter()
             try:
-                elements = soup.select(selector)
-                for element in elements:
-                    price_text = element.get_text(strip=True)
-                    price = self._parse_price(price_text)
-                    if price is not None:
-                        return price
+                value = attempt(selector)
             except Exception as e:
-                logger.debug(f"Error with selector {selector}: {e}")
-                continue
-        
+                logger.debug(f"Error with {site_name} {field} selector {selector}: {e}")
+                value = None
+            self.selector_stats.record(site_name, field, selector, value is not None,
+                                       time.perf_counter() - started)
+            if value is not None:
+                return value
         return None
     
+    def _extract_price(self, soup: BeautifulSoup, selectors: List[str],
+                       site_name: str = 'unknown') -> Optional[float]:
+        """Extract price from HTML using CSS selectors."""
+        def price_from(selector):
+            for element in soup.select(selector):
+                price = self._parse_price(element.get_text(strip=True))
+                if price is not None:
+                    return price
+            return None
+        
+        return self._cascade(site_name, 'price', selectors, price_from)
+    
     def _parse_price(self, price_text: str) -> Optional[float]:
         """Parse price from text string."""
         if not price_text:
@@ -152,18 +313,14 @@ class PriceScraper:
         
         return None
     
-    def _extract_text(self, soup: BeautifulSoup, selectors: List[str]) -> Optional[str]:
+    def _extract_text(self, soup: BeautifulSoup, selectors: List[str],
+                      site_name: str = 'unknown', field: str = 'text') -> Optional[str]:
         """Extract text from HTML using CSS selectors."""
-        for selector in selectors:
-            try:
-                element = soup.select_one(selector)
-                if element:
-                    return element.get_text(strip=True)
-            except Exception as e:
-                logger.debug(f"Error with selector {selector}: {e}")
-                continue
+        def text_from(selector):
+            element = soup.select_one(selector)
+            return element.get_text(strip=True) if element else None
         
-        return None
+        return self._cascade(site_name, field, selectors, text_from)
     
     def _detect_site(self, url: str) -> Optional[str]:
         """Detect which site this URL belongs to."""
@@ -217,31 +374,48 @@ class PriceScraper:
                 result['error'] = f"Site {site_name} is disabled"
                 return result
             
+            api_data = await self._scrape_api(url, site_name)
+            if api_data is not None:
+                return self._api_result(result, api_data, site_name)
+            
             # Fetch page content
-            html_content = await self._fetch_page(url)
+            with tracing.span('fetch', url=url):
+                html_content = await self._fetch_page(url, site_name)
             if not html_content:
-                result['error'] = "Failed to fetch page content"
+                result['error'] = FETCH_FAILED
                 return result
             
-            # Parse HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Extract price
-            price_selectors = site_config.get('selectors', {}).get('price', [])
-            price = self._extract_price(soup, price_selectors)
+            structured = self._extract_structured(html_content, site_name)
+            if structured is not None:
+                price, title, availability = structured['price'], structured['title'], structured['availability']
+            else:
+                fallback_started = time.perf_counter()
+                evaluations = self.selector_stats.evaluations
+                # Parse HTML
+                with metrics.PARSE_SECONDS.time(site=site_name), tracing.span('parse'):
+                    soup = BeautifulSoup(html_content, 'html.parser')
+                
+                # Extract price
+                with metrics.EXTRACT_SECONDS.time(site=site_name, extractor='selectors'), tracing.span('extract'):
+                    price_selectors = site_config.get('selectors', {}).get('price', [])
+                    price = self._extract_price(soup, price_selectors, site_name)
+                    
+                    if price is not None:
+                        # Extract additional information
+                        title_selectors = site_config.get('selectors', {}).get('title', [])
+                        title = self._extract_text(soup, title_selectors, site_name, 'title')
+                        
+                        availability_selectors = site_config.get('selectors', {}).get('availability', [])
+                        availability_text = self._extract_text(soup, availability_selectors, site_name,
+                                                                'availability')
+                        availability = self._parse_availability(availability_text)
+                self.selector_stats.record_page(site_name, self.selector_stats.evaluations - evaluations)
+                FAST_PATH_STATS.record_fallback(site_name, time.perf_counter() - fallback_started)
             
             if price is None:
                 result['error'] = "Could not extract price from page"
                 return result
             
-            # Extract additional information
-            title_selectors = site_config.get('selectors', {}).get('title', [])
-            title = self._extract_text(soup, title_selectors)
-            
-            availability_selectors = site_config.get('selectors', {}).get('availability', [])
-            availability_text = self._extract_text(soup, availability_selectors)
-            availability = self._parse_availability(availability_text)
-            
             result.update({
                 'success': True,
                 'price': price,
@@ -291,9 +465,22 @@ class PriceScraper:
 class ScraperManager:
     """Manages multiple price scrapers and coordinates scraping tasks."""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, db_manager: Optional[DatabaseManager] = None):
         self.config = config
-        self.semaphore = asyncio.Semaphore(config.max_concurrent_requests)
+        self.circuit_breaker = CircuitBreaker(db_manager, config.circuit_breaker_config)
+        concurrency_config = config.concurrency_config
+        self.concurrency = ConcurrencyController(concurrency_config) if concurrency_config.get('enabled') else None
+        self.semaphore = asyncio.Semaphore(self._job_limit())
+    
+    def _job_limit(self) -> int:
+        """Scrape jobs allowed to run at once.
+        
+        With adaptive concurrency the per-site windows do the limiting, so jobs are only
+        capped at enough to fill every enabled site's largest window.
+        """
+        if self.concurrency is None:
+            return self.config.max_concurrent_requests
+        return self.concurrency.maximum * max(1, len(self.config.get_enabled_sites()))
     
     async def scrape_product(self, product: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
         """Scrape prices for a single product across all configured sites."""
@@ -302,12 +489,12 @@ class ScraperManager:
         
         results = {}
         
-        async with PriceScraper(self.config) as scraper:
+        async with PriceScraper(self.config, self.concurrency) as scraper:
             tasks = []
             
             for site_name, url in urls.items():
                 if self.config.is_site_enabled(site_name):
-                    task = self._scrape_with_semaphore(scraper, url, site_name)
+                    task = self._scrape_with_semaphore(scraper, url, site_name, product_id)
                     tasks.append((site_name, task))
                     
                     # Add delay between requests
@@ -327,27 +514,106 @@ class ScraperManager:
         
         return results
     
-    async def _scrape_with_semaphore(self, scraper: PriceScraper, url: str, site_name: str):
+    async def _scrape_with_semaphore(self, scraper: PriceScraper, url: str, site_name: str,
+                                     product_id: Optional[int] = None):
         """Scrape with semaphore to limit concurrent requests."""
-        async with self.semaphore:
-            return await scraper.scrape_product_price(url, site_name)
+        with tracing.job(product_id, site_name):
+            metrics.SCRAPE_QUEUE_DEPTH.inc()
+            try:
+                with tracing.span('queue_wait'):
+                    await self.semaphore.acquire()
+            finally:
+                metrics.SCRAPE_QUEUE_DEPTH.dec()
+            
+            metrics.SCRAPES_IN_FLIGHT.inc()
+            try:
+                # Checked after queueing, as the circuit may have opened while this job waited
+                if not self.circuit_breaker.allow(site_name):
+                    metrics.SCRAPE_RESULTS.inc(site=site_name, outcome='skipped')
+                    return self.circuit_breaker.rejected_result(url, site_name)
+                
+                try:
+                    result = await scraper.scrape_product_price(url, site_name)
+                except Exception:
+                    self.circuit_breaker.record_failure(site_name)
+                    raise
+                if result.get('error') == FETCH_FAILED:
+                    self.circuit_breaker.record_failure(site_name)
+                else:
+                    self.circuit_breaker.record_success(site_name)
+                metrics.SCRAPE_RESULTS.inc(site=site_name, outcome='success' if result.get('success') else 'failure')
+                return result
+            finally:
+                metrics.SCRAPES_IN_FLIGHT.dec()
+                self.semaphore.release()
     
-    async def scrape_all_products(self, products: List[Dict[str, Any]]) -> Dict[int, Dict[str, Dict[str, Any]]]:
-        """Scrape prices for all products."""
-        results = {}
+    async def scrape_all_products(self, products: List[Dict[str, Any]],
+                                  priorities: Optional[Dict[Tuple[int, str], float]] = None,
+                                  on_result: Optional[Callable[[Dict[str, Any], str, Dict[str, Any]], Awaitable]] = None
+                                  ) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        """Scrape prices for all products.
+        
+        Each enabled (product, site) pair is one job. Jobs start in descending ``priorities`` order,
+        keyed by (product_id, site_name), with unprioritised jobs last in catalogue order. If
+        ``on_result`` is given it is awaited with (product, site_name, result) as each job finishes,
+        so results can be saved and alerted on while the rest of the catalogue is still being scraped.
+        """
+        results = {product['id']: {} for product in products}
+        jobs = self._ordered_jobs(products, priorities)
+        started = time.perf_counter()
         
-        for product in products:
+        # One job at a time unless adaptive concurrency is deciding how many requests each site gets
+        in_flight = asyncio.Semaphore(self._job_limit() if self.concurrency is not None else 1)
+        
+        async def run(scraper: PriceScraper, product: Dict[str, Any], site_name: str, url: str):
             try:
-                product_id = product['id']
-                logger.info(f"Scraping product: {product['name']} (ID: {product_id})")
-                
-                product_results = await self.scrape_product(product)
-                results[product_id] = product_results
-                
-                # Add delay between products
-                await asyncio.sleep(self.config.delay_between_requests)
-                
+                result = await self._scrape_with_semaphore(scraper, url, site_name, product['id'])
             except Exception as e:
-                logger.error(f"Error scraping product {product.get('id', 'unknown')}: {e}")
+                logger.error(f"Error scraping {site_name} for product {product['id']}: {e}")
+                result = {'success': False, 'error': str(e)}
+            finally:
+                in_flight.release()
+            
+            results[product['id']][site_name] = result
+            if on_result is not None:
+                try:
+                    await on_result(product, site_name, result)
+                except Exception as e:
+                    logger.error(f"Error handling result for {site_name} product {product['id']}: {e}")
+        
+        with tracing.span('scrape_products', products=len(products), jobs=len(jobs)):
+            async with AsyncExitStack() as stack:
+                scraper_for = await self._open_scrapers(stack)
+                tasks = []
+                for product, site_name, url in jobs:
+                    await in_flight.acquire()
+                    logger.info(f"Scraping {site_name} for {product.get('name')} (ID: {product['id']})")
+                    tasks.append(asyncio.create_task(run(scraper_for(site_name), product, site_name, url)))
+                    
+                    # Add delay between requests
+                    await asyncio.sleep(self.config.delay_between_requests)
+                
+                await asyncio.gather(*tasks)
         
+        if self.concurrency is not None:
+            logger.info(f"Adaptive concurrency limits: {self.concurrency.limits()}")
+        metrics.SCRAPE_RUN_SECONDS.observe(time.perf_counter() - started)
+        metrics.SCRAPE_RUN_LAST_COMPLETED.set(time.time())
         return results
+    
+    def _ordered_jobs(self, products: List[Dict[str, Any]],
+                      priorities: Optional[Dict[Tuple[int, str], float]] = None) -> List[Tuple[Dict[str, Any], str, str]]:
+        """(product, site_name, url) for every enabled site, highest priority first."""
+        jobs = [(product, site_name, url)
+                for product in products
+                for site_name, url in product.get('urls', {}).items()
+                if self.config.is_site_enabled(site_name)]
+        if priorities:
+            # Stable sort, so ties keep catalogue order
+            jobs.sort(key=lambda job: -priorities.get((job[0]['id'], job[1]), float('-inf')))
+        return jobs
+    
+    async def _open_scrapers(self, stack: AsyncExitStack) -> Callable[[str], PriceScraper]:
+        """Open the scraper sessions shared by every job in a run, returning the scraper to use for a site."""
+        scraper = await stack.enter_async_context(PriceScraper(self.config, self.concurrency))
+        return lambda site_name: scraper
@@ -4,8 +4,9 @@ Scraper manager for coordinating price scraping tasks
 
 import asyncio
 import logging
-from typing import Dict, List, Any
-from .scraper import ScraperManager as BaseScraper
+from contextlib import AsyncExitStack
+from typing import Callable, Dict, List, Any, Optional
+from .scraper import ScraperManager as BaseScraper, PriceScraper
 from .uk_scraper import UKCateringScraper
 
 logger = logging.getLogger(__name__)
@@ -14,10 +15,9 @@ logger = logging.getLogger(__name__)
 class ScraperManager(BaseScraper):
     """Enhanced scraper manager with additional coordination features."""
     
-    def __init__(self, config):
-        super().__init__(config)
+    def __init__(self, config, db_manager=None):
+        super().__init__(config, db_manager)
         self.active_tasks = {}
-        self.semaphore = asyncio.Semaphore(config.max_concurrent_requests)
     
     async def scrape_product_by_id(self, product_id: int, product_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
         """Scrape a specific product by ID with task tracking."""
@@ -50,12 +50,12 @@ class ScraperManager(BaseScraper):
         
         if has_uk_sites:
             # Use UK-specific scraper
-            async with UKCateringScraper(self.config) as scraper:
+            async with UKCateringScraper(self.config, self.concurrency) as scraper:
                 tasks = []
                 
                 for site_name, url in urls.items():
                     if self.config.is_site_enabled(site_name):
-                        task = self._scrape_with_semaphore_uk(scraper, url, site_name)
+                        task = self._scrape_with_semaphore_uk(scraper, url, site_name, product_id)
                         tasks.append((site_name, task))
                         
                         # Add delay between requests
@@ -75,12 +75,12 @@ class ScraperManager(BaseScraper):
         else:
             # Use generic scraper for non-UK sites
             from .scraper import PriceScraper
-            async with PriceScraper(self.config) as scraper:
+            async with PriceScraper(self.config, self.concurrency) as scraper:
                 tasks = []
                 
                 for site_name, url in urls.items():
                     if self.config.is_site_enabled(site_name):
-                        task = self._scrape_with_semaphore(scraper, url, site_name)
+                        task = self._scrape_with_semaphore(scraper, url, site_name, product_id)
                         tasks.append((site_name, task))
                         
                         # Add delay between requests
@@ -100,15 +100,17 @@ class ScraperManager(BaseScraper):
         
         return results
     
-    async def _scrape_with_semaphore_uk(self, scraper: UKCateringScraper, url: str, site_name: str):
+    async def _scrape_with_semaphore_uk(self, scraper: UKCateringScraper, url: str, site_name: str,
+                                        product_id: Optional[int] = None):
         """Scrape with semaphore using UK scraper."""
-        async with self.semaphore:
-            return await scraper.scrape_product_price(url, site_name)
-        
-    async def _scrape_with_semaphore(self, scraper, url: str, site_name: str):
-        """Scrape with semaphore using generic scraper."""
-        async with self.semaphore:
-            return await scraper.scrape_product_price(url, site_name)
+        return await self._scrape_with_semaphore(scraper, url, site_name, product_id)
+    
+    async def _open_scrapers(self, stack: AsyncExitStack) -> Callable[[str], PriceScraper]:
+        """Use the UK catering scraper for UK sites and the generic scraper for the rest."""
+        uk_scraper = await stack.enter_async_context(UKCateringScraper(self.config, self.concurrency))
+        generic_scraper = await stack.enter_async_context(PriceScraper(self.config, self.concurrency))
+        uk_sites = PriceScraper.get_uk_catering_sites()
+        return lambda site_name: uk_scraper if site_name in uk_sites else generic_scraper
     
     async def cancel_product_scraping(self, product_id: int) -> bool:
         """Cancel scraping for a specific product."""
@@ -179,12 +181,12 @@ class ScraperManager(BaseScraper):
         
         if has_uk_sites:
             # Use UK catering scraper
-            async with UKCateringScraper(self.config) as scraper:
+            async with UKCateringScraper(self.config, self.concurrency) as scraper:
                 tasks = []
                 
                 for site_name, url in urls.items():
                     if self.config.is_site_enabled(site_name):
-                        task = self._scrape_with_semaphore_uk(scraper, url, site_name)
+                        task = self._scrape_with_semaphore_uk(scraper, url, site_name, product_id)
                         tasks.append((site_name, task))
                         
                         # Add delay between requests
@@ -207,7 +209,7 @@ class ScraperManager(BaseScraper):
         
         return results
     
-    async def _scrape_with_semaphore_uk(self, scraper: UKCateringScraper, url: str, site_name: str):
+    async def _scrape_with_semaphore_uk(self, scraper: UKCateringScraper, url: str, site_name: str,
+                                        product_id: Optional[int] = None):
         """Scrape with semaphore using UK scraper."""
-        async with self.semaphore:
-            return await scraper.scrape_product_price(url, site_name)
+        return await self._scrape_with_semaphore(scraper, url, site_name, product_id)
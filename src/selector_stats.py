@@ -0,0 +1,127 @@
+"""
+Per-site selector hit rates and latency, used to try the most successful selectors first
+
+The extractors walk selector lists until one matches. ``SelectorStats`` keeps,
+for each site and field, how often each selector was evaluated, how often it
+gave a value and how long it took. Once a field has ``min_observations``
+evaluations, ``order`` returns its selectors by smoothed hit rate, then mean
+time, with the configured order breaking ties. The statistics are saved to a
+JSON file so the learned order carries over between runs.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Dict, Any, List
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SelectorStats:
+    """Selector hit-rate statistics for one stats file, shared by every scraper in the process."""
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, ordering_config: Dict[str, Any] = None):
+        ordering_config = ordering_config or {}
+        self.enabled = ordering_config.get('enabled', False)
+        self.path = ordering_config.get('stats_path', 'selector_stats.json')
+        self.min_observations = int(ordering_config.get('min_observations', 20))
+        self._lock = threading.Lock()
+        self._selectors = {}
+        self._pages = {}
+        self._dirty = False
+        self.evaluations = 0
+        if self.enabled:
+            self._load()
+
+    @classmethod
+    def shared(cls, ordering_config: Dict[str, Any] = None) -> 'SelectorStats':
+        """The process-wide instance for the configured stats file, so scrapers do not overwrite each other."""
+        ordering_config = ordering_config or {}
+        key = (ordering_config.get('stats_path', 'selector_stats.json'), bool(ordering_config.get('enabled')))
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(ordering_config)
+            return cls._instances[key]
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                self._selectors = json.load(f).get('selectors', {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read selector statistics from {self.path}: {e}")
+
+    def save(self):
+        """Write the statistics to ``stats_path`` if anything changed since the last save."""
+        if not self.enabled or not self._dirty:
+            return
+        with self._lock:
+            data = json.dumps({'selectors': self._selectors}, indent=1, sort_keys=True)
+            self._dirty = False
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp') as f:
+                f.write(data)
+            os.replace(f.name, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save selector statistics to {self.path}: {e}")
+
+    def order(self, site: str, field: str, selectors: List[str]) -> List[str]:
+        """``selectors`` in the order to try them: learned order if enabled and warmed up, else as given."""
+        if not self.enabled:
+            return selectors
+        with self._lock:
+            stats = self._selectors.get(site, {}).get(field, {})
+            if sum(entry['tries'] for entry in stats.values()) < self.min_observations:
+                return selectors
+
+            def rank(item):
+                index, selector = item
+                entry = stats.get(selector)
+                if entry is None:
+                    # Not tried yet: give it the benefit of the doubt
+                    return (-0.5, 0.0, index)
+                hit_rate = (entry['hits'] + 1) / (entry['tries'] + 2)
+                return (-hit_rate, entry['seconds'] / entry['tries'], index)
+
+            return [selector for _, selector in sorted(enumerate(selectors), key=rank)]
+
+    def record(self, site: str, field: str, selector: str, hit: bool, seconds: float):
+        """Record one selector evaluation."""
+        with self._lock:
+            self.evaluations += 1
+            if not self.enabled:
+                return
+            entry = self._selectors.setdefault(site, {}).setdefault(field, {}).setdefault(
+                selector, {'tries': 0, 'hits': 0, 'seconds': 0.0})
+            entry['tries'] += 1
+            entry['hits'] += int(hit)
+            entry['seconds'] += seconds
+            self._dirty = True
+
+    def record_page(self, site: str, evaluations: int):
+        """Record how many selectors were evaluated to extract one page."""
+        with self._lock:
+            pages = self._pages.setdefault(site, {'pages': 0, 'evaluations': 0})
+            pages['pages'] += 1
+            pages['evaluations'] += evaluations
+        metrics.SELECTOR_EVALUATIONS.observe(evaluations, site=site)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Pages extracted and mean selector evaluations per page, by site."""
+        with self._lock:
+            return {site: {'pages': pages['pages'],
+                           'evaluations_per_page': pages['evaluations'] / pages['pages']}
+                    for site, pages in sorted(self._pages.items())}
+
+    def reset_pages(self):
+        with self._lock:
+            self._pages.clear()
@@ -3,14 +3,18 @@ Automated shopping list generator for price tracker
 Analyzes scraped prices to determine cheapest store for each product
 """
 
+import asyncio
 import json
 import logging
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional, Any
 from dataclasses import dataclass
 
 from .database import DatabaseManager
 from .notification import NotificationManager
+from .price_index import BestPriceIndex, STORE_PRIORITY
+from .basket_optimiser import BasketOptimiser, DeliveryRule
 
 logger = logging.getLogger(__name__)
 
@@ -37,15 +41,24 @@ class StoreShoppingList:
     total_cost: float
     total_savings: float
     item_count: int
+    delivery_fee: float = 0.0
 
 
 class AutoShoppingListGenerator:
     """Generates automated shopping lists based on current best prices."""
     
-    def __init__(self, db_manager: DatabaseManager, notification_manager: NotificationManager = None):
+    def __init__(self, db_manager: DatabaseManager, notification_manager: NotificationManager = None,
+                 delivery_rules: Optional[Dict[str, Dict[str, Any]]] = None):
         self.db_manager = db_manager
         self.notification_manager = notification_manager
         
+        # Per-store delivery fees and minimum orders; when set, lists are optimised as one basket
+        self.delivery_rules = {
+            store_name: DeliveryRule.from_config(rule)
+            for store_name, rule in (delivery_rules or {}).items()
+        }
+        self.basket_optimiser = BasketOptimiser(self.delivery_rules, store_priority=STORE_PRIORITY)
+        
         # Store display names and URLs
         self.store_info = {
             'jjfoodservice': {
@@ -61,84 +74,81 @@ class AutoShoppingListGenerator:
                 'base_url': 'https://www.amazon.co.uk'
             }
         }
+        
+        # Latest/best price per product, updated incrementally from new price rows
+        self.price_index = BestPriceIndex(db_manager)
+        
+        # Shopping lists cached against the DB change counters they were built from
+        self._cache_lock = threading.Lock()
+        self._cached_lists = None
+        self._cached_version = None
+    
+    def _data_version(self) -> Tuple[int, int]:
+        """Get the change counters of the tables shopping lists are built from."""
+        versions = self.db_manager.get_data_versions()
+        return versions['products']['version'], versions['price_history']['version']
+    
+    def invalidate_cache(self):
+        """Drop cached shopping lists so the next request rebuilds them."""
+        with self._cache_lock:
+            self._cached_lists = None
+            self._cached_version = None
     
     def get_current_best_prices(self) -> Dict[int, Dict]:
-        """Get the current cheapest price for each product across all stores."""
-        conn = self.db_manager.get_connection()
-        cursor = conn.cursor()
-        
-        # Get latest price for each product from each store
-        query = """
-        WITH latest_prices AS (
-            SELECT 
-                p.id as product_id,
-                p.name as product_name,
-                ph.site_name,
-                ph.price,
-                ph.timestamp,
-                p.urls,
-                ROW_NUMBER() OVER (PARTITION BY p.id, ph.site_name ORDER BY ph.timestamp DESC) as rn
-            FROM products p
-            LEFT JOIN price_history ph ON p.id = ph.product_id
-            WHERE ph.price IS NOT NULL AND ph.price > 0 AND p.active = 1
-        ),
-        current_prices AS (
-            SELECT * FROM latest_prices WHERE rn = 1
-        ),
-        cheapest_per_product AS (
-            SELECT 
-                product_id,
-                product_name,
-                MIN(price) as min_price,
-                MAX(price) as max_price
-            FROM current_prices
-            GROUP BY product_id, product_name
-        )
-        SELECT 
-            cp.product_id,
-            cp.product_name,
-            cp.site_name,
-            cp.price,
-            cp.timestamp,
-            cp.urls,
-            cpp.min_price,
-            cpp.max_price
-        FROM current_prices cp
-        JOIN cheapest_per_product cpp ON cp.product_id = cpp.product_id
-        WHERE cp.price = cpp.min_price
-        ORDER BY cp.product_name, cp.site_name
+        """Get the current cheapest price for each product across all stores.
+        
+        Served from the incremental price index, so only products with new
+        prices since the last call are re-read from the database.
         """
+        return self.price_index.best_prices()
+    
+    def generate_shopping_lists(self) -> List[StoreShoppingList]:
+        """Get automated shopping lists for each store, rebuilding them only after product or price writes."""
+        version = self._data_version()
         
-        cursor.execute(query)
-        results = cursor.fetchall()
-        conn.close()
-        
-        # Group by product (handle ties where multiple stores have same lowest price)
-        best_prices = {}
-        for row in results:
-            product_id = row[0]
-            if product_id not in best_prices:
-                best_prices[product_id] = []
-            
-            # Parse URLs from JSON
-            urls = json.loads(row[5]) if row[5] else {}
-            site_name = row[2]
-            store_url = urls.get(site_name, "")
-            
-            best_prices[product_id].append({
-                'product_name': row[1],
-                'store_name': site_name,
-                'price': row[3],
-                'scraped_at': datetime.fromisoformat(row[4]),
-                'store_url': store_url,
-                'min_price': row[6],
-                'max_price': row[7]
+        with self._cache_lock:
+            if self._cached_lists is None or self._cached_version != version:
+                self._cached_lists = self._build_shopping_lists()
+                self._cached_version = version
+            
+            return self._cached_lists
+    
+    def _build_shopping_lists(self) -> List[StoreShoppingList]:
+        """Build shopping lists for each store from the current best prices."""
+        if any(not rule.is_trivial() for rule in self.delivery_rules.values()):
+            store_lists, delivery_fees = self._optimised_store_items()
+        else:
+            store_lists, delivery_fees = self._cheapest_store_items(), {}
+        
+        # Convert to StoreShoppingList objects
+        shopping_lists = []
+        for store_name, items in store_lists.items():
+            store_info = self.store_info.get(store_name, {
+                'display_name': store_name.title(),
+                'base_url': ''
             })
+            
+            total_cost = sum(item.current_price for item in items)
+            total_savings = sum(item.savings_vs_most_expensive for item in items)
+            
+            shopping_list = StoreShoppingList(
+                store_name=store_name,
+                store_display_name=store_info['display_name'],
+                base_url=store_info['base_url'],
+                items=sorted(items, key=lambda x: x.product_name.lower()),
+                total_cost=total_cost,
+                total_savings=total_savings,
+                item_count=len(items),
+                delivery_fee=delivery_fees.get(store_name, 0.0)
+            )
+            
+            shopping_lists.append(shopping_list)
         
-        return best_prices
+        # Sort by total cost (cheapest store first)
+        return sorted(shopping_lists, key=lambda x: x.total_cost)
     
-    def generate_shopping_lists(self) -> List[StoreShoppingList]:
-        """Generate automated shopping lists for each store."""
+    def _cheapest_store_items(self) -> Dict[str, List[ShoppingItem]]:
+        """Assign each product to its cheapest store on its own."""
         best_prices = self.get_current_best_prices()
         
         # Group items by store
@@ -146,8 +156,7 @@ class AutoShoppingListGenerator:
         
         for product_id, price_options in best_prices.items():
             # If multiple stores have the same lowest price, prefer in order: JJ Food Service, A to Z, Amazon
-            store_priority = {'jjfoodservice': 1, 'atoz_catering': 2, 'amazon_uk': 3}
-            best_option = min(price_options, key=lambda x: (x['price'], store_priority.get(x['store_name'], 999)))
+            best_option = min(price_options, key=lambda x: (x['price'], STORE_PRIORITY.get(x['store_name'], 999)))
             
             store_name = best_option['store_name']
             if store_name not in store_lists:
@@ -168,39 +177,46 @@ class AutoShoppingListGenerator:
             
             store_lists[store_name].append(shopping_item)
         
-        # Convert to StoreShoppingList objects
-        shopping_lists = []
-        for store_name, items in store_lists.items():
-            store_info = self.store_info.get(store_name, {
-                'display_name': store_name.title(),
-                'base_url': ''
-            })
-            
-            total_cost = sum(item.current_price for item in items)
-            total_savings = sum(item.savings_vs_most_expensive for item in items)
+        return store_lists
+    
+    def _optimised_store_items(self) -> Tuple[Dict[str, List[ShoppingItem]], Dict[str, float]]:
+        """Split products across stores to minimise item cost plus delivery charges."""
+        latest_prices = self.price_index.latest_prices()
+        result = self.basket_optimiser.optimise({
+            product_id: {site_name: entry['price'] for site_name, entry in sites.items()}
+            for product_id, sites in latest_prices.items()
+        })
+        
+        logger.info(f"Basket optimised: £{result.item_cost:.2f} items + £{result.delivery_cost:.2f} delivery "
+                    f"({'optimal' if result.optimal else 'best found'}, {result.elapsed * 1000:.0f} ms)")
+        
+        store_lists = {}
+        for product_id, store_name in result.assignment.items():
+            sites = latest_prices[product_id]
+            entry = sites[store_name]
+            product = self.price_index.product_info(product_id)
             
-            shopping_list = StoreShoppingList(
+            store_lists.setdefault(store_name, []).append(ShoppingItem(
+                product_id=product_id,
+                product_name=product.get('name', ''),
+                current_price=entry['price'],
                 store_name=store_name,
-                store_display_name=store_info['display_name'],
-                base_url=store_info['base_url'],
-                items=sorted(items, key=lambda x: x.product_name.lower()),
-                total_cost=total_cost,
-                total_savings=total_savings,
-                item_count=len(items)
-            )
-            
-            shopping_lists.append(shopping_list)
+                store_url=product.get('urls', {}).get(store_name, ""),
+                last_updated=datetime.fromisoformat(entry['timestamp']),
+                savings_vs_most_expensive=max(site['price'] for site in sites.values()) - entry['price']
+            ))
         
-        # Sort by total cost (cheapest store first)
-        return sorted(shopping_lists, key=lambda x: x.total_cost)
+        return store_lists, result.store_delivery
     
-    def get_summary_stats(self) -> Dict:
-        """Get summary statistics about the current shopping recommendations."""
-        shopping_lists = self.generate_shopping_lists()
+    def get_summary_stats(self, shopping_lists: Optional[List[StoreShoppingList]] = None) -> Dict:
+        """Get summary statistics about the given (or current) shopping recommendations."""
+        if shopping_lists is None:
+            shopping_lists = self.generate_shopping_lists()
         
         total_products = sum(sl.item_count for sl in shopping_lists)
         total_cost = sum(sl.total_cost for sl in shopping_lists)
         total_savings = sum(sl.total_savings for sl in shopping_lists)
+        total_delivery = sum(sl.delivery_fee for sl in shopping_lists)
         
         # Find the most recommended store
         best_store = max(shopping_lists, key=lambda x: x.item_count) if shopping_lists else None
@@ -209,6 +225,7 @@ class AutoShoppingListGenerator:
             'total_products': total_products,
             'total_cost': total_cost,
             'total_savings': total_savings,
+            'total_delivery': total_delivery,
             'store_count': len(shopping_lists),
             'most_items_store': best_store.store_display_name if best_store else None,
             'most_items_count': best_store.item_count if best_store else 0,
@@ -222,7 +239,7 @@ class AutoShoppingListGenerator:
         
         try:
             shopping_lists = self.generate_shopping_lists()
-            summary = self.get_summary_stats()
+            summary = self.get_summary_stats(shopping_lists)
             
             if not shopping_lists:
                 return False
@@ -241,7 +258,7 @@ class AutoShoppingListGenerator:
             )
             
             # Send webhook if configured
-            if self.notification_manager.config.get('webhook', {}).get('enabled'):
+            if self.notification_manager.notification_config.get('webhook', {}).get('enabled'):
                 webhook_data = {
                     'type': 'daily_shopping_list',
                     'summary': summary,
@@ -255,7 +272,7 @@ class AutoShoppingListGenerator:
                         for sl in shopping_lists
                     ]
                 }
-                self.notification_manager.send_webhook(webhook_data)
+                asyncio.run(self._send_webhook_and_close(webhook_data))
             
             return success
             
@@ -263,6 +280,12 @@ class AutoShoppingListGenerator:
             logger.error(f"Error sending daily shopping list: {str(e)}")
             return False
     
+    async def _send_webhook_and_close(self, webhook_data: Dict[str, Any]) -> bool:
+        try:
+            return await self.notification_manager.send_webhook(webhook_data)
+        finally:
+            await self.notification_manager.webhook_dispatcher.close()
+    
     def _generate_email_html(self, shopping_lists: List[StoreShoppingList], summary: Dict) -> str:
         """Generate HTML email content for shopping lists."""
         html = f"""
@@ -405,7 +428,7 @@ SUMMARY:
     
     def get_latest_prices_by_store(self, days_back: int = 1) -> Dict[str, List[Dict[str, Any]]]:
         """Get the latest prices for all products grouped by store."""
-        with self.db.get_connection() as conn:
+        with self.db_manager.get_connection() as conn:
             query = '''
                 SELECT 
                     p.id as product_id,
@@ -659,51 +682,55 @@ SUMMARY:
     
     async def send_shopping_lists(self, shopping_lists: Dict[str, StoreShoppingList]) -> Dict[str, bool]:
         """Send shopping lists via email and/or webhook."""
-        results = {}
+        # Send every store at once so their webhook events are coalesced into one request
+        store_names = list(shopping_lists)
+        sent = await asyncio.gather(*(
+            self._send_store_shopping_list(store_name, shopping_lists[store_name])
+            for store_name in store_names
+        ))
+        return dict(zip(store_names, sent))
+    
+    async def _send_store_shopping_list(self, store_name: str, shopping_list: StoreShoppingList) -> bool:
+        preferences = self.get_store_preferences(store_name)
+        sent = False
         
-        for store_name, shopping_list in shopping_lists.items():
-            preferences = self.get_store_preferences(store_name)
-            sent = False
+        try:
+            # Generate email content
+            if preferences.get('auto_send_email', True):
+                email_content = self._generate_email_content(shopping_list)
+                email_sent = await self.notification_manager.send_email_async(
+                    subject=f"Daily Shopping List - {store_name}",
+                    message=email_content,
+                    html_message=self._generate_html_email_content(shopping_list)
+                )
+                sent = sent or email_sent
+            
+            # Send webhook
+            if preferences.get('auto_send_webhook', False):
+                webhook_data = self._generate_webhook_data(shopping_list)
+                webhook_sent = await self.notification_manager.send_webhook(webhook_data)
+                sent = sent or webhook_sent
+            
+            # Update database with send status
+            if sent:
+                list_id = self.save_shopping_list(shopping_list)
+                with self.db.get_connection() as conn:
+                    conn.execute('''
+                        UPDATE shopping_lists 
+                        SET sent_at = CURRENT_TIMESTAMP,
+                            email_sent = ?, webhook_sent = ?
+                        WHERE id = ?
+                    ''', (
+                        preferences.get('auto_send_email', True),
+                        preferences.get('auto_send_webhook', False),
+                        list_id
+                    ))
+            
+            return sent
             
-            try:
-                # Generate email content
-                if preferences.get('auto_send_email', True):
-                    email_content = self._generate_email_content(shopping_list)
-                    email_sent = await self.notification_manager.send_email(
-                        subject=f"Daily Shopping List - {store_name}",
-                        body=email_content,
-                        html_body=self._generate_html_email_content(shopping_list)
-                    )
-                    sent = sent or email_sent
-                
-                # Send webhook
-                if preferences.get('auto_send_webhook', False):
-                    webhook_data = self._generate_webhook_data(shopping_list)
-                    webhook_sent = await self.notification_manager.send_webhook(webhook_data)
-                    sent = sent or webhook_sent
-                
-                # Update database with send status
-                if sent:
-                    list_id = self.save_shopping_list(shopping_list)
-                    with self.db.get_connection() as conn:
-                        conn.execute('''
-                            UPDATE shopping_lists 
-                            SET sent_at = CURRENT_TIMESTAMP,
-                                email_sent = ?, webhook_sent = ?
-                            WHERE id = ?
-                        ''', (
-                            preferences.get('auto_send_email', True),
-                            preferences.get('auto_send_webhook', False),
-                            list_id
-                        ))
-                
-                results[store_name] = sent
-                
-            except Exception as e:
-                logger.error(f"Failed to send shopping list for {store_name}: {str(e)}")
-                results[store_name] = False
-        
-        return results
+        except Exception as e:
+            logger.error(f"Failed to send shopping list for {store_name}: {str(e)}")
+            return False
     
     def _generate_email_content(self, shopping_list: StoreShoppingList) -> str:
         """Generate plain text email content for shopping list."""
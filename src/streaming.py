@@ -0,0 +1,175 @@
+"""
+Streamed page download that stops once a site's price, title and availability markers are in
+
+Product pages (Amazon's in particular) run to hundreds of KB or more, but the
+elements the extractors need usually come early. ``read_html`` decodes the body
+chunk by chunk and feeds it to ``MarkerScanner``, an incremental HTML parser
+that watches for each field's marker selectors. Once every field's marker
+element has been closed, or ``max_body_bytes`` have been read, the rest of the
+body is never downloaded.
+"""
+
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import ClientResponse
+
+# Elements with no closing tag; they are matched as soon as they open
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                 'param', 'source', 'track', 'wbr'}
+
+_COMPOUND = re.compile(r'''
+    (?P<tag>[a-zA-Z][\w-]*|\*)?
+    (?P<rest>(?:\#[\w-]+|\.[\w-]+|\[[\w-]+(?:=(?:"[^"]*"|'[^']*'|[^\]]*))?\])*)
+''', re.VERBOSE)
+_PART = re.compile(r'''\#(?P<id>[\w-]+)|\.(?P<cls>[\w-]+)|\[(?P<attr>[\w-]+)(?:=(?P<value>"[^"]*"|'[^']*'|[^\]]*))?\]''')
+
+
+def _compile_compound(text: str) -> Optional[Dict]:
+    match = _COMPOUND.fullmatch(text)
+    if not match or not text:
+        return None
+    compound = {'tag': None if match['tag'] in (None, '*') else match['tag'].lower(),
+                'classes': set(), 'attrs': {}}
+    for part in _PART.finditer(match['rest']):
+        if part['id']:
+            compound['attrs']['id'] = part['id']
+        elif part['cls']:
+            compound['classes'].add(part['cls'])
+        else:
+            value = part['value']
+            if value is not None and value[:1] in '"\'':
+                value = value[1:-1]
+            compound['attrs'][part['attr'].lower()] = value
+    return compound
+
+
+def compile_selector(selector: str) -> Optional[List[Tuple[str, Dict]]]:
+    """Split a CSS selector into (combinator, compound) steps, subject last.
+
+    Only tag, #id, .class and [attr] / [attr=value] compounds joined by
+    descendant or ``>`` combinators are understood; anything else (pseudo-classes,
+    sibling combinators) gives None, and the marker is never considered found.
+    """
+    steps = []
+    combinator = ' '
+    for token in re.split(r'\s*(>)\s*|\s+', selector.strip()):
+        if not token:
+            continue
+        if token == '>':
+            combinator = '>'
+            continue
+        compound = _compile_compound(token)
+        if compound is None:
+            return None
+        steps.append((combinator, compound))
+        combinator = ' '
+    return steps or None
+
+
+def _matches(compound: Dict, element: Tuple[str, Dict[str, str]]) -> bool:
+    tag, attrs = element
+    if compound['tag'] and compound['tag'] != tag:
+        return False
+    if compound['classes'] and not compound['classes'] <= set((attrs.get('class') or '').split()):
+        return False
+    for name, value in compound['attrs'].items():
+        if name not in attrs or (value is not None and attrs[name] != value):
+            return False
+    return True
+
+
+def _selector_matches(steps: List[Tuple[str, Dict]], element, ancestors: List) -> bool:
+    """Whether ``element`` with ``ancestors`` (outermost first) matches the selector."""
+    if not _matches(steps[-1][1], element):
+        return False
+    position = len(ancestors)
+    for index in range(len(steps) - 1, 0, -1):
+        combinator, compound = steps[index][0], steps[index - 1][1]
+        if combinator == '>':
+            position -= 1
+            if position < 0 or not _matches(compound, ancestors[position]):
+                return False
+        else:
+            position -= 1
+            while position >= 0 and not _matches(compound, ancestors[position]):
+                position -= 1
+            if position < 0:
+                return False
+    return True
+
+
+class MarkerScanner(HTMLParser):
+    """Incremental HTML parser reporting when each field's marker element has been read.
+
+    ``markers`` maps a field (price, title, availability) to selectors; the field
+    is found when an element matching any of them is closed, so its text is
+    complete. Unclosed elements are closed implicitly by their parent's end tag.
+    """
+
+    def __init__(self, markers: Dict[str, List[str]]):
+        super().__init__(convert_charrefs=False)
+        self.markers = {field: [steps for steps in map(compile_selector, selectors) if steps]
+                        for field, selectors in markers.items()}
+        self.found = set()
+        self._open = []
+
+    @property
+    def done(self) -> bool:
+        return bool(self.markers) and len(self.found) == len(self.markers)
+
+    def _check(self, element, ancestors):
+        for field, selectors in self.markers.items():
+            if field not in self.found and any(_selector_matches(steps, element, ancestors)
+                                               for steps in selectors):
+                self.found.add(field)
+
+    def handle_starttag(self, tag, attrs):
+        element = (tag, {name: value or '' for name, value in attrs})
+        if tag in VOID_ELEMENTS:
+            self._check(element, self._open)
+        else:
+            self._open.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        self._check((tag, {name: value or '' for name, value in attrs}), self._open)
+
+    def handle_endtag(self, tag):
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index][0] == tag:
+                break
+        else:
+            return
+        while len(self._open) > index:
+            element = self._open.pop()
+            self._check(element, self._open)
+
+
+async def read_html(response: ClientResponse, markers: Dict[str, List[str]], chunk_bytes: int = 16384,
+                    max_body_bytes: Optional[int] = None) -> Tuple[str, str, int]:
+    """Read a response body as text, stopping early once ``markers`` are all found.
+
+    Returns the text read, why reading stopped (``complete``, ``markers`` or
+    ``max_size``) and the number of body bytes read.
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(response.charset or 'utf-8')(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    scanner = MarkerScanner(markers) if markers else None
+    parts = []
+    size = 0
+    async for chunk in response.content.iter_chunked(chunk_bytes):
+        size += len(chunk)
+        text = decoder.decode(chunk)
+        parts.append(text)
+        if scanner is not None:
+            scanner.feed(text)
+            if scanner.done:
+                return ''.join(parts), 'markers', size
+        if max_body_bytes and size >= max_body_bytes:
+            return ''.join(parts), 'max_size', size
+    parts.append(decoder.decode(b'', final=True))
+    return ''.join(parts), 'complete', size
@@ -0,0 +1,248 @@
+"""
+Fast-path extraction from structured data: JSON-LD, microdata and Open Graph tags
+
+Many product pages describe themselves for search engines with a schema.org
+Product in ``application/ld+json``, ``itemprop`` microdata, or ``og:price``
+meta tags. ``extract_structured_data`` finds those with targeted regular
+expressions over the raw HTML, without building a parse tree, and the
+scrapers only fall back to BeautifulSoup and the selector cascades when it
+comes back empty. ``FAST_PATH_STATS`` keeps the per-site hit rate and an
+estimate of the time saved.
+"""
+
+import html as html_lib
+import json
+import re
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import metrics
+
+_JSON_LD = re.compile(r'<script\b[^>]*\btype\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+                      re.IGNORECASE | re.DOTALL)
+_ITEMPROP_TAG = re.compile(r'<([a-zA-Z][\w-]*)\b([^>]*\bitemprop\s*=\s*["\']?(?:price|priceCurrency|availability|name)\b[^>]*)>',
+                           re.IGNORECASE)
+_META_TAG = re.compile(r'<meta\b([^>]*)>', re.IGNORECASE)
+_ATTR = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
+_TEXT_AFTER = re.compile(r'([^<]*)')
+
+OG_PRICE = ('og:price:amount', 'product:price:amount')
+OG_CURRENCY = ('og:price:currency', 'product:price:currency')
+OG_AVAILABILITY = ('og:availability', 'product:availability')
+
+IN_STOCK = ('instock', 'in stock', 'limitedavailability', 'onlineonly', 'preorder', 'presale', 'backorder')
+OUT_OF_STOCK = ('outofstock', 'out of stock', 'soldout', 'sold out', 'discontinued')
+
+
+def _attrs(text: str) -> Dict[str, str]:
+    return {match[1].lower(): html_lib.unescape(next(value for value in match.groups()[1:] if value is not None))
+            for match in _ATTR.finditer(text)}
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """A positive price from a structured-data value such as ``12.99``, ``"12.99"`` or ``"£1,299.00"``."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        price = float(value)
+    else:
+        match = re.search(r'\d[\d,]*(?:\.\d+)?', str(value))
+        if not match:
+            return None
+        price = float(match.group(0).replace(',', ''))
+    return round(price, 2) if price > 0 else None
+
+
+def parse_availability(value: Any) -> Optional[bool]:
+    """True or False from a schema.org availability URL or Open Graph value; None if unrecognised."""
+    if not value:
+        return None
+    text = str(value).lower().rsplit('/', 1)[-1]
+    if any(marker in text for marker in OUT_OF_STOCK):
+        return False
+    if any(marker in text for marker in IN_STOCK):
+        return True
+    return None
+
+
+def _types(node: Dict[str, Any]) -> List[str]:
+    types = node.get('@type', [])
+    return [types] if isinstance(types, str) else [t for t in types if isinstance(t, str)]
+
+
+def _products(data: Any) -> Iterator[Dict[str, Any]]:
+    """schema.org Product (or ProductGroup) nodes anywhere in a JSON-LD document."""
+    if isinstance(data, list):
+        for item in data:
+            yield from _products(item)
+    elif isinstance(data, dict):
+        if any(t in ('Product', 'ProductGroup', 'IndividualProduct') for t in _types(data)):
+            yield data
+        for key in ('@graph', 'mainEntity', 'itemListElement', 'item'):
+            if key in data:
+                yield from _products(data[key])
+
+
+def _offer_price(offer: Dict[str, Any]) -> Optional[float]:
+    for key in ('price', 'lowPrice'):
+        price = parse_price(offer.get(key))
+        if price is not None:
+            return price
+    specification = offer.get('priceSpecification')
+    for spec in specification if isinstance(specification, list) else [specification]:
+        if isinstance(spec, dict):
+            price = parse_price(spec.get('price'))
+            if price is not None:
+                return price
+    return None
+
+
+def _from_json_ld(html: str) -> Optional[Dict[str, Any]]:
+    for block in _JSON_LD.findall(html):
+        try:
+            data = json.loads(block.strip().removeprefix('<!--').removesuffix('-->'))
+        except ValueError:
+            continue
+        for product in _products(data):
+            offers = product.get('offers') or []
+            offers = [offer for offer in (offers if isinstance(offers, list) else [offers]) if isinstance(offer, dict)]
+            priced = [(price, offer) for offer in offers for price in [_offer_price(offer)] if price is not None]
+            if not priced:
+                continue
+            # Several sellers: the lowest price, as the selector cascades prefer offers
+            price, offer = min(priced, key=lambda item: item[0])
+            name = product.get('name')
+            return {
+                'price': price,
+                'title': html_lib.unescape(name.strip()) if isinstance(name, str) else None,
+                'availability': parse_availability(offer.get('availability')),
+                'currency': offer.get('priceCurrency'),
+                'source': 'json_ld'
+            }
+    return None
+
+
+def _from_microdata(html: str) -> Optional[Dict[str, Any]]:
+    values = {}
+    for match in _ITEMPROP_TAG.finditer(html):
+        attrs = _attrs(match.group(2))
+        prop = attrs.get('itemprop', '').split()[0] if attrs.get('itemprop') else ''
+        key = prop.lower()
+        if key in values:
+            continue
+        value = attrs.get('content') or attrs.get('href')
+        if value is None:
+            value = html_lib.unescape(_TEXT_AFTER.match(html, match.end()).group(1)).strip()
+        if value:
+            values[key] = value
+    price = parse_price(values.get('price'))
+    if price is None:
+        return None
+    return {
+        'price': price,
+        'title': values.get('name'),
+        'availability': parse_availability(values.get('availability')),
+        'currency': values.get('pricecurrency'),
+        'source': 'microdata'
+    }
+
+
+def _from_open_graph(html: str) -> Optional[Dict[str, Any]]:
+    values = {}
+    for match in _META_TAG.finditer(html):
+        attrs = _attrs(match.group(1))
+        key = (attrs.get('property') or attrs.get('name') or '').lower()
+        if key and key not in values and 'content' in attrs:
+            values[key] = attrs['content']
+    price = next((parse_price(values[key]) for key in OG_PRICE if key in values), None)
+    if price is None:
+        return None
+    return {
+        'price': price,
+        'title': values.get('og:title'),
+        'availability': next((parse_availability(values[key]) for key in OG_AVAILABILITY if key in values), None),
+        'currency': next((values[key] for key in OG_CURRENCY if key in values), None),
+        'source': 'open_graph'
+    }
+
+
+def extract_structured_data(html: str) -> Optional[Dict[str, Any]]:
+    """Price, title, availability and currency from structured data, or None to use the selectors.
+
+    JSON-LD is tried first, then microdata, then Open Graph; a source only
+    counts if it gives both a price and a title. Missing availability is taken
+    as in stock, as the site extractors do, and currency defaults to GBP.
+    """
+    if 'ld+json' not in html and 'itemprop' not in html and 'price:amount' not in html:
+        return None
+    for extractor in (_from_json_ld, _from_microdata, _from_open_graph):
+        data = extractor(html)
+        if data and data['title']:
+            data['title'] = data['title'].strip()
+            data['availability'] = True if data['availability'] is None else data['availability']
+            data['currency'] = (data['currency'] or 'GBP').upper()
+            return data
+    return None
+
+
+class FastPathStats:
+    """Per-site structured-data hit rate and the extraction time those hits saved.
+
+    Time saved is estimated per hit as the site's mean parse-and-cascade time on
+    pages that needed the fallback, minus the fast path's mean time on hits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sites = {}
+
+    def _site(self, site: str) -> Dict[str, float]:
+        return self._sites.setdefault(site, {'pages': 0, 'hits': 0, 'fast_seconds': 0.0, 'hit_seconds': 0.0,
+                                             'fallbacks': 0, 'fallback_seconds': 0.0})
+
+    def record(self, site: str, hit: bool, seconds: float):
+        """Record one fast-path attempt."""
+        saved = 0.0
+        with self._lock:
+            stats = self._site(site)
+            stats['pages'] += 1
+            stats['fast_seconds'] += seconds
+            if hit:
+                stats['hits'] += 1
+                stats['hit_seconds'] += seconds
+                if stats['fallbacks']:
+                    saved = max(stats['fallback_seconds'] / stats['fallbacks'] - seconds, 0.0)
+        metrics.STRUCTURED_DATA_PAGES.inc(site=site, outcome='hit' if hit else 'miss')
+        if saved:
+            metrics.STRUCTURED_DATA_SECONDS_SAVED.inc(saved, site=site)
+
+    def record_fallback(self, site: str, seconds: float):
+        """Record the parse-and-cascade time of a page the fast path could not handle."""
+        with self._lock:
+            stats = self._site(site)
+            stats['fallbacks'] += 1
+            stats['fallback_seconds'] += seconds
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Per-site pages, hits, hit rate, mean fast-path and fallback milliseconds, and seconds saved."""
+        report = {}
+        with self._lock:
+            for site, stats in sorted(self._sites.items()):
+                fallback = stats['fallback_seconds'] / stats['fallbacks'] if stats['fallbacks'] else 0.0
+                hit = stats['hit_seconds'] / stats['hits'] if stats['hits'] else 0.0
+                report[site] = {
+                    'pages': stats['pages'],
+                    'hits': stats['hits'],
+                    'hit_rate': stats['hits'] / stats['pages'] if stats['pages'] else 0.0,
+                    'fast_ms': stats['fast_seconds'] / stats['pages'] * 1000 if stats['pages'] else 0.0,
+                    'fallback_ms': fallback * 1000,
+                    'saved_seconds': stats['hits'] * max(fallback - hit, 0.0) if stats['fallbacks'] else 0.0
+                }
+        return report
+
+    def reset(self):
+        with self._lock:
+            self._sites.clear()
+
+
+FAST_PATH_STATS = FastPathStats()
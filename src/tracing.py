@@ -0,0 +1,223 @@
+"""
+Per-stage tracing of scrape runs, exported as a Chrome trace timeline
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Lane (Chrome trace thread id) that spans opened in this context are drawn on; 0 is the run itself
+_lane = contextvars.ContextVar('trace_lane', default=0)
+
+
+class Tracer:
+    """Collects timed spans for one scrape run.
+
+    Every (product, site) job is drawn on its own lane, reusing the lowest
+    free lane so the timeline shows how many jobs actually overlapped. Spans
+    are recorded as Chrome trace "complete" events and can be opened in
+    chrome://tracing or https://ui.perfetto.dev. While the tracer is stopped,
+    ``span`` and ``job`` do nothing.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.run_id = None
+        self._events = []
+        self._lock = threading.Lock()
+        self._origin_ns = 0
+        self._started_at = None
+        self._free_lanes = []
+        self._next_lane = 1
+        self._named_lanes = set()
+
+    def start(self, run_id: Optional[str] = None):
+        """Discard previous spans and start recording."""
+        with self._lock:
+            self._events = []
+            self._free_lanes = []
+            self._next_lane = 1
+            self._named_lanes = set()
+        self._started_at = datetime.now()
+        self.run_id = run_id or self._started_at.strftime('%Y%m%d-%H%M%S')
+        self._origin_ns = time.perf_counter_ns()
+        self.enabled = True
+        self._name_lane(0, 'scrape run')
+
+    def stop(self):
+        self.enabled = False
+
+    def _micros(self, perf_ns: int) -> float:
+        return (perf_ns - self._origin_ns) / 1000
+
+    def add_span(self, name: str, start_ns: int, end_ns: int, args: Optional[Dict[str, Any]] = None):
+        """Record a span measured elsewhere (``time.perf_counter_ns`` values) on the current lane."""
+        if not self.enabled:
+            return
+        event = {
+            'name': name,
+            'cat': 'scrape',
+            'ph': 'X',
+            'ts': self._micros(start_ns),
+            'dur': (end_ns - start_ns) / 1000,
+            'pid': os.getpid(),
+            'tid': _lane.get()
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """Time a with-block as a span; the yielded dict can be filled with extra args."""
+        if not self.enabled:
+            yield {}
+            return
+        started = time.perf_counter_ns()
+        try:
+            yield args
+        finally:
+            self.add_span(name, started, time.perf_counter_ns(), args)
+
+    @contextmanager
+    def job(self, product_id: int, site_name: str):
+        """Draw everything inside the block on a lane of its own, under a ``site #product`` span."""
+        if not self.enabled:
+            yield
+            return
+        with self._lock:
+            lane = self._free_lanes.pop(0) if self._free_lanes else self._next_lane
+            if lane == self._next_lane:
+                self._next_lane += 1
+        self._name_lane(lane, f'job lane {lane}')
+
+        token = _lane.set(lane)
+        try:
+            with self.span(f'{site_name} #{product_id}', product_id=product_id, site=site_name):
+                yield
+        finally:
+            _lane.reset(token)
+            with self._lock:
+                self._free_lanes.append(lane)
+                self._free_lanes.sort()
+
+    def _name_lane(self, lane: int, label: str):
+        with self._lock:
+            if lane in self._named_lanes:
+                return
+            self._named_lanes.add(lane)
+            self._events.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': lane,
+                'args': {'name': label}
+            })
+            self._events.append({
+                'name': 'thread_sort_index', 'ph': 'M', 'pid': os.getpid(), 'tid': lane,
+                'args': {'sort_index': lane}
+            })
+
+    def stage_totals(self) -> Dict[str, Dict[str, float]]:
+        """Count and total seconds per stage, with job spans grouped under ``job``."""
+        totals = {}
+        with self._lock:
+            events = [event for event in self._events if event['ph'] == 'X']
+        for event in events:
+            name = 'job' if '#' in event['name'] else event['name']
+            stage = totals.setdefault(name, {'count': 0, 'seconds': 0.0})
+            stage['count'] += 1
+            stage['seconds'] += event['dur'] / 1e6
+        return totals
+
+    def export(self, path: str) -> str:
+        """Write the recorded spans as a Chrome trace JSON file."""
+        with self._lock:
+            events = list(self._events)
+        trace = {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'run_id': self.run_id,
+                'started_at': self._started_at.isoformat() if self._started_at else None,
+                'stages': self.stage_totals()
+            }
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(trace, f)
+        return path
+
+
+TRACER = Tracer()
+span = TRACER.span
+job = TRACER.job
+
+
+def aiohttp_trace_config(tracer: Tracer = TRACER) -> aiohttp.TraceConfig:
+    """Request hooks that record connection-pool wait, DNS, connect and time-to-headers spans."""
+    trace_config = aiohttp.TraceConfig()
+
+    def timed(name: str, start_attr: str):
+        async def on_start(session, ctx, params):
+            setattr(ctx, start_attr, time.perf_counter_ns())
+
+        async def on_end(session, ctx, params):
+            started = getattr(ctx, start_attr, None)
+            if started is not None:
+                tracer.add_span(name, started, time.perf_counter_ns())
+                setattr(ctx, start_attr, None)
+
+        return on_start, on_end
+
+    queued_start, queued_end = timed('connection_wait', 'queued_at')
+    trace_config.on_connection_queued_start.append(queued_start)
+    trace_config.on_connection_queued_end.append(queued_end)
+
+    connect_start, connect_end = timed('connect', 'connect_at')
+    trace_config.on_connection_create_start.append(connect_start)
+    trace_config.on_connection_create_end.append(connect_end)
+
+    dns_start, dns_end = timed('dns', 'dns_at')
+    trace_config.on_dns_resolvehost_start.append(dns_start)
+    trace_config.on_dns_resolvehost_end.append(dns_end)
+
+    # on_request_end fires once the response headers are in
+    request_start, request_end = timed('request', 'request_at')
+    trace_config.on_request_start.append(request_start)
+    trace_config.on_request_end.append(request_end)
+    trace_config.on_request_exception.append(request_end)
+
+    return trace_config
+
+
+def start_from_env(tracer: Tracer = TRACER, path: Optional[str] = None) -> Optional[str]:
+    """Start tracing if a trace path is given or $SCRAPE_TRACE_FILE is set, returning the path."""
+    path = path or os.environ.get('SCRAPE_TRACE_FILE')
+    if path:
+        tracer.start()
+    return path
+
+
+def export_and_stop(path: Optional[str], tracer: Tracer = TRACER) -> Optional[str]:
+    """Export the trace to ``path`` (``{run_id}`` is filled in) and log where the time went."""
+    if not path or not tracer.enabled:
+        return None
+    tracer.stop()
+    path = tracer.export(path.format(run_id=tracer.run_id))
+
+    stages = sorted(tracer.stage_totals().items(), key=lambda item: item[1]['seconds'], reverse=True)
+    breakdown = ', '.join(f"{name} {stage['seconds']:.2f}s/{stage['count']}" for name, stage in stages)
+    logger.info(f"Scrape trace written to {path} ({breakdown})")
+    return path
+
@@ -4,9 +4,13 @@ Specialized scrapers for UK catering supply sites
 
 import re
 import logging
+import time
 from typing import Dict, Any, Optional, List, Tuple
 from bs4 import BeautifulSoup, Tag
-from .scraper import PriceScraper
+from .offer_matcher import OfferMatcher
+from .scraper import PriceScraper, FETCH_FAILED
+from .structured_data import FAST_PATH_STATS
+from . import metrics, tracing
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +18,9 @@ logger = logging.getLogger(__name__)
 class UKCateringScraper(PriceScraper):
     """Specialized scraper for UK catering supply websites."""
     
+    # Special-offer selector matchers by site, compiled on first use
+    _offer_matchers = {}
+    
     def _extract_special_pricing_context(self, element: Tag) -> Dict[str, Any]:
         """Extract special pricing context from an element and its surroundings."""
         context = {
@@ -63,8 +70,34 @@ class UKCateringScraper(PriceScraper):
         
         return context
     
-    def _parse_uk_price(self, price_text: str, prefer_delivery: bool = False) -> Optional[float]:
-        """Simple, conservative UK price parsing - just extract the first reasonable price."""
+    def _is_struck(self, node: Tag) -> bool:
+        """Whether a node marks a struck-through list price or a saving rather than the price to pay."""
+        if node.name in ('del', 's', 'strike') or node.has_attr('data-a-strike'):
+            return True
+        classes = ' '.join(node.get('class', [])).lower()
+        if any(name in classes for name in ('strike', 'was-price', 'original-price', 'rrp-price', 'price-save')):
+            return True
+        return 'line-through' in node.get('style', '').replace(' ', '').lower()
+    
+    def _is_was_price(self, element: Tag) -> bool:
+        """Whether an element is, or sits within three levels of, a struck-through price."""
+        return any(self._is_struck(node) for node in [element] + [p for p in element.parents if p.name][:3])
+    
+    def _without_struck_text(self, element: Tag, price_text: str) -> str:
+        """``price_text`` less the text of struck-through prices nested in the element."""
+        for node in element.find_all(True):
+            if self._is_struck(node):
+                price_text = price_text.replace(node.get_text(strip=True), '', 1)
+        return price_text
+    
+    def _parse_uk_price(self, price_text: str, prefer_delivery: bool = False,
+                        detect_special_offers: bool = False, element: Optional[Tag] = None) -> Optional[float]:
+        """Simple, conservative UK price parsing - just extract the first reasonable price.
+        
+        With ``detect_special_offers``, was prices and savings are skipped so that only
+        prices to pay are returned; ``element`` and its descendants are checked for
+        strikethrough markup.
+        """
         if not price_text:
             return None
         
@@ -72,6 +105,18 @@ class UKCateringScraper(PriceScraper):
         if len(price_text) > 100:
             return None
         
+        if detect_special_offers:
+            if element is not None:
+                if self._is_was_price(element):
+                    return None
+                price_text = self._without_struck_text(element, price_text)
+            # "Was £19.99 Now £15.49": the price to pay follows "now"
+            now_match = re.search(r'\bnow\b(.*)', price_text, re.IGNORECASE)
+            if now_match:
+                price_text = now_match.group(1)
+            elif re.search(r'\b(was|save|rrp)\b', price_text, re.IGNORECASE):
+                return None
+        
         # Check if this is delivery or collection pricing
         is_delivery = 'delivery' in price_text.lower()
         is_collection = 'collection' in price_text.lower()
@@ -94,10 +139,8 @@ class UKCateringScraper(PriceScraper):
         
         return None
     
-    def _find_special_offer_prices(self, soup: BeautifulSoup, site_name: str) -> List[Tuple[float, str]]:
-        """Find special offer prices using enhanced selectors."""
-        special_prices = []
-        
+    def _special_offer_selectors(self, site_name: str) -> List[str]:
+        """Special-offer selectors for a site, general ones first."""
         # Enhanced selectors for special offers
         special_offer_selectors = [
             # General special offer containers
@@ -145,15 +188,25 @@ class UKCateringScraper(PriceScraper):
                 '.a-price-was', '.a-price-save'
             ])
         
-        for selector in special_offer_selectors:
+        return special_offer_selectors
+    
+    def _offer_matcher(self, site_name: str) -> OfferMatcher:
+        """The site's special-offer selectors, compiled once into a single-pass matcher."""
+        if site_name not in self._offer_matchers:
+            self._offer_matchers[site_name] = OfferMatcher(self._special_offer_selectors(site_name))
+        return self._offer_matchers[site_name]
+    
+    def _find_special_offer_prices(self, soup: BeautifulSoup, site_name: str) -> List[Tuple[float, str]]:
+        """Find special offer prices using enhanced selectors."""
+        special_prices = []
+        
+        # One traversal for all selectors; candidates already have "£" in their text
+        for selector, candidates in self._offer_matcher(site_name).candidates(soup):
             try:
-                elements = soup.select(selector)
-                for element in elements:
-                    price_text = element.get_text(strip=True)
-                    if '£' in price_text:
-                        price = self._parse_uk_price(price_text, detect_special_offers=True, element=element)
-                        if price:
-                            special_prices.append((price, selector))
+                for element, price_text in candidates:
+                    price = self._parse_uk_price(price_text, detect_special_offers=True, element=element)
+                    if price:
+                        special_prices.append((price, selector))
             except Exception as e:
                 logger.debug(f"Error with special offer selector {selector}: {e}")
         
@@ -247,14 +300,7 @@ class UKCateringScraper(PriceScraper):
         
         # Extract title
         title_selectors = ['h1', '.product-title', '.product-name']
-        for selector in title_selectors:
-            try:
-                element = soup.select_one(selector)
-                if element:
-                    result['title'] = element.get_text(strip=True)
-                    break
-            except Exception as e:
-                logger.debug(f"Error with JJ Food Service title selector {selector}: {e}")
+        result['title'] = self._extract_text(soup, title_selectors, 'jjfoodservice', 'title')
         
         return result
     
@@ -326,14 +372,7 @@ class UKCateringScraper(PriceScraper):
             'title'
         ]
         
-        for selector in title_selectors:
-            try:
-                element = soup.select_one(selector)
-                if element:
-                    result['title'] = element.get_text(strip=True)
-                    break
-            except Exception as e:
-                logger.debug(f"Error with A to Z title selector {selector}: {e}")
+        result['title'] = self._extract_text(soup, title_selectors, 'atoz_catering', 'title')
         
         # Check availability - A to Z specific indicators
         availability_indicators = [
@@ -376,7 +415,6 @@ class UKCateringScraper(PriceScraper):
             best_special_price = min(price for price, _ in special_prices)
             result['price'] = best_special_price
             logger.info(f"Successfully scraped amazon_uk special offer price: £{best_special_price}")
-            return result
         
         # Amazon UK price selectors
         price_selectors = [
@@ -390,19 +428,16 @@ class UKCateringScraper(PriceScraper):
             'span.a-price.a-text-price.a-size-medium'
         ]
         
-        for selector in price_selectors:
-            try:
-                elements = soup.select(selector)
-                for element in elements:
-                    price_text = element.get_text(strip=True)
-                    price = self._parse_uk_price(price_text, detect_special_offers=True, element=element)
-                    if price is not None:
-                        result['price'] = price
-                        break
-                if result['price'] is not None:
-                    break
-            except Exception as e:
-                logger.debug(f"Error with Amazon UK price selector {selector}: {e}")
+        def price_from(selector):
+            for element in soup.select(selector):
+                price_text = element.get_text(strip=True)
+                price = self._parse_uk_price(price_text, detect_special_offers=True, element=element)
+                if price is not None:
+                    return price
+            return None
+        
+        if result['price'] is None:
+            result['price'] = self._cascade('amazon_uk', 'price', price_selectors, price_from)
         
         # Extract title
         title_selectors = [
@@ -412,14 +447,7 @@ class UKCateringScraper(PriceScraper):
             'h1'
         ]
         
-        for selector in title_selectors:
-            try:
-                element = soup.select_one(selector)
-                if element:
-                    result['title'] = element.get_text(strip=True)
-                    break
-            except Exception as e:
-                logger.debug(f"Error with Amazon UK title selector {selector}: {e}")
+        result['title'] = self._extract_text(soup, title_selectors, 'amazon_uk', 'title')
         
         # Check availability
         availability_selectors = [
@@ -429,16 +457,16 @@ class UKCateringScraper(PriceScraper):
             '#availability .a-declarative'
         ]
         
-        for selector in availability_selectors:
-            try:
-                element = soup.select_one(selector)
-                if element:
-                    availability_text = element.get_text().lower()
-                    if any(phrase in availability_text for phrase in ['out of stock', 'unavailable', 'not available']):
-                        result['availability'] = False
-                    break
-            except Exception as e:
-                logger.debug(f"Error with Amazon UK availability selector {selector}: {e}")
+        def availability_from(selector):
+            element = soup.select_one(selector)
+            if not element:
+                return None
+            availability_text = element.get_text().lower()
+            return not any(phrase in availability_text for phrase in ['out of stock', 'unavailable', 'not available'])
+        
+        available = self._cascade('amazon_uk', 'availability', availability_selectors, availability_from)
+        if available is not None:
+            result['availability'] = available
         
         return result
 
@@ -463,20 +491,16 @@ class UKCateringScraper(PriceScraper):
             '.selling-price'
         ]
         
-        for selector in price_selectors:
-            try:
-                elements = soup.select(selector)
-                for element in elements:
-                    price_text = element.get_text(strip=True)
-                    price = self._parse_uk_price(price_text)
-                    if price is not None:
-                        result['price'] = price
-                        logger.info(f"Successfully scraped {site_name} generic price: £{price}")
-                        break
-                if result['price'] is not None:
-                    break
-            except Exception as e:
-                logger.debug(f"Error with generic price selector {selector}: {e}")
+        def price_from(selector):
+            for element in soup.select(selector):
+                price = self._parse_uk_price(element.get_text(strip=True))
+                if price is not None:
+                    return price
+            return None
+        
+        result['price'] = self._cascade(site_name, 'price', price_selectors, price_from)
+        if result['price'] is not None:
+            logger.info(f"Successfully scraped {site_name} generic price: £{result['price']}")
         
         # Generic title selectors
         title_selectors = [
@@ -487,17 +511,40 @@ class UKCateringScraper(PriceScraper):
             'title'
         ]
         
-        for selector in title_selectors:
-            try:
-                element = soup.select_one(selector)
-                if element:
-                    result['title'] = element.get_text(strip=True)
-                    break
-            except Exception as e:
-                logger.debug(f"Error with generic title selector {selector}: {e}")
+        result['title'] = self._extract_text(soup, title_selectors, site_name, 'title')
         
         return result
 
+    def extract_page(self, html_content: str, site_name: str) -> Dict[str, Any]:
+        """Read a fetched page's structured data, or parse it and run the site's extractor over it."""
+        structured = self._extract_structured(html_content, site_name)
+        if structured is not None:
+            return structured
+        
+        started = time.perf_counter()
+        evaluations = self.selector_stats.evaluations
+        with metrics.PARSE_SECONDS.time(site=site_name), tracing.span('parse'):
+            soup = BeautifulSoup(html_content, 'html.parser')
+        
+        # Route to appropriate extraction method
+        if site_name == 'jjfoodservice':
+            extractor = self._extract_jjfoodservice_data
+        elif site_name == 'atoz_catering':
+            extractor = self._extract_atoz_catering_data
+        elif site_name == 'amazon_uk':
+            extractor = self._extract_amazon_uk_data
+        else:
+            # Fallback to generic extraction
+            extractor = lambda soup: self._extract_generic_data(soup, site_name)
+        
+        extractor_name = getattr(extractor, '__name__', 'generic')
+        with metrics.EXTRACT_SECONDS.time(site=site_name, extractor=extractor_name), \
+                tracing.span('extract', extractor=extractor_name):
+            result = extractor(soup)
+        self.selector_stats.record_page(site_name, self.selector_stats.evaluations - evaluations)
+        FAST_PATH_STATS.record_fallback(site_name, time.perf_counter() - started)
+        return result
+
     async def scrape_product_price(self, url: str, site_name: str = None) -> Dict[str, Any]:
         """Scrape price for a single product from a URL using UK-specific logic."""
         result = {
@@ -521,25 +568,18 @@ class UKCateringScraper(PriceScraper):
                 result['error'] = f"Site {site_name} is disabled"
                 return result
             
+            api_data = await self._scrape_api(url, site_name)
+            if api_data is not None:
+                return self._api_result(result, api_data, site_name)
+            
             # Fetch page content
-            html_content = await self._fetch_page(url)
+            with tracing.span('fetch', url=url):
+                html_content = await self._fetch_page(url, site_name)
             if not html_content:
-                result['error'] = "Failed to fetch page content"
+                result['error'] = FETCH_FAILED
                 return result
             
-            # Parse HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Route to appropriate extraction method
-            if site_name == 'jjfoodservice':
-                extracted_data = self._extract_jjfoodservice_data(soup)
-            elif site_name == 'atoz_catering':
-                extracted_data = self._extract_atoz_catering_data(soup)
-            elif site_name == 'amazon_uk':
-                extracted_data = self._extract_amazon_uk_data(soup)
-            else:
-                # Fallback to generic extraction
-                extracted_data = self._extract_generic_data(soup, site_name)
+            extracted_data = self.extract_page(html_content, site_name)
             
             if extracted_data['price'] is not None:
                 result.update({
@@ -570,7 +610,7 @@ class UKCateringScraper(PriceScraper):
                     logger.warning(f"Skipping unsupported site: {site_name}")
                     continue
                     
-                html_content = await self._fetch_page(url)
+                html_content = await self._fetch_page(url, site_name)
                 if not html_content:
                     results[site_name] = {
                         'success': False,
@@ -2,8 +2,10 @@
 Utility functions for the price tracker
 """
 
+import base64
+import json
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -116,3 +118,20 @@ def group_results_by_status(results: Dict[str, Dict[str, Any]]) -> Dict[str, Lis
             })
     
     return grouped
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """Encode a pagination position as an opaque URL-safe cursor."""
+    raw = json.dumps(position, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Dict[str, Any]]:
+    """Decode a cursor produced by encode_cursor, returning None if it is invalid."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    
+    return position if isinstance(position, dict) else None
@@ -2,13 +2,13 @@
 Web UI for the price tracker application
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_from_directory
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_from_directory, Response
 from flask_wtf import FlaskForm
 from wtforms import StringField, FloatField, TextAreaField, SubmitField, URLField
 from wtforms.validators import DataRequired, NumberRange, URL, Optional
 import json
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import plotly
 import plotly.graph_objs as go
 import pandas as pd
@@ -23,7 +23,12 @@ from .config import Config
 from .scraper_manager import ScraperManager
 from .notification import NotificationManager
 from .shopping_list import AutoShoppingListGenerator
-from .utils import format_price, group_results_by_status
+from .alerts import AlertEngine
+from .scrape_recorder import ScrapeRecorder, scrape_and_record
+from .price_analytics import PriceAnomalyDetector
+from . import metrics
+from .profiling import RequestProfilerMiddleware
+from .utils import format_price, group_results_by_status, encode_cursor, decode_cursor
 
 
 def create_app():
@@ -35,6 +40,12 @@ def create_app():
     app = Flask(__name__, template_folder=template_dir)
     app.config['SECRET_KEY'] = 'your-secret-key-change-this'
     
+    # Admins can profile a single request by sending X-Profile-Token
+    profile_token = os.environ.get('PROFILE_ADMIN_TOKEN')
+    if profile_token:
+        app.wsgi_app = RequestProfilerMiddleware(app.wsgi_app, profile_token,
+                                                 os.environ.get('PROFILE_DIR', 'profiles'))
+    
     # Initialize configuration with error handling
     config = Config()
     
@@ -71,9 +82,27 @@ def create_app():
     
     # Initialize other components only if config is valid
     db_manager = DatabaseManager(config.database_path)
-    scraper_manager = ScraperManager(config)
+    scraper_manager = ScraperManager(config, db_manager)
     notification_manager = NotificationManager(config)
-    shopping_list_generator = AutoShoppingListGenerator(db_manager, notification_manager)
+    shopping_list_generator = AutoShoppingListGenerator(db_manager, notification_manager,
+                                                        delivery_rules=config.delivery_rules)
+    # Manual scrapes are screened and alerted on like scheduled ones
+    recorder = ScrapeRecorder(
+        db_manager,
+        AlertEngine(db_manager, config.alert_config),
+        PriceAnomalyDetector(db_manager, config.anomaly_config)
+    )
+    
+    def scrape_summary_message(summary: dict) -> str:
+        """Flash message for a manual scrape's summary."""
+        message = f"Updated {summary['successful'] - summary['suspicious']} prices"
+        if summary['failed']:
+            message += f", {summary['failed']} failed"
+        if summary['suspicious']:
+            message += f", {summary['suspicious']} suspicious not saved"
+        if summary['alerts']:
+            message += f", {len(summary['alerts'])} price alerts"
+        return message
     
     class ProductForm(FlaskForm):
         name = StringField('Product Name', validators=[DataRequired()])
@@ -172,23 +201,20 @@ def create_app():
             
             results = loop.run_until_complete(scraper_manager.scrape_product(product))
             
-            # Save results to database
-            for site_name, result in results.items():
-                if result['success']:
-                    db_manager.save_price_history(
-                        product_id=product_id,
-                        site_name=site_name,
-                        price=result['price'],
-                        availability=result.get('availability', True),
-                        timestamp=datetime.now()
-                    )
+            # Screen, save and alert on the results, then send any alerts now due
+            summary = recorder.record_results({product_id: results})
+            loop.run_until_complete(recorder.alert_engine.dispatch(notification_manager))
+            loop.run_until_complete(notification_manager.close())
             
             loop.close()
             
+            message = scrape_summary_message(summary)
+            flash(message, 'warning' if summary['suspicious'] or summary['failed'] else 'success')
             return jsonify({
                 'success': True,
                 'results': results,
-                'message': 'Scraping completed successfully'
+                'suspicious': summary['suspicious'],
+                'message': message
             })
             
         except Exception as e:
@@ -205,43 +231,185 @@ def create_app():
             
             results = loop.run_until_complete(scraper_manager.scrape_all_products(products))
             
-            # Save results to database
-            total_updated = 0
-            for product_id, site_results in results.items():
-                for site_name, result in site_results.items():
-                    if result['success']:
-                        db_manager.save_price_history(
-                            product_id=product_id,
-                            site_name=site_name,
-                            price=result['price'],
-                            availability=result.get('availability', True),
-                            timestamp=datetime.now()
-                        )
-                        total_updated += 1
+            # Screen, save and alert on the results, then send any alerts now due
+            summary = recorder.record_results(results)
+            loop.run_until_complete(recorder.alert_engine.dispatch(notification_manager))
+            loop.run_until_complete(notification_manager.close())
             
             loop.close()
             
+            message = scrape_summary_message(summary)
+            flash(message, 'warning' if summary['suspicious'] or summary['failed'] else 'success')
             return jsonify({
                 'success': True,
-                'total_updated': total_updated,
-                'message': f'Updated prices for {total_updated} product-site combinations'
+                'total_updated': summary['successful'] - summary['suspicious'],
+                'suspicious': summary['suspicious'],
+                'message': message
             })
             
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
+    # API pagination settings
+    API_PRODUCTS_PAGE_SIZE = 100
+    API_PRICES_PAGE_SIZE = 500
+    API_MAX_PAGE_SIZE = 1000
+    PRODUCT_FIELDS = {'id', 'name', 'description', 'target_price', 'urls',
+                      'created_at', 'updated_at', 'active'}
+    PRICE_FIELDS = {'id', 'product_id', 'site_name', 'price', 'currency',
+                    'availability', 'timestamp'}
+    
+    class ApiArgumentError(ValueError):
+        """Raised when an API query parameter is invalid."""
+        pass
+    
+    @app.errorhandler(ApiArgumentError)
+    def handle_api_argument_error(error):
+        return jsonify({'error': str(error)}), 400
+    
+    def parse_page_size(default: int) -> int:
+        """Read the limit query parameter, clamped to the allowed range."""
+        limit = request.args.get('limit', default, type=int)
+        return max(1, min(limit, API_MAX_PAGE_SIZE))
+    
+    def parse_cursor() -> dict:
+        """Read the cursor query parameter."""
+        cursor = request.args.get('cursor')
+        if not cursor:
+            return {}
+        
+        position = decode_cursor(cursor)
+        if position is None:
+            raise ApiArgumentError('Invalid cursor')
+        return position
+    
+    def parse_fields(allowed: set) -> list:
+        """Read the comma-separated fields query parameter."""
+        fields = request.args.get('fields')
+        if not fields:
+            return []
+        
+        selected = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = sorted(set(selected) - allowed)
+        if unknown:
+            raise ApiArgumentError(f"Unknown fields: {', '.join(unknown)}")
+        return selected
+    
+    def select_fields(rows: list, fields: list) -> list:
+        """Reduce each row to the requested fields."""
+        if not fields:
+            return rows
+        return [{field: row.get(field) for field in fields} for row in rows]
+    
+    def api_etag(*state) -> str:
+        """Build a strong ETag from DB state and the request's query parameters."""
+        args = sorted(request.args.items(multi=True))
+        digest = hashlib.sha1(json.dumps([request.path, args, state], default=str).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def parse_db_timestamp(value: str):
+        """Parse a SQLite CURRENT_TIMESTAMP value (UTC)."""
+        try:
+            return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+        except (TypeError, ValueError):
+            return None
+    
+    def conditional_json(etag: str, last_modified: str, build_payload):
+        """Return 304 if the client's ETag matches, otherwise build the JSON response."""
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            next_cursor = None
+        else:
+            payload, next_cursor = build_payload()
+            response = jsonify(payload)
+        
+        response.set_etag(etag)
+        response.last_modified = parse_db_timestamp(last_modified)
+        response.headers['Cache-Control'] = 'no-cache'
+        
+        if next_cursor:
+            args = request.args.to_dict()
+            args['cursor'] = next_cursor
+            response.headers['X-Next-Cursor'] = next_cursor
+            # View arguments win over a query argument of the same name, keeping the link on this route
+            response.headers['Link'] = f'<{url_for(request.endpoint, **{**args, **request.view_args})}>; rel="next"'
+        
+        return response
+    
     @app.route('/api/products')
     def api_products():
-        """API endpoint to get all products."""
-        products = db_manager.get_all_products()
-        return jsonify(products)
+        """API endpoint to get products, paginated by cursor.
+        
+        Query parameters: limit, cursor, fields (comma-separated),
+        site (only products tracked on that site) and active (1, 0 or all).
+        The next page's cursor is returned in the X-Next-Cursor and Link headers.
+        """
+        limit = parse_page_size(API_PRODUCTS_PAGE_SIZE)
+        after_id = parse_cursor().get('after_id', 0)
+        fields = parse_fields(PRODUCT_FIELDS)
+        site_name = request.args.get('site')
+        
+        active_arg = request.args.get('active', '1').lower()
+        if active_arg in ('1', 'true'):
+            active = True
+        elif active_arg in ('0', 'false'):
+            active = False
+        elif active_arg == 'all':
+            active = None
+        else:
+            raise ApiArgumentError('active must be 1, 0 or all')
+        
+        products_version = db_manager.get_data_versions()['products']
+        etag = api_etag(products_version['version'])
+        
+        def build_payload():
+            products = db_manager.get_products_page(
+                after_id=after_id, limit=limit + 1, site_name=site_name, active=active
+            )
+            next_cursor = None
+            if len(products) > limit:
+                products = products[:limit]
+                next_cursor = encode_cursor({'after_id': products[-1]['id']})
+            return select_fields(products, fields), next_cursor
+        
+        return conditional_json(etag, products_version['updated_at'], build_payload)
     
     @app.route('/api/product/<int:product_id>/prices')
     def api_product_prices(product_id):
-        """API endpoint to get price history for a product."""
+        """API endpoint to get price history for a product, newest first.
+        
+        Query parameters: days, limit, cursor, fields (comma-separated) and site.
+        The next page's cursor is returned in the X-Next-Cursor and Link headers.
+        """
         days = request.args.get('days', 30, type=int)
-        price_history = db_manager.get_price_history(product_id, days)
-        return jsonify(price_history)
+        limit = parse_page_size(API_PRICES_PAGE_SIZE)
+        position = parse_cursor()
+        fields = parse_fields(PRICE_FIELDS)
+        site_name = request.args.get('site')
+        
+        before = None
+        if position:
+            if 'timestamp' not in position or 'id' not in position:
+                raise ApiArgumentError('Invalid cursor')
+            before = (position['timestamp'], position['id'])
+        
+        # The window signature changes when rows age out of the requested range
+        history_version = db_manager.get_data_versions()['price_history']
+        etag = api_etag(history_version['version'],
+                        db_manager.get_price_history_signature(product_id, days))
+        
+        def build_payload():
+            price_history = db_manager.get_price_history_page(
+                product_id, days=days, site_name=site_name, before=before, limit=limit + 1
+            )
+            next_cursor = None
+            if len(price_history) > limit:
+                price_history = price_history[:limit]
+                last = price_history[-1]
+                next_cursor = encode_cursor({'timestamp': last['timestamp'], 'id': last['id']})
+            return select_fields(price_history, fields), next_cursor
+        
+        return conditional_json(etag, history_version['updated_at'], build_payload)
     
     @app.route('/settings')
     def settings():
@@ -256,6 +424,7 @@ def create_app():
             asyncio.set_event_loop(loop)
             
             result = loop.run_until_complete(notification_manager.send_test_notification())
+            loop.run_until_complete(notification_manager.close())
             loop.close()
             
             return jsonify(result)
@@ -378,7 +547,7 @@ def create_app():
         """Display automated shopping lists based on best prices."""
         try:
             shopping_lists = shopping_list_generator.generate_shopping_lists()
-            summary = shopping_list_generator.get_summary_stats()
+            summary = shopping_list_generator.get_summary_stats(shopping_lists)
             
             return render_template('shopping_lists.html', 
                                  shopping_lists=shopping_lists,
@@ -430,7 +599,7 @@ def create_app():
         """API endpoint for shopping lists data."""
         try:
             shopping_lists = shopping_list_generator.generate_shopping_lists()
-            summary = shopping_list_generator.get_summary_stats()
+            summary = shopping_list_generator.get_summary_stats(shopping_lists)
             
             # Convert to JSON-serializable format
             data = {
@@ -438,6 +607,7 @@ def create_app():
                     'total_products': summary['total_products'],
                     'total_cost': summary['total_cost'],
                     'total_savings': summary['total_savings'],
+                    'total_delivery': summary['total_delivery'],
                     'store_count': summary['store_count'],
                     'most_items_store': summary['most_items_store'],
                     'most_items_count': summary['most_items_count'],
@@ -453,6 +623,7 @@ def create_app():
                     'base_url': store_list.base_url,
                     'total_cost': store_list.total_cost,
                     'total_savings': store_list.total_savings,
+                    'delivery_fee': store_list.delivery_fee,
                     'item_count': store_list.item_count,
                     'items': []
                 }
@@ -505,6 +676,9 @@ def create_app():
             from .scraper_manager import ScraperManager
             from .notification import NotificationManager
             
+            # ?all=1 scrapes every product and site, ignoring the schedule
+            scrape_all = request.args.get('all') == '1'
+            
             async def run_scrape():
                 try:
                     logger.info("Webhook triggered price scraping")
@@ -515,66 +689,24 @@ def create_app():
                         return {'error': 'Configuration error'}
                     
                     db_manager = DatabaseManager(config.database_path)
-                    scraper_manager = ScraperManager(config)
+                    scraper_manager = ScraperManager(config, db_manager)
                     notification_manager = NotificationManager(config)
                     
-                    products = db_manager.get_all_products()
-                    if not products:
-                        logger.warning("No products found to scrape")
-                        return {'message': 'No products to scrape'}
-                    
-                    logger.info(f"Scraping {len(products)} products")
-                    results = await scraper_manager.scrape_all_products(products)
+                    summary = await scrape_and_record(config, db_manager, scraper_manager, notification_manager,
+                                                      scrape_all=scrape_all)
+                    if not summary['products']:
+                        await notification_manager.close()
+                        return {'message': 'No products are due for scraping'}
+                    successful, failed = summary['successful'], summary['failed']
+                    price_alerts = summary['alerts']
                     
-                    total = sum(len(sites) for sites in results.values())
-                    successful = sum(1 for sites in results.values() for result in sites.values() if result['success'])
-                    failed = total - successful
-                    
-                    logger.info(f"Scraping complete: {successful}/{total} successful")
-                    
-                    # Save results and collect price alerts
-                    price_alerts = []
-                    for product_id, site_results in results.items():
-                        product = db_manager.get_product(product_id)
-                        for site_name, result in site_results.items():
-                            if result['success']:
-                                # Save to database
-                                db_manager.save_price_history(
-                                    product_id=product_id,
-                                    site_name=site_name,
-                                    price=result['price'],
-                                    availability=result.get('availability', True),
-                                    timestamp=datetime.now()
-                                )
-                                
-                                # Check for price alerts
-                                if product and product.get('target_price') and result['price'] <= product['target_price']:
-                                    price_alerts.append({
-                                        'product': product,
-                                        'site': site_name,
-                                        'current_price': result['price'],
-                                        'target_price': product['target_price'],
-                                        'url': result.get('url', '')
-                                    })
-                    
-                    # Send price alerts if any
-                    if price_alerts:
-                        alert_message = "Price Alerts:\n\n"
-                        for alert in price_alerts:
-                            alert_message += f"🎯 {alert['product']['name']}\n"
-                            alert_message += f"   Store: {alert['site']}\n"
-                            alert_message += f"   Price: £{alert['current_price']} (Target: £{alert['target_price']})\n"
-                            alert_message += f"   URL: {alert['url']}\n\n"
-                        
-                        await notification_manager.send_notification(
-                            subject=f"Price Alert: {len(price_alerts)} item(s) on sale!",
-                            message=alert_message
-                        )
-                        logger.info(f"Sent price alerts for {len(price_alerts)} items")
+                    logger.info(f"Scraping complete: {successful}/{successful + failed} successful")
+                    if summary['notified']:
+                        logger.info(f"Sent price alerts for {summary['notified']} items")
                     
                     # Send scraping summary
                     summary_message = f"Daily Price Scraping Summary:\n\n"
-                    summary_message += f"📊 Products scraped: {len(products)}\n"
+                    summary_message += f"📊 Products scraped: {summary['products']}\n"
                     summary_message += f"✅ Successful: {successful}\n"
                     summary_message += f"❌ Failed: {failed}\n"
                     summary_message += f"🎯 Price alerts: {len(price_alerts)}\n"
@@ -585,10 +717,11 @@ def create_app():
                         message=summary_message
                     )
                     logger.info("Sent scraping summary")
+                    await notification_manager.close()
                     
                     return {
                         'message': 'Scraping completed successfully',
-                        'total_products': len(products),
+                        'total_products': summary['products'],
                         'successful': successful,
                         'failed': failed,
                         'price_alerts': len(price_alerts)
@@ -622,34 +755,20 @@ def create_app():
     def webhook_shopping_list():
         """Webhook endpoint to send daily shopping list"""
         try:
-            from .shopping_list import AutoShoppingListGenerator
-            from .notification import NotificationManager
-            
-            config = Config()
-            if config.has_config_error():
-                return jsonify({'error': 'Configuration error'}), 500
-            
-            db_manager = DatabaseManager(config.database_path)
-            shopping_list_generator = AutoShoppingListGenerator(db_manager)
-            notification_manager = NotificationManager(config)
-            
-            # Generate shopping lists
-            shopping_lists = shopping_list_generator.generate_all_shopping_lists()
+            # Shares the app-wide generator so the cached lists are reused
+            shopping_lists = shopping_list_generator.generate_shopping_lists()
             
             if shopping_lists:
                 shopping_message = "Daily Shopping List (Best Prices):\n\n"
                 total_savings = 0
                 
-                for store_name, store_list in shopping_lists.items():
+                for store_list in shopping_lists:
                     if store_list.items:
-                        shopping_message += f"🏪 {store_name.upper()}:\n"
-                        store_total = 0
+                        shopping_message += f"🏪 {store_list.store_display_name.upper()}:\n"
                         for item in store_list.items:
                             shopping_message += f"   • {item.product_name} - £{item.current_price}\n"
-                            store_total += item.current_price
-                            if item.savings_amount > 0:
-                                total_savings += item.savings_amount
-                        shopping_message += f"   Subtotal: £{store_total:.2f}\n\n"
+                        total_savings += store_list.total_savings
+                        shopping_message += f"   Subtotal: £{store_list.total_cost:.2f}\n\n"
                 
                 if total_savings > 0:
                     shopping_message += f"💰 Total Savings: £{total_savings:.2f}\n"
@@ -660,12 +779,13 @@ def create_app():
                         subject="Daily Shopping List - Best Prices",
                         message=shopping_message
                     )
+                    await notification_manager.close()
                 
                 asyncio.run(send_email())
                 
                 return jsonify({
                     'message': 'Shopping list sent successfully',
-                    'stores': list(shopping_lists.keys()),
+                    'stores': [store_list.store_name for store_list in shopping_lists],
                     'total_savings': total_savings
                 })
             else:
@@ -701,6 +821,12 @@ def create_app():
             logger.error(f"Combined webhook error: {str(e)}", exc_info=True)
             return jsonify({'error': str(e)}), 500
 
+    if metrics.endpoint_enabled():
+        @app.route('/metrics')
+        def metrics_endpoint():
+            """Prometheus metrics for this process (the production server runs a single worker)."""
+            return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
     @app.route('/webhook/health', methods=['GET'])
     def webhook_health():
         """Health check endpoint for webhooks"""
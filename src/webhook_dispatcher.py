@@ -0,0 +1,220 @@
+"""
+Webhook delivery with a shared HTTP session, batching and a dead-letter file
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import aiohttp
+
+from .utils import get_retry_delay
+from .metrics import NOTIFICATION_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying; any other non-2xx response is dead-lettered straight away
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class _LoopState:
+    """A dispatcher's session, queue and in-flight deliveries on one event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, dispatcher: 'WebhookDispatcher'):
+        self.loop = loop
+        self.pending = []
+        self.flush_handle = None
+        self.in_flight = set()
+        self.semaphore = asyncio.Semaphore(dispatcher.max_concurrency)
+        self.session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=dispatcher.timeout),
+            connector=aiohttp.TCPConnector(limit=dispatcher.max_concurrency),
+            headers=dispatcher.headers
+        )
+
+
+class WebhookDispatcher:
+    """Posts webhook payloads over one persistent aiohttp session per event loop.
+
+    Events published within ``coalesce_window`` seconds of each other are sent as a
+    single batched payload: ``{"timestamp", "event_count", "events": [...]}``. A lone
+    event is posted unchanged so existing receivers keep working. At most
+    ``max_concurrency`` requests are in flight, failures are retried with jittered
+    exponential backoff, and payloads that still fail are appended to a JSON-lines
+    dead-letter file.
+
+    One dispatcher can be shared by threads that each run their own event loop
+    (Flask request threads): sessions, queues and batches are kept per loop, so
+    events are only ever batched and delivered on the loop that published them.
+    """
+
+    def __init__(self, url: str, timeout: float = 10, max_concurrency: int = 4,
+                 coalesce_window: float = 0.5, max_batch_size: int = 50, max_retries: int = 3,
+                 retry_base_delay: float = 1.0, dead_letter_path: str = 'webhook_dead_letters.jsonl',
+                 headers: Optional[Dict[str, str]] = None):
+        self.url = url
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.coalesce_window = coalesce_window
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.dead_letter_path = Path(dead_letter_path) if dead_letter_path else None
+        self.headers = headers or {}
+
+        self._states = {}
+        self._states_lock = threading.Lock()
+        self._dead_letter_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, webhook_config: Dict[str, Any]) -> 'WebhookDispatcher':
+        """Build a dispatcher from the notifications.webhook config section."""
+        return cls(
+            url=webhook_config.get('url'),
+            timeout=webhook_config.get('timeout', 10),
+            max_concurrency=webhook_config.get('max_concurrency', 4),
+            coalesce_window=webhook_config.get('coalesce_window', 0.5),
+            max_batch_size=webhook_config.get('max_batch_size', 50),
+            max_retries=webhook_config.get('max_retries', 3),
+            dead_letter_path=webhook_config.get('dead_letter_path', 'webhook_dead_letters.jsonl'),
+            headers=webhook_config.get('headers')
+        )
+
+    async def publish(self, event: Dict[str, Any]) -> bool:
+        """Queue an event for the next batch and wait until that batch is delivered."""
+        state = self._state()
+        future = state.loop.create_future()
+        state.pending.append((event, future))
+        NOTIFICATION_QUEUE_DEPTH.set(len(state.pending), channel='webhook')
+
+        if len(state.pending) >= self.max_batch_size:
+            self._flush_pending(state)
+        elif state.flush_handle is None:
+            state.flush_handle = state.loop.call_later(self.coalesce_window, self._flush_pending, state)
+
+        return await future
+
+    async def send(self, payload: Dict[str, Any]) -> bool:
+        """Post a payload immediately, without coalescing."""
+        return await self._deliver(self._state(), payload)
+
+    async def flush(self):
+        """Send any pending events on the running loop now and wait for its deliveries in flight."""
+        with self._states_lock:
+            state = self._states.get(asyncio.get_running_loop())
+        if state is not None:
+            await self._flush_state(state)
+
+    async def close(self):
+        """Flush outstanding events on the running loop and close its HTTP session.
+
+        Threads sharing the dispatcher each close their own loop's session; the
+        others are left running.
+        """
+        with self._states_lock:
+            state = self._states.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await self._flush_state(state)
+            await state.session.close()
+
+    def _state(self) -> _LoopState:
+        """The state for the running event loop, created on first use."""
+        loop = asyncio.get_running_loop()
+        with self._states_lock:
+            state = self._states.get(loop)
+            if state is None:
+                # Loops closed without close() cannot have their sessions closed any more
+                for finished in [other for other in self._states if other.is_closed()]:
+                    logger.debug("Dropping webhook session of a closed event loop")
+                    del self._states[finished]
+                state = self._states[loop] = _LoopState(loop, self)
+            return state
+
+    async def _flush_state(self, state: _LoopState):
+        self._flush_pending(state)
+        if state.in_flight:
+            await asyncio.gather(*state.in_flight, return_exceptions=True)
+
+    def _flush_pending(self, state: _LoopState):
+        if state.flush_handle is not None:
+            state.flush_handle.cancel()
+            state.flush_handle = None
+        if not state.pending:
+            return
+
+        batch, state.pending = state.pending, []
+        NOTIFICATION_QUEUE_DEPTH.set(0, channel='webhook')
+        task = state.loop.create_task(self._deliver_batch(state, batch))
+        state.in_flight.add(task)
+        task.add_done_callback(state.in_flight.discard)
+
+    async def _deliver_batch(self, state: _LoopState, batch: List):
+        events = [event for event, _ in batch]
+        if len(events) == 1:
+            payload = events[0]
+        else:
+            payload = {
+                'timestamp': datetime.now().isoformat(),
+                'event_count': len(events),
+                'events': events
+            }
+
+        try:
+            delivered = await self._deliver(state, payload)
+        except Exception as e:
+            logger.error(f"Webhook batch failed unexpectedly: {e}")
+            delivered = False
+
+        for _, future in batch:
+            if not future.done():
+                future.set_result(delivered)
+
+    async def _deliver(self, state: _LoopState, payload: Dict[str, Any]) -> bool:
+        # datetimes and other non-JSON values are sent as strings
+        body = json.dumps(payload, default=str)
+        error = None
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with state.semaphore:
+                    async with state.session.post(
+                        self.url, data=body, headers={'Content-Type': 'application/json'}
+                    ) as response:
+                        if 200 <= response.status < 300:
+                            logger.debug(f"Webhook delivered ({len(body)} bytes)")
+                            return True
+                        error = f"HTTP {response.status}"
+                        if response.status not in RETRYABLE_STATUSES:
+                            break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+
+            if attempt < self.max_retries:
+                delay = get_retry_delay(attempt, self.retry_base_delay)
+                logger.warning(f"Webhook attempt {attempt + 1} failed ({error}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        logger.error(f"Webhook delivery failed: {error}")
+        self._dead_letter(payload, error)
+        return False
+
+    def _dead_letter(self, payload: Dict[str, Any], error: str):
+        """Append an undeliverable payload to the dead-letter file for later inspection or replay."""
+        if not self.dead_letter_path:
+            return
+        record = {
+            'failed_at': datetime.now().isoformat(),
+            'url': self.url,
+            'error': error,
+            'payload': payload
+        }
+        try:
+            self.dead_letter_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._dead_letter_lock, open(self.dead_letter_path, 'a') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+        except OSError as e:
+            logger.error(f"Could not write webhook dead letter: {e}")
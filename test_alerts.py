@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Tests for alert state transitions and digest dispatch
+"""
+
+import asyncio
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, '.')
+
+from src.alerts import AlertEngine
+from src.database import DatabaseManager
+
+START = datetime(2024, 6, 1, 8, 0)
+
+
+class Notifier:
+    """Notification manager stand-in whose sends succeed, fail or raise as told."""
+
+    def __init__(self, outcome=True, enabled=True):
+        self.outcome = outcome
+        self.enabled = enabled
+        self.sent = []
+
+    def has_enabled_channel(self):
+        return self.enabled
+
+    async def send_price_alerts(self, alerts):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        if self.outcome:
+            self.sent.append([alert['product']['name'] for alert in alerts])
+        return self.outcome
+
+
+def _setup(tmp, target_price=10.0, **alert_config):
+    db_manager = DatabaseManager(str(Path(tmp) / 'alerts.db'))
+    product = db_manager.get_product(db_manager.add_product('Oil', {'booker': 'https://booker/oil'},
+                                                            target_price=target_price))
+    engine = AlertEngine(db_manager, {'hysteresis_percent': 5, 'rearm_minutes': 60, **alert_config})
+    return db_manager, product, engine
+
+
+def _observe(db_manager, engine, product, price, minutes):
+    """Save a price as ScrapeRecorder.record does, then evaluate it."""
+    observed_at = START + timedelta(minutes=minutes)
+    db_manager.save_price_history(product['id'], 'booker', price, timestamp=observed_at)
+    return engine.evaluate(product, 'booker', price, observed_at)
+
+
+def _alert_rows(db_manager):
+    with db_manager.get_connection() as conn:
+        return conn.execute('SELECT alert_price, cleared_at IS NOT NULL, notified FROM price_alerts '
+                            'ORDER BY id').fetchall()
+
+
+def test_crossing_hysteresis_and_rearm():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager, product, engine = _setup(tmp)
+
+        assert engine.evaluate({**product, 'target_price': None}, 'booker', 1.0, START) is None
+        assert _observe(db_manager, engine, product, 12.0, 0) is None  # above target
+
+        alert = _observe(db_manager, engine, product, 10.0, 10)  # crossing, at target
+        assert alert['current_price'] == 10.0 and alert['target_price'] == 10.0
+        assert alert['url'] == 'https://booker/oil'
+
+        assert _observe(db_manager, engine, product, 9.0, 20) is None  # still low: same episode
+        assert _observe(db_manager, engine, product, 10.4, 30) is None  # within 5% hysteresis
+        assert _observe(db_manager, engine, product, 9.5, 40) is None  # so not re-alerted
+        assert _alert_rows(db_manager) == [(10.0, 0, 0)]
+
+        assert _observe(db_manager, engine, product, 10.6, 50) is None  # clears the episode
+        assert _alert_rows(db_manager) == [(10.0, 1, 0)]
+        assert engine.pending_alerts() == []  # a cleared alert is not sent
+
+        assert _observe(db_manager, engine, product, 9.0, 80) is None  # low again, not re-armed yet
+        assert _observe(db_manager, engine, product, 8.5, 111)['current_price'] == 8.5  # 61 min after clearing
+        assert _alert_rows(db_manager) == [(10.0, 1, 0), (8.5, 0, 0)]
+
+
+def test_confirm_observations():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager, product, engine = _setup(tmp, confirm_observations=3)
+
+        assert _observe(db_manager, engine, product, 9.0, 0) is None
+        assert _observe(db_manager, engine, product, 9.0, 10) is None
+        assert _observe(db_manager, engine, product, 11.0, 20) is None  # streak broken
+        assert _observe(db_manager, engine, product, 9.0, 30) is None
+        assert _observe(db_manager, engine, product, 9.0, 40) is None
+        assert _observe(db_manager, engine, product, 8.0, 50)['current_price'] == 8.0
+
+
+def test_digest_window():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager, product, engine = _setup(tmp, digest_window_minutes=30)
+        other = db_manager.get_product(db_manager.add_product('Rice', {'booker': 'https://booker/rice'},
+                                                              target_price=20.0))
+        notifier = Notifier()
+
+        assert engine.digest_due()
+        _observe(db_manager, engine, product, 9.0, 0)
+        assert asyncio.run(engine.dispatch(notifier)) == 1
+
+        # Within the window: held, then sent together once the window has passed
+        engine.evaluate(other, 'booker', 19.0, START)
+        assert not engine.digest_due()
+        assert asyncio.run(engine.dispatch(notifier)) == 0
+        assert engine.digest_due(datetime.now() + timedelta(minutes=31))
+        with db_manager.get_connection() as conn:
+            conn.execute('UPDATE price_alerts SET notified_at = ?', (datetime.now() - timedelta(minutes=31),))
+        assert asyncio.run(engine.dispatch(notifier)) == 1
+        assert notifier.sent == [['Oil'], ['Rice']]
+
+
+def test_dispatch_when_sending_fails():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager, product, engine = _setup(tmp)
+        _observe(db_manager, engine, product, 9.0, 0)
+
+        # A failed or raising send leaves the alert queued for the next dispatch
+        assert asyncio.run(engine.dispatch(Notifier(outcome=False))) == 0
+        assert len(engine.pending_alerts()) == 1
+        try:
+            asyncio.run(engine.dispatch(Notifier(outcome=ConnectionError('SMTP down'))))
+        except ConnectionError:
+            pass
+        else:
+            raise AssertionError("the send error should propagate")
+        assert _alert_rows(db_manager) == [(9.0, 0, 0)]
+
+        notifier = Notifier()
+        assert asyncio.run(engine.dispatch(notifier)) == 1
+        assert notifier.sent == [['Oil']]
+        assert _alert_rows(db_manager) == [(9.0, 0, 1)]
+        assert asyncio.run(engine.dispatch(notifier)) == 0
+
+
+def test_dispatch_without_channels_marks_alerts_handled():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager, product, engine = _setup(tmp)
+        _observe(db_manager, engine, product, 9.0, 0)
+
+        assert asyncio.run(engine.dispatch(Notifier(enabled=False))) == 1
+        assert engine.pending_alerts() == []
+
+
+def test_stale_claim_is_retried():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager, product, engine = _setup(tmp)
+        _observe(db_manager, engine, product, 9.0, 0)
+        # As left by a dispatch that died mid-send
+        with db_manager.get_connection() as conn:
+            conn.execute('UPDATE price_alerts SET notified = 2, claimed_at = ?', (datetime.now(),))
+        assert engine.pending_alerts() == []
+
+        with db_manager.get_connection() as conn:
+            conn.execute('UPDATE price_alerts SET claimed_at = ?',
+                         (datetime.now() - AlertEngine.CLAIM_TIMEOUT - timedelta(minutes=1),))
+        notifier = Notifier()
+        assert asyncio.run(engine.dispatch(notifier)) == 1
+        assert notifier.sent == [['Oil']]
+
+
+def test_concurrent_evaluations_open_one_alert():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager, product, _ = _setup(tmp)
+        db_manager.save_price_history(product['id'], 'booker', 9.0, timestamp=START)
+        barrier = threading.Barrier(8)
+        opened = []
+
+        def evaluate():
+            # A separate engine per thread, as each scrape worker process has its own
+            engine = AlertEngine(db_manager, {'hysteresis_percent': 5, 'rearm_minutes': 60})
+            barrier.wait()
+            opened.append(engine.evaluate(product, 'booker', 9.0, START))
+
+        threads = [threading.Thread(target=evaluate) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(alert is not None for alert in opened) == 1
+        assert _alert_rows(db_manager) == [(9.0, 0, 0)]
+
+
+if __name__ == '__main__':
+    test_crossing_hysteresis_and_rearm()
+    test_confirm_observations()
+    test_digest_window()
+    test_dispatch_when_sending_fails()
+    test_dispatch_without_channels_marks_alerts_handled()
+    test_stale_claim_is_retried()
+    test_concurrent_evaluations_open_one_alert()
+    print("✅ All alert tests passed")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for JSON API site adapters, against the mock sites serving recorded API responses
+"""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, '.')
+
+from benchmarks.mock_sites import MockSiteServer
+from src.api_adapters import create_adapter, resolve_path
+from src.config import Config
+from src.uk_scraper import UKCateringScraper
+
+JJ_API = {
+    'url_pattern': r'/jjfoodservice/product/(?P<product_id>\d+)',
+    'url': '{base}/jjfoodservice/api/products/{product_id}',
+    'fields': {
+        'price': ['product.offers.0.price', 'product.prices.delivery.amount', 'product.prices.collection.amount'],
+        'title': 'product.name',
+        'availability': 'product.stock.status',
+        'currency': 'product.currency'
+    }
+}
+
+
+def test_field_mapping():
+    data = {'a': {'b': [{'c': 1}, {'c': None}]}}
+    assert resolve_path(data, 'a.b.0.c') == 1
+    assert resolve_path(data, 'a.b.-1.c') is None
+    assert resolve_path(data, 'a.b.5.c') is None and resolve_path(data, 'a.x') is None
+
+    adapter = create_adapter('jjfoodservice', {'api': {
+        **JJ_API, 'url': 'https://api.example/{product_id}', 'price_scale': 0.01,
+        'fields': {**JJ_API['fields'], 'price': 'pence'},
+        'availability_values': {'DISCONTINUED': False}}})
+    assert adapter.api_url('https://shop.example/jjfoodservice/product/42?ref=x') == 'https://api.example/42'
+    assert adapter.api_url('https://shop.example/search?q=oil') is None
+    assert adapter.extract('{"pence": 1179, "product": {"name": " Oil ", "stock": {"status": "DISCONTINUED"}}}') == {
+        'price': 11.79, 'title': 'Oil', 'availability': False, 'currency': 'GBP'}
+    assert create_adapter('jjfoodservice', {'selectors': {}}) is None
+
+
+def test_scrape_reads_recorded_api_responses():
+    server = MockSiteServer()
+
+    async def scenario(tmp):
+        runner = web.AppRunner(server.make_app())
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        base = f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+        config = Config()
+        config._config['scraping']['selector_ordering'] = {'stats_path': str(Path(tmp) / 'selector_stats.json')}
+        jj = config._config['sites']['jjfoodservice']
+        jj['api'] = {**JJ_API, 'url': JJ_API['url'].replace('{base}', base)}
+        try:
+            async with UKCateringScraper(config) as scraper:
+                results = [await scraper.scrape_product_price(f'{base}/jjfoodservice/product/{product_id}',
+                                                              'jjfoodservice')
+                           for product_id in (3, 4, 5)]
+                api_only = dict(server.stats['jjfoodservice'])
+
+                # A response without a mapped price falls back to scraping the page
+                jj['api']['fields'] = {**JJ_API['fields'], 'price': 'product.list_price'}
+                scraper._adapters.clear()
+                fallback = await scraper.scrape_product_price(f'{base}/jjfoodservice/product/0', 'jjfoodservice')
+        finally:
+            await runner.cleanup()
+        return results, api_only, fallback
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results, api_only, fallback = asyncio.run(scenario(tmp))
+    assert [(result['price'], result['title'], result['availability']) for result in results] == [
+        (11.79, 'Vegetable Flour Frozen Halal Gloves 1kg', True),
+        (28.99, 'Halal Containers Raising Self Ketchup Salt 5kg', True),
+        (16.25, 'Ketchup Salt Mozzarella Peri 12x400g', False)]
+    assert all(result['success'] for result in results)
+    assert api_only['api'] == 3 and api_only['requests'] == 3  # no HTML page was fetched
+
+    assert fallback['success'] and fallback['price'] == 11.79
+    assert server.stats['jjfoodservice']['requests'] == 5
+
+
+if __name__ == '__main__':
+    test_field_mapping()
+    test_scrape_reads_recorded_api_responses()
+    print("✅ All API adapter tests passed")
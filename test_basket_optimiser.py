@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests for the basket optimiser against a brute-force search over every store assignment
+"""
+
+import itertools
+import math
+import random
+import sys
+
+sys.path.insert(0, '.')
+
+from src.basket_optimiser import BasketOptimiser, DeliveryRule
+
+STORES = ('jjfoodservice', 'atoz_catering', 'amazon_uk')
+
+
+def brute_force_cost(rules, prices):
+    """Cheapest feasible total over all assignments, or infinity if none meets the minimum orders."""
+    product_ids = list(prices)
+    best = math.inf
+    for stores in itertools.product(*(sorted(prices[product_id]) for product_id in product_ids)):
+        subtotals = {}
+        for product_id, store in zip(product_ids, stores):
+            subtotals[store] = subtotals.get(store, 0.0) + prices[product_id][store]
+        total = 0.0
+        for store, subtotal in subtotals.items():
+            rule = rules.get(store, DeliveryRule())
+            if subtotal + 1e-9 < rule.minimum_order:
+                break
+            free = rule.free_delivery_threshold is not None and subtotal >= rule.free_delivery_threshold
+            total += subtotal + (0.0 if free else rule.fee)
+        else:
+            best = min(best, total)
+    return best
+
+
+def check_result(rules, prices, result):
+    """The result's totals must describe its own assignment."""
+    assert set(result.assignment) == set(prices)
+    subtotals = {}
+    for product_id, store in result.assignment.items():
+        subtotals[store] = subtotals.get(store, 0.0) + prices[product_id][store]
+    assert result.store_subtotals == {store: round(subtotal, 2) for store, subtotal in subtotals.items()}
+    assert math.isclose(result.item_cost, sum(subtotals.values()), abs_tol=0.005)
+    assert math.isclose(result.delivery_cost,
+                        sum(rules.get(store, DeliveryRule()).charge(subtotal)
+                            for store, subtotal in subtotals.items()), abs_tol=0.005)
+    if result.feasible:
+        for store, subtotal in subtotals.items():
+            assert subtotal + 1e-9 >= rules.get(store, DeliveryRule()).minimum_order, (store, subtotal)
+
+
+def random_instance(rng):
+    rules = {}
+    for store in STORES:
+        fee = rng.choice((0.0, 2.5, 4.99, 7.5))
+        rules[store] = DeliveryRule(
+            fee=fee,
+            minimum_order=rng.choice((0.0, 0.0, 10.0, 25.0)),
+            free_delivery_threshold=rng.choice((None, 15.0, 30.0)) if fee else None
+        )
+    prices = {}
+    for product_id in range(rng.randint(1, 6)):
+        stores = rng.sample(STORES, rng.randint(1, len(STORES)))
+        prices[product_id] = {store: round(rng.uniform(0.5, 15.0), 2) for store in stores}
+    return rules, prices
+
+
+def test_matches_brute_force():
+    rng = random.Random(30)
+    infeasible = 0
+    for _ in range(300):
+        rules, prices = random_instance(rng)
+        result = BasketOptimiser(rules).optimise(prices)
+        expected = brute_force_cost(rules, prices)
+        check_result(rules, prices, result)
+        if expected == math.inf:
+            infeasible += 1
+            assert not result.feasible and not result.optimal
+        else:
+            assert result.feasible and result.optimal
+            assert math.isclose(result.total_cost, expected, abs_tol=0.005), (rules, prices)
+    assert infeasible, "the random instances should include some infeasible baskets"
+
+
+def test_minimum_order_moves_items():
+    rules = {'jjfoodservice': DeliveryRule(minimum_order=20.0), 'amazon_uk': DeliveryRule()}
+    prices = {1: {'jjfoodservice': 9.0, 'amazon_uk': 9.5},
+              2: {'jjfoodservice': 8.0, 'amazon_uk': 12.0},
+              3: {'jjfoodservice': 5.0, 'amazon_uk': 4.0}}
+    result = BasketOptimiser(rules).optimise(prices)
+
+    # jjfoodservice alone is cheapest per item for 1 and 2 but needs item 3 to reach £20
+    assert result.assignment == {1: 'jjfoodservice', 2: 'jjfoodservice', 3: 'jjfoodservice'}
+    assert result.total_cost == 22.0 == brute_force_cost(rules, prices)
+    assert result.feasible and result.optimal
+
+
+def test_free_delivery_threshold():
+    rules = {'jjfoodservice': DeliveryRule(fee=5.0, free_delivery_threshold=20.0),
+             'amazon_uk': DeliveryRule(fee=3.0)}
+    prices = {1: {'jjfoodservice': 12.0, 'amazon_uk': 13.0},
+              2: {'jjfoodservice': 9.0, 'amazon_uk': 8.0}}
+    result = BasketOptimiser(rules).optimise(prices)
+
+    # Paying £1 more for item 2 reaches free delivery and avoids the second fee
+    assert result.assignment == {1: 'jjfoodservice', 2: 'jjfoodservice'}
+    assert result.store_delivery == {'jjfoodservice': 0.0}
+    assert result.total_cost == 21.0 == brute_force_cost(rules, prices)
+
+
+def test_infeasible_falls_back_to_cheapest_per_item():
+    rules = {'jjfoodservice': DeliveryRule(minimum_order=50.0), 'amazon_uk': DeliveryRule(minimum_order=50.0)}
+    prices = {1: {'jjfoodservice': 4.0, 'amazon_uk': 5.0},
+              2: {'jjfoodservice': 7.0, 'amazon_uk': 6.0}}
+    result = BasketOptimiser(rules).optimise(prices)
+
+    assert brute_force_cost(rules, prices) == math.inf
+    assert not result.feasible and not result.optimal
+    assert result.assignment == {1: 'jjfoodservice', 2: 'amazon_uk'}
+    check_result(rules, prices, result)
+
+    assert BasketOptimiser(rules).optimise({}).optimal
+    assert BasketOptimiser(rules).optimise({1: {}}).assignment == {}
+
+
+def test_budget_exhaustion_returns_best_found():
+    rng = random.Random(45)
+    exhausted = 0
+    for _ in range(50):
+        rules, prices = random_instance(rng)
+        expected = brute_force_cost(rules, prices)
+        result = BasketOptimiser(rules, node_limit=3).optimise(prices)
+        check_result(rules, prices, result)
+        if result.optimal:
+            assert math.isclose(result.total_cost, expected, abs_tol=0.005)
+            continue
+        exhausted += 1
+        if result.feasible:
+            # The best basket found so far: a real one, so never cheaper than the optimum
+            assert result.total_cost + 0.005 >= expected
+    assert exhausted, "a three-node budget should run out on some instances"
+
+
+if __name__ == '__main__':
+    test_matches_brute_force()
+    test_minimum_order_moves_items()
+    test_free_delivery_threshold()
+    test_infeasible_falls_back_to_cheapest_per_item()
+    test_budget_exhaustion_returns_best_found()
+    print("✅ All basket optimiser tests passed")
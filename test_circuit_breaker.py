@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-site scraping circuit breaker
+"""
+
+import asyncio
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, '.')
+
+from src.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from src.config import Config
+from src.database import DatabaseManager
+from src.scraper_manager import ScraperManager
+
+PAGE = '<html><h1>Oil</h1><span class="price">£4.99</span></html>'
+
+
+def test_opens_after_threshold_and_probes_after_cooldown():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'breaker.db'))
+        breaker = CircuitBreaker(db_manager, {'failure_threshold': 3, 'cooldown_minutes': 10})
+        start = datetime(2024, 1, 1, 12, 0)
+
+        for _ in range(2):
+            breaker.record_failure('amazon_uk', now=start)
+        assert breaker.state('amazon_uk') == CLOSED
+        breaker.record_failure('amazon_uk', now=start)
+        assert breaker.state('amazon_uk') == OPEN
+        assert not breaker.allow('amazon_uk', now=start + timedelta(minutes=5))
+
+        # State survives into the next run
+        next_run = CircuitBreaker(db_manager, {'failure_threshold': 3, 'cooldown_minutes': 10})
+        assert next_run.state('amazon_uk') == OPEN
+        assert next_run.allow('jjfoodservice')
+
+        # After the cooldown one probe goes through; the rest wait for its outcome
+        later = start + timedelta(minutes=11)
+        assert next_run.allow('amazon_uk', now=later)
+        assert next_run.state('amazon_uk') == HALF_OPEN
+        assert not next_run.allow('amazon_uk', now=later)
+
+        # A failed probe opens it again for a fresh cooldown
+        next_run.record_failure('amazon_uk', now=later)
+        assert next_run.state('amazon_uk') == OPEN
+        assert not next_run.allow('amazon_uk', now=later + timedelta(minutes=5))
+
+        assert next_run.allow('amazon_uk', now=later + timedelta(minutes=11))
+        next_run.record_success('amazon_uk')
+        assert next_run.state('amazon_uk') == CLOSED
+        assert CircuitBreaker(db_manager).state('amazon_uk') == CLOSED
+
+
+def test_workers_share_one_circuit():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'breaker.db'))
+        breaker_config = {'failure_threshold': 40, 'cooldown_minutes': 10}
+        # Each worker process builds its breaker at start-up, before any failures
+        workers = [CircuitBreaker(db_manager, breaker_config) for _ in range(4)]
+        barrier = threading.Barrier(len(workers))
+
+        def fail(breaker):
+            barrier.wait()
+            for _ in range(10):
+                breaker.record_failure('amazon_uk')
+
+        threads = [threading.Thread(target=fail, args=(breaker,)) for breaker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Failures from every worker add up and open the circuit for all of them
+        assert CircuitBreaker(db_manager).states()['amazon_uk']['failures'] == 40
+        assert all(not breaker.allow('amazon_uk') for breaker in workers)
+
+        # After the cooldown only one worker gets to send the probe
+        later = datetime.now() + timedelta(minutes=11)
+        assert [breaker.allow('amazon_uk', now=later) for breaker in workers] == [True, False, False, False]
+        workers[0].record_success('amazon_uk')
+        assert all(breaker.allow('amazon_uk') for breaker in workers)
+
+
+def test_blocked_site_is_skipped_for_the_rest_of_the_run():
+    requests = {'blocked': 0, 'open': 0}
+
+    async def blocked(request):
+        requests['blocked'] += 1
+        return web.Response(status=403, text='Access denied', headers={'Retry-After': '0'})
+
+    async def open_site(request):
+        requests['open'] += 1
+        return web.Response(text=PAGE, content_type='text/html')
+
+    async def scenario(db_manager):
+        app = web.Application()
+        app.router.add_get('/blocked/{id}', blocked)
+        app.router.add_get('/open/{id}', open_site)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        base = f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+        config = Config()
+        config._config['scraping'].update({'delay_between_requests': 0, 'retry_attempts': 1,
+                                           'circuit_breaker': {'failure_threshold': 3}})
+        products = [{'id': i, 'name': f'Oil {i}', 'urls': {'amazon_uk': f'{base}/blocked/{i}',
+                                                           'atoz_catering': f'{base}/open/{i}'}}
+                    for i in range(1, 11)]
+        try:
+            return await ScraperManager(config, db_manager).scrape_all_products(products)
+        finally:
+            await runner.cleanup()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'breaker.db'))
+        results = asyncio.run(scenario(db_manager))
+        assert CircuitBreaker(db_manager).state('amazon_uk') == OPEN
+
+    assert requests == {'blocked': 3, 'open': 10}
+    skipped = [r['amazon_uk'] for r in results.values() if 'Circuit open' in (r['amazon_uk']['error'] or '')]
+    assert len(skipped) == 7
+    assert all(r['atoz_catering']['success'] for r in results.values())
+
+
+if __name__ == '__main__':
+    test_opens_after_threshold_and_probes_after_cooldown()
+    test_workers_share_one_circuit()
+    test_blocked_site_is_skipped_for_the_rest_of_the_run()
+    print("✅ All circuit breaker tests passed")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the adaptive per-site concurrency controller
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+sys.path.insert(0, '.')
+
+from src import metrics
+from src.concurrency import ConcurrencyController, parse_retry_after
+from src.config import Config
+from src.scraper_manager import ScraperManager
+
+PAGE = '<html><h1>Oil</h1><span class="price">£4.99</span></html>'
+
+
+def test_parse_retry_after():
+    now = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after('Mon, 01 Jan 2024 12:00:30 GMT', now=now) == 30.0
+    assert parse_retry_after('Mon, 01 Jan 2024 11:00:00 GMT', now=now) == 0.0
+    assert parse_retry_after('86400') == 300.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+def test_window_grows_on_success_and_halves_once_per_burst():
+    async def scenario():
+        controller = ConcurrencyController({'initial': 4, 'max': 6})
+        window = controller.window('jj')
+
+        # A burst of 429s from requests in the same window only halves it once
+        slots = [await window.acquire() for _ in range(4)]
+        for started in slots:
+            window.on_throttle(started, '429')
+            window.release()
+        assert window.limit == 2.0
+        assert metrics.SITE_CONCURRENCY_LIMIT.value(site='jj') == 2.0
+
+        for _ in range(20):
+            async with controller.slot('jj') as slot:
+                slot.success()
+        assert window.limit == 6.0
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_pauses_the_site():
+    async def scenario():
+        controller = ConcurrencyController({'initial': 2})
+        async with controller.slot('atoz') as slot:
+            slot.throttled('429', retry_after=0.3)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        async with controller.slot('atoz'):
+            waited = loop.time() - started
+        async with controller.slot('jj'):
+            pass
+        return waited
+
+    assert asyncio.run(scenario()) >= 0.25
+
+
+def test_scrape_backs_off_on_429_and_still_completes():
+    """Products run side by side; a site that throttles gets a smaller window and its Retry-After honoured."""
+    state = {'requests': 0, 'in_flight': 0, 'max_in_flight': 0}
+
+    async def product_page(request):
+        state['requests'] += 1
+        state['in_flight'] += 1
+        state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+        try:
+            await asyncio.sleep(0.02)
+            if state['requests'] % 5 == 0:
+                return web.Response(status=429, headers={'Retry-After': '0'})
+            return web.Response(text=PAGE, content_type='text/html')
+        finally:
+            state['in_flight'] -= 1
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get('/product/{id}', product_page)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        config = Config()
+        scraping = config._config['scraping']
+        scraping.update({'delay_between_requests': 0, 'retry_attempts': 3,
+                         'adaptive_concurrency': {'enabled': True, 'initial': 2, 'max': 8}})
+        products = [{'id': i, 'name': f'Oil {i}', 'urls': {'atoz_catering': f'http://127.0.0.1:{port}/product/{i}'}}
+                    for i in range(1, 41)]
+        manager = ScraperManager(config)
+        try:
+            return manager, await manager.scrape_all_products(products)
+        finally:
+            await runner.cleanup()
+
+    manager, results = asyncio.run(scenario())
+    assert len(results) == 40
+    assert all(result['atoz_catering']['success'] for result in results.values())
+    assert state['max_in_flight'] > 1
+    assert metrics.CONCURRENCY_BACKOFFS.value(site='atoz_catering', reason='429') >= 1
+    assert manager.concurrency.limits()['atoz_catering'] <= 8
+
+
+if __name__ == '__main__':
+    test_parse_retry_after()
+    test_window_grows_on_success_and_halves_once_per_burst()
+    test_retry_after_pauses_the_site()
+    test_scrape_backs_off_on_429_and_still_completes()
+    print("✅ All concurrency tests passed")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared scrape job queue and worker mode
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, '.')
+
+from src.config import Config
+from src.database import DatabaseManager
+from src.job_queue import ScrapeJobQueue
+from src.scrape_worker import ScrapeWorker, enqueue_due_jobs
+
+
+def test_leases_are_exclusive_and_expire():
+    now = datetime(2024, 6, 1, 8, 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'queue.db'))
+        queue = ScrapeJobQueue(db_manager, {'lease_seconds': 60, 'max_attempts': 2})
+        jobs = [(1, 'jjfoodservice', 'https://jj/1', 1.0), (2, 'jjfoodservice', 'https://jj/2', 5.0),
+                (3, 'atoz_catering', 'https://atoz/3', 3.0)]
+        assert queue.enqueue(jobs, now=now) == 3
+        assert queue.enqueue(jobs, now=now) == 0  # already queued
+
+        first = queue.lease('worker-a', limit=2, now=now)
+        second = queue.lease('worker-b', limit=2, now=now)
+        assert [job['product_id'] for job in first] == [2, 3]
+        assert [job['product_id'] for job in second] == [1]
+        assert queue.lease('worker-c', limit=2, now=now) == []
+
+        assert queue.complete(first[0]['id'], 'worker-a', {'success': True, 'price': 9.99}, now=now)
+        # worker-a and worker-b hang; their leases run out and the jobs go to worker-c
+        later = now + timedelta(seconds=61)
+        retried = queue.lease('worker-c', limit=5, now=later)
+        assert [(job['product_id'], job['attempt']) for job in retried] == [(3, 2), (1, 2)]
+        assert not queue.complete(second[0]['id'], 'worker-b', {'success': True}, now=later)
+        assert queue.complete(retried[1]['id'], 'worker-c', {'success': False, 'error': 'timeout'}, now=later)
+
+        # worker-c hangs too on job 3's last allowed attempt, so it is given up on
+        assert queue.lease('worker-d', now=later + timedelta(seconds=61)) == []
+        assert queue.counts() == {'pending': 0, 'leased': 0, 'done': 1, 'failed': 2}
+
+        assert queue.purge_finished(timedelta(days=1), now=now + timedelta(days=2)) == 3
+        assert queue.enqueue(jobs[:1], now=now) == 1
+
+
+def test_renewed_leases_do_not_expire():
+    now = datetime(2024, 6, 1, 8, 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'queue.db'))
+        queue = ScrapeJobQueue(db_manager, {'lease_seconds': 60})
+        queue.enqueue([(1, 'jjfoodservice', 'https://jj/1', 1.0), (2, 'jjfoodservice', 'https://jj/2', 1.0)], now=now)
+        first, second = queue.lease('worker-a', limit=2, now=now)
+
+        assert queue.renew([first['id'], second['id']], 'worker-a', now=now + timedelta(seconds=50)) == []
+        assert queue.lease('worker-b', now=now + timedelta(seconds=100)) == []
+
+        # Both leases run out; the one another worker takes can no longer be renewed, the other still can
+        taken = queue.lease('worker-b', now=now + timedelta(seconds=200))
+        assert [job['id'] for job in taken] == [first['id']]
+        assert queue.renew([first['id'], second['id']], 'worker-a', now=now + timedelta(seconds=200)) == [first['id']]
+        assert queue.renew([first['id']], 'worker-b', now=now + timedelta(seconds=200)) == []
+        assert queue.lease('worker-c', now=now + timedelta(seconds=250)) == []
+
+
+def _slow_worker_scenario(db_path, worker_config, steal):
+    """Run one worker on a job whose page takes 0.6s, with another worker trying to lease it meanwhile."""
+    async def product_page(request):
+        await asyncio.sleep(0.6)
+        return web.Response(text='<html><h1>Oil</h1><span class="price">£4.99</span></html>',
+                            content_type='text/html')
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get('/product', product_page)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        base = f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+        db_manager = DatabaseManager(db_path)
+        product_id = db_manager.add_product('Oil', {'atoz_catering': f'{base}/product'})
+        config = Config()
+        config._config['scraping'].update({'delay_between_requests': 0, 'workers': worker_config})
+        worker = ScrapeWorker(config, db_manager, worker_id='worker-a')
+        enqueue_due_jobs(config, db_manager)
+
+        async def other_worker():
+            await asyncio.sleep(0.4)
+            return worker.queue.lease('worker-b') if steal else []
+
+        try:
+            leased, stolen = await asyncio.gather(worker.run_batch(), other_worker())
+        finally:
+            await runner.cleanup()
+        return db_manager, product_id, leased, stolen
+
+    return asyncio.run(scenario())
+
+
+def test_slow_batch_keeps_its_lease():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager, product_id, leased, stolen = _slow_worker_scenario(
+            str(Path(tmp) / 'slow.db'), {'lease_seconds': 0.3, 'heartbeat_seconds': 0.1}, steal=True)
+        assert leased == 1 and stolen == []
+        assert [entry['price'] for entry in db_manager.get_price_history(product_id, days=1)] == [4.99]
+        assert ScrapeJobQueue(db_manager).counts()['done'] == 1
+
+
+def test_result_is_not_recorded_after_the_lease_is_lost():
+    with tempfile.TemporaryDirectory() as tmp:
+        # No renewal in time: the lease runs out mid-scrape and worker-b takes the job
+        db_manager, product_id, leased, stolen = _slow_worker_scenario(
+            str(Path(tmp) / 'lost.db'), {'lease_seconds': 0.3, 'heartbeat_seconds': 60}, steal=True)
+        assert leased == 1 and len(stolen) == 1
+        assert db_manager.get_price_history(product_id, days=1) == []
+        assert ScrapeJobQueue(db_manager).counts()['leased'] == 1
+
+
+def test_several_workers_share_the_queue():
+    hits = Counter()
+
+    async def product_page(request):
+        product = request.match_info['id']
+        hits[product] += 1
+        await asyncio.sleep(0.1)
+        return web.Response(text=f'<html><h1>{product}</h1><span class="price">£{int(product) + 10}.99</span></html>',
+                            content_type='text/html')
+
+    async def scenario(db_path):
+        app = web.Application()
+        app.router.add_get('/product/{id}', product_page)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        base = f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+        db_manager = DatabaseManager(db_path)
+        for number in range(1, 13):
+            db_manager.add_product(f'Product {number}', {'atoz_catering': f'{base}/product/{number}'})
+        assert enqueue_due_jobs(Config(), db_manager) == 12
+        assert enqueue_due_jobs(Config(), db_manager) == 0
+
+        env = {**os.environ, 'DATABASE_PATH': db_path, 'DELAY_BETWEEN_REQUESTS': '0'}
+        try:
+            workers = [await asyncio.create_subprocess_exec(
+                sys.executable, 'main.py', '--mode', 'worker', '--worker-id', f'worker-{number}',
+                '--exit-when-empty', env=env,
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+                for number in range(3)]
+            codes = await asyncio.wait_for(asyncio.gather(*(worker.wait() for worker in workers)), 120)
+        finally:
+            await runner.cleanup()
+        return db_manager, codes
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager, codes = asyncio.run(scenario(str(Path(tmp) / 'workers.db')))
+        assert codes == [0, 0, 0]
+
+        with db_manager.get_connection() as conn:
+            rows = conn.execute('SELECT status, attempts, leased_by FROM scrape_jobs').fetchall()
+        assert len(rows) == 12 and all(status == 'done' and attempts == 1 for status, attempts, _ in rows)
+        assert len({worker for _, _, worker in rows}) > 1
+
+        # Every job scraped exactly once, and its price saved
+        assert hits == Counter({str(number): 1 for number in range(1, 13)})
+        for product in db_manager.get_all_products():
+            history = db_manager.get_price_history(product['id'], days=1)
+            assert [entry['price'] for entry in history] == [float(f"{int(product['name'].split()[1]) + 10}.99")]
+
+
+if __name__ == '__main__':
+    test_leases_are_exclusive_and_expire()
+    test_renewed_leases_do_not_expire()
+    test_slow_batch_keeps_its_lease()
+    test_result_is_not_recorded_after_the_lease_is_lost()
+    test_several_workers_share_the_queue()
+    print("✅ All job queue tests passed")
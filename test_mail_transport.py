@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Test the pooled SMTP mail transport against a local SMTP stand-in
+"""
+
+import asyncio
+import socketserver
+import sys
+import threading
+from email.mime.text import MIMEText
+
+sys.path.insert(0, '.')
+
+from src.mail_transport import MailTransport
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server that records sessions and messages."""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.fail_next_data = 0
+        self.lock = threading.Lock()
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 localhost ready')
+
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif command in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                with server.lock:
+                    reject = server.fail_next_data > 0
+                    if reject:
+                        server.fail_next_data -= 1
+                if reject:
+                    self.reply('451 Try again later')
+                    continue
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                body = []
+                while True:
+                    data_line = self.rfile.readline().decode()
+                    if data_line in ('.\r\n', '.\n'):
+                        break
+                    body.append(data_line)
+                with server.lock:
+                    server.messages.append(''.join(body))
+                self.reply('250 Queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Not implemented')
+
+
+def start_server():
+    server = FakeSMTPServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_transport(server, **kwargs):
+    email_config = {
+        'smtp_server': '127.0.0.1',
+        'smtp_port': server.server_address[1],
+        'use_tls': False,
+        'sender_email': 'tracker@example.com',
+        'recipient_email': 'alerts@example.com'
+    }
+    return MailTransport(email_config, **kwargs)
+
+
+def make_message(number):
+    msg = MIMEText(f'Message body {number}')
+    msg['From'] = 'tracker@example.com'
+    msg['To'] = 'alerts@example.com'
+    msg['Subject'] = f'Test {number}'
+    return msg
+
+
+def test_messages_share_one_session():
+    """Concurrent sends are batched over a single SMTP connection."""
+    server = start_server()
+    transport = make_transport(server)
+
+    async def send_all():
+        results = await asyncio.gather(*(transport.send(make_message(i)) for i in range(20)))
+        await transport.close()
+        return results
+
+    try:
+        results = asyncio.run(send_all())
+        assert all(results), results
+        assert len(server.messages) == 20, len(server.messages)
+        assert server.connections == 1, f"Expected 1 SMTP session, got {server.connections}"
+    finally:
+        server.shutdown()
+
+
+def test_session_reused_across_event_loops_and_sync_sends():
+    """The authenticated session outlives one asyncio.run() and serves send_sync too."""
+    server = start_server()
+    transport = make_transport(server)
+
+    try:
+        assert asyncio.run(transport.send(make_message(1)))
+        assert asyncio.run(transport.send(make_message(2)))
+        assert transport.send_sync(make_message(3))
+        assert len(server.messages) == 3
+        assert server.connections == 1, f"Expected 1 SMTP session, got {server.connections}"
+        transport.session.close()
+    finally:
+        server.shutdown()
+
+
+def test_session_stays_open_until_last_loop_closes():
+    """A thread closing its loop's queue leaves the session open for another thread's loop."""
+    server = start_server()
+    transport = make_transport(server)
+    first_sent, other_closed = threading.Event(), threading.Event()
+    results = []
+
+    async def long_running():
+        results.append(await transport.send(make_message(1)))
+        first_sent.set()
+        await asyncio.get_running_loop().run_in_executor(None, other_closed.wait)
+        results.append(await transport.send(make_message(3)))
+        await transport.close()
+
+    async def short_lived():
+        results.append(await transport.send(make_message(2)))
+        await transport.close()
+
+    try:
+        thread = threading.Thread(target=asyncio.run, args=(long_running(),))
+        thread.start()
+        first_sent.wait()
+        asyncio.run(short_lived())
+        assert transport.session._server is not None, "closed while another loop was using it"
+        other_closed.set()
+        thread.join()
+
+        assert results == [True, True, True]
+        assert len(server.messages) == 3
+        assert server.connections == 1, f"Expected 1 SMTP session, got {server.connections}"
+        assert transport.session._server is None
+    finally:
+        server.shutdown()
+
+
+def test_transient_failures_are_retried():
+    """A 4xx reply to DATA is retried with backoff and the message is delivered."""
+    server = start_server()
+    server.fail_next_data = 2
+    transport = make_transport(server, retry_base_delay=0.01)
+
+    try:
+        assert asyncio.run(transport.send(make_message(1)))
+        assert len(server.messages) == 1
+        transport.session.close()
+    finally:
+        server.shutdown()
+
+
+def test_gives_up_after_max_retries():
+    """Persistent failures resolve to False instead of raising."""
+    server = start_server()
+    server.fail_next_data = 100
+    transport = make_transport(server, max_retries=2, retry_base_delay=0.01)
+
+    try:
+        assert asyncio.run(transport.send(make_message(1))) is False
+        assert transport.send_sync(make_message(2)) is False
+        assert server.messages == []
+        transport.session.close()
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    test_messages_share_one_session()
+    test_session_reused_across_event_loops_and_sync_sends()
+    test_session_stays_open_until_last_loop_closes()
+    test_transient_failures_are_retried()
+    test_gives_up_after_max_retries()
+    print("✅ All mail transport tests passed")
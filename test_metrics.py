@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for the metrics registry and its Prometheus text exposition
+"""
+
+import math
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, '.')
+
+from src.metrics import MetricsRegistry
+
+
+def test_counter_and_gauge_samples():
+    registry = MetricsRegistry()
+    fetches = registry.counter('t_fetches_total', 'Fetches.', ('site',))
+    depth = registry.gauge('t_queue_depth', 'Queue depth.')
+    fetches.inc(site='booker')
+    fetches.inc(2.5, site='booker')
+    fetches.inc(site='amazon_uk')
+    depth.set(4)
+    depth.dec()
+
+    assert registry.counter('t_fetches_total', 'Fetches.', ('site',)) is fetches
+    assert registry.render() == (
+        '# HELP t_fetches_total Fetches.\n'
+        '# TYPE t_fetches_total counter\n'
+        't_fetches_total{site="amazon_uk"} 1\n'
+        't_fetches_total{site="booker"} 3.5\n'
+        '# HELP t_queue_depth Queue depth.\n'
+        '# TYPE t_queue_depth gauge\n'
+        't_queue_depth 3\n'
+    )
+
+    try:
+        fetches.inc(host='booker')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("labels not matching the metric's should be rejected")
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    errors = registry.counter('t_errors_total', 'Errors.', ('message',))
+    errors.inc(message='bad "quote"\\path\nnext line')
+
+    assert 't_errors_total{message="bad \\"quote\\"\\\\path\\nnext line"} 1' in registry.render().splitlines()
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram('t_seconds', 'Latency.', ('site',), buckets=(0.5, 0.1, 1))
+    for value in (0.05, 0.1, 0.3, 0.7, 4.0):
+        latency.observe(value, site='booker')
+
+    assert latency.count(site='booker') == 5
+    assert [line for line in registry.render().splitlines() if not line.startswith('#')] == [
+        't_seconds_bucket{site="booker",le="0.1"} 2',
+        't_seconds_bucket{site="booker",le="0.5"} 3',
+        't_seconds_bucket{site="booker",le="1"} 4',
+        't_seconds_bucket{site="booker",le="+Inf"} 5',
+        't_seconds_sum{site="booker"} 5.15',
+        't_seconds_count{site="booker"} 5',
+    ]
+
+
+def test_nan_and_infinite_values():
+    registry = MetricsRegistry()
+    price = registry.gauge('t_price', 'Price.', ('site',))
+    price.set(float('nan'), site='a')
+    price.set(float('inf'), site='b')
+    price.set(float('-inf'), site='c')
+    registry.histogram('t_nan_seconds', 'Latency.').observe(float('nan'))
+
+    lines = registry.render().splitlines()
+    assert 't_price{site="a"} NaN' in lines
+    assert 't_price{site="b"} +Inf' in lines
+    assert 't_price{site="c"} -Inf' in lines
+    # A NaN observation lands only in +Inf, and makes the sum NaN
+    assert 't_nan_seconds_bucket{le="10"} 0' in lines
+    assert 't_nan_seconds_bucket{le="+Inf"} 1' in lines
+    assert 't_nan_seconds_sum NaN' in lines
+    assert math.isnan(price.value(site='a'))
+
+
+def test_textfile_and_clear():
+    registry = MetricsRegistry()
+    runs = registry.counter('t_runs_total', 'Runs.')
+    runs.inc()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'price_tracker.prom'
+        registry.write_textfile(str(path))
+        assert path.read_text() == registry.render()
+        assert list(Path(tmp).iterdir()) == [path]
+
+    registry.clear()
+    assert runs.value() == 0
+    assert registry.render() == '# HELP t_runs_total Runs.\n# TYPE t_runs_total counter\n'
+
+
+def test_production_server_keeps_one_worker_while_metrics_are_served():
+    from main import production_concurrency
+
+    previous = os.environ.pop('METRICS_ENABLED', None)
+    try:
+        assert production_concurrency(3, 4) == (1, 12)
+        assert production_concurrency(1, 8) == (1, 8)
+        os.environ['METRICS_ENABLED'] = 'false'
+        assert production_concurrency(3, 4) == (3, 4)
+    finally:
+        os.environ.pop('METRICS_ENABLED', None)
+        if previous is not None:
+            os.environ['METRICS_ENABLED'] = previous
+
+
+if __name__ == '__main__':
+    test_counter_and_gauge_samples()
+    test_label_values_are_escaped()
+    test_histogram_buckets_are_cumulative()
+    test_nan_and_infinite_values()
+    test_textfile_and_clear()
+    test_production_server_keeps_one_worker_while_metrics_are_served()
+    print("✅ All metrics tests passed")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-pass special-offer selector matcher
+"""
+
+import json
+import sys
+import warnings
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, '.')
+
+from src.config import Config
+from src.offer_matcher import OfferMatcher
+from src.uk_scraper import UKCateringScraper
+
+FIXTURES = Path('benchmarks/fixtures')
+SITES = ('jjfoodservice', 'atoz_catering', 'amazon_uk', 'booker')
+
+
+def per_selector(soup, selectors):
+    """What the per-selector loop saw: soup.select for each selector, keeping "£" elements."""
+    seen = []
+    for selector in selectors:
+        try:
+            elements = soup.select(selector)
+        except Exception:
+            continue
+        seen.append((selector, [(element, element.get_text(strip=True)) for element in elements
+                                if '£' in element.get_text(strip=True)]))
+    return seen
+
+
+def per_selector_prices(scraper, soup, site):
+    """The special-offer prices the per-selector loop produced."""
+    prices = []
+    for selector, found in per_selector(soup, scraper._special_offer_selectors(site)):
+        for element, text in found:
+            price = scraper._parse_uk_price(text, detect_special_offers=True, element=element)
+            if price:
+                prices.append((price, selector))
+    return prices
+
+
+def _same(candidates, expected):
+    return [(selector, [(id(element), text) for element, text in found]) for selector, found in candidates] == \
+        [(selector, [(id(element), text) for element, text in found]) for selector, found in expected]
+
+
+def test_matches_per_selector_select_on_fixtures():
+    warnings.simplefilter('ignore', FutureWarning)
+    scraper = UKCateringScraper(Config())
+    manifest = json.loads((FIXTURES / 'manifest.json').read_text())
+    extra = '''<div class="offer-box"><p>Save <b>£2</b></p><del>£9.99</del><s>was</s>
+        <span class="price-container"><span class="a-price-strike"><span class="a-offscreen">£7.49</span></span></span>
+        <h3 style="text-decoration: line-through">£3.00</h3><span class="sale-price">Was £6.50 Now £4.99</span></div>'''
+    pages = [(FIXTURES / name).read_text(encoding='utf-8') for name in manifest] + [extra]
+
+    matched = priced = 0
+    for html in pages:
+        soup = BeautifulSoup(html, 'html.parser')
+        for site in SITES:
+            selectors = scraper._special_offer_selectors(site)
+            candidates = OfferMatcher(selectors + ['p:nth-child(']).candidates(soup)
+            assert _same(candidates, per_selector(soup, selectors)), site
+            matched += sum(len(found) for _, found in candidates)
+            prices = scraper._find_special_offer_prices(soup, site)
+            assert prices == per_selector_prices(scraper, soup, site), site
+            priced += len(prices)
+    assert (matched, priced) == (42, 22), (matched, priced)
+
+
+def test_finds_deal_price():
+    warnings.simplefilter('ignore', FutureWarning)
+    scraper = UKCateringScraper(Config())
+    html = (FIXTURES / 'amazon_uk/deal_price.html').read_text(encoding='utf-8')
+    soup = BeautifulSoup(html, 'html.parser')
+    # The struck-through £19.99 list price is not an offer price
+    assert scraper._find_special_offer_prices(soup, 'amazon_uk') == [
+        (15.49, '.a-price.a-text-price.a-size-medium.apexPriceToPay .a-offscreen')]
+    assert scraper.extract_page(html, 'amazon_uk')['price'] == 15.49
+
+
+def test_matches_on_large_amazon_page():
+    warnings.simplefilter('ignore', FutureWarning)
+    scraper = UKCateringScraper(Config())
+    html = (FIXTURES / 'amazon_uk/deal_price.html').read_text(encoding='utf-8')
+    body_start = html.index('<body')
+    body_end = html.rindex('</body>')
+    # A long page: the product section repeated, as with carousels and "customers also bought"
+    large = html[:body_end] + html[html.index('>', body_start) + 1:body_end] * 8 + html[body_end:]
+    soup = BeautifulSoup(large, 'html.parser')
+    selectors = scraper._special_offer_selectors('amazon_uk')
+    # The speed-up over per-selector select is measured by benchmarks/extraction.py
+    assert _same(OfferMatcher(selectors).candidates(soup), per_selector(soup, selectors))
+
+
+if __name__ == '__main__':
+    test_matches_per_selector_select_on_fixtures()
+    test_finds_deal_price()
+    test_matches_on_large_amazon_page()
+    print("✅ All offer matcher tests passed")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Tests for the vectorised price analytics against plain-Python references
+"""
+
+import math
+import statistics
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, '.')
+
+from src.database import DatabaseManager
+from src.price_analytics import (MAD_SCALE, PriceAnomalyDetector, analyse_catalogue, load_price_series,
+                                 percent_change, robust_z_scores, rolling_median_mad)
+
+START = datetime.now() - timedelta(days=20)
+
+# Three series of different lengths, one with a constant price (MAD = 0)
+HISTORY = {
+    'booker': [10.0, 10.5, 9.8, 10.2, 30.0, 10.1, 9.9],
+    'amazon_uk': [4.0, 4.0, 4.0, 4.0, 5.0],
+    'jjfoodservice': [7.25],
+}
+
+
+def _database(tmp):
+    db_manager = DatabaseManager(str(Path(tmp) / 'analytics.db'))
+    product_id = db_manager.add_product('Oil', {site: f'https://{site}/oil' for site in HISTORY})
+    for site_name, prices in HISTORY.items():
+        for n, price in enumerate(prices):
+            db_manager.save_price_history(product_id, site_name, price, timestamp=START + timedelta(days=n))
+    return db_manager, product_id
+
+
+def reference_window_stats(prices, window, include_current):
+    """(median, MAD, count) for each position of one series, one window at a time."""
+    stats = []
+    for position in range(len(prices)):
+        end = position + 1 if include_current else position
+        values = prices[max(0, end - window):end]
+        if not values:
+            stats.append((math.nan, math.nan, 0))
+            continue
+        median = statistics.median(values)
+        stats.append((median, statistics.median(abs(value - median) for value in values), len(values)))
+    return stats
+
+
+def reference_z(price, median, mad):
+    if mad > 0:
+        return (price - median) / (mad * MAD_SCALE)
+    if price == median:
+        return 0.0
+    return math.copysign(math.inf, price - median)
+
+
+def _same(actual, expected):
+    return (math.isnan(actual) and math.isnan(expected)) or math.isclose(actual, expected)
+
+
+def test_rolling_median_mad_matches_reference():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager, product_id = _database(tmp)
+        series = load_price_series(db_manager)
+        assert series.keys == [(product_id, site) for site in sorted(HISTORY)]
+
+        for window in (1, 3, 10):
+            for include_current in (True, False):
+                median, mad, counts = rolling_median_mad(series, window, include_current)
+                for (_, site_name), start, end in zip(series.keys, series.starts, series.ends):
+                    expected = reference_window_stats(HISTORY[site_name], window, include_current)
+                    for row, (exp_median, exp_mad, exp_count) in zip(range(start, end), expected):
+                        assert counts[row] == exp_count, (site_name, window, include_current, row)
+                        assert _same(median[row], exp_median) and _same(mad[row], exp_mad), \
+                            (site_name, window, include_current, row)
+
+
+def test_percent_change_and_z_scores():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager, _ = _database(tmp)
+        series = load_price_series(db_manager)
+
+        change = percent_change(series)
+        expected = []
+        for site_name in sorted(HISTORY):
+            prices = HISTORY[site_name]
+            expected += [math.nan] + [(b - a) / a * 100 for a, b in zip(prices, prices[1:])]
+        assert all(_same(a, b) for a, b in zip(change, expected))
+
+        median, mad, _ = rolling_median_mad(series, 5, include_current=False)
+        z = robust_z_scores(series.prices, median, mad)
+        for row in range(series.size):
+            if np.isnan(median[row]):
+                assert np.isnan(z[row])
+            else:
+                assert _same(z[row], reference_z(series.prices[row], median[row], mad[row])), row
+
+    # MAD = 0: the same price scores 0, any other is infinitely far
+    z = robust_z_scores(np.array([4.0, 5.0, 3.0]), np.array([4.0, 4.0, 4.0]), np.zeros(3))
+    assert list(z) == [0.0, math.inf, -math.inf]
+
+
+def test_analyse_catalogue():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager, product_id = _database(tmp)
+        report = {row['site_name']: row for row in analyse_catalogue(db_manager, days=90, window=5)}
+
+        assert report['booker']['observations'] == 7
+        assert report['booker']['latest_price'] == 9.9
+        assert report['booker']['change_percent'] == round((9.9 - 10.1) / 10.1 * 100, 2)
+        assert report['booker']['rolling_median'] == 10.2  # median of the five prices before it
+        assert not report['booker']['outlier']
+
+        # Constant history, then a new price: infinite z-score, flagged
+        assert report['amazon_uk']['z_score'] == math.inf and report['amazon_uk']['outlier']
+        # A single price has nothing to compare with
+        assert report['jjfoodservice'] == {
+            'product_id': product_id, 'site_name': 'jjfoodservice', 'observations': 1, 'latest_price': 7.25,
+            'latest_at': report['jjfoodservice']['latest_at'], 'change_percent': None, 'rolling_median': None,
+            'z_score': None, 'outlier': False}
+
+        assert analyse_catalogue(db_manager, days=1) == []
+
+
+def test_screening_thresholds():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager, product_id = _database(tmp)
+        detector = PriceAnomalyDetector(db_manager, {'window': 5, 'min_history': 3, 'max_ratio': 3.0,
+                                                     'z_threshold': 6.0, 'min_change_percent': 50,
+                                                     'confirm_after': 2})
+        baselines = detector.load_baselines()
+        # booker's last five prices: 9.8, 10.2, 30.0, 10.1, 9.9
+        median, mad, count = baselines[(product_id, 'booker')]
+        assert (median, count) == (10.1, 5) and math.isclose(mad, 0.2)
+
+        assert detector.check(product_id, 'booker', 11.5) is None  # z 4.7
+        assert detector.check(product_id, 'booker', 14.0) is None  # z 13.2 but only 39% away
+        assert 'from the recent median' in detector.check(product_id, 'booker', 16.0)  # z 19.9, 58% away
+        assert 'x the recent median' in detector.check(product_id, 'booker', 30.3)  # 3x ratio
+        assert 'x the recent median' in detector.check(product_id, 'booker', 3.3)  # 1/3 ratio
+
+        # MAD = 0: any change past min_change_percent is an outlier
+        assert detector.check(product_id, 'amazon_uk', 4.4) is None
+        assert detector.check(product_id, 'amazon_uk', 6.5) is not None
+        # Too little history to judge
+        assert detector.check(product_id, 'jjfoodservice', 100.0) is None
+
+        # The same new level seen again is accepted as a real change
+        detector.record(product_id, 'booker', 16.0, detector.check(product_id, 'booker', 16.0))
+        assert detector.check(product_id, 'booker', 16.2) is None
+        assert detector.check(product_id, 'booker', 20.0) is not None
+
+
+if __name__ == '__main__':
+    test_rolling_median_mad_matches_reference()
+    test_percent_change_and_z_scores()
+    test_analyse_catalogue()
+    test_screening_thresholds()
+    print("✅ All price analytics tests passed")
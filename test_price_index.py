@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Tests that the incrementally refreshed best-price index matches a from-scratch query
+"""
+
+import json
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, '.')
+
+from src.database import DatabaseManager
+from src.price_index import BestPriceIndex
+
+START = datetime(2024, 6, 1, 8, 0)
+SITES = ('jjfoodservice', 'atoz_catering', 'amazon_uk')
+
+# The query get_current_best_prices ran before the index existed
+REFERENCE_QUERY = '''
+WITH latest_prices AS (
+    SELECT p.id as product_id, p.name as product_name, ph.site_name, ph.price, ph.timestamp, p.urls,
+           ROW_NUMBER() OVER (PARTITION BY p.id, ph.site_name ORDER BY ph.timestamp DESC) as rn
+    FROM products p
+    LEFT JOIN price_history ph ON p.id = ph.product_id
+    WHERE ph.price IS NOT NULL AND ph.price > 0 AND p.active = 1
+),
+current_prices AS (
+    SELECT * FROM latest_prices WHERE rn = 1
+),
+cheapest_per_product AS (
+    SELECT product_id, product_name, MIN(price) as min_price, MAX(price) as max_price
+    FROM current_prices
+    GROUP BY product_id, product_name
+)
+SELECT cp.product_id, cp.product_name, cp.site_name, cp.price, cp.timestamp, cp.urls,
+       cpp.min_price, cpp.max_price
+FROM current_prices cp
+JOIN cheapest_per_product cpp ON cp.product_id = cpp.product_id
+WHERE cp.price = cpp.min_price
+'''
+
+
+def reference_best_prices(db_manager):
+    best = {}
+    with db_manager.get_connection() as conn:
+        for product_id, name, site_name, price, timestamp, urls, min_price, max_price in conn.execute(REFERENCE_QUERY):
+            best.setdefault(product_id, set()).add((
+                name, site_name, price, datetime.fromisoformat(timestamp),
+                json.loads(urls).get(site_name, ''), min_price, max_price))
+    return best
+
+
+def indexed_best_prices(index):
+    return {
+        product_id: {(option['product_name'], option['store_name'], option['price'], option['scraped_at'],
+                      option['store_url'], option['min_price'], option['max_price']) for option in options}
+        for product_id, options in index.best_prices().items()
+    }
+
+
+class CountingIndex(BestPriceIndex):
+    """Counts full rebuilds so the tests can tell them from incremental refreshes."""
+
+    def __init__(self, db_manager):
+        super().__init__(db_manager)
+        self.rebuilds = 0
+
+    def _rebuild(self, conn):
+        self.rebuilds += 1
+        return super()._rebuild(conn)
+
+
+def _catalogue(db_manager):
+    product_ids = []
+    for n in range(6):
+        urls = {site: f'https://{site}/{n}' for site in SITES}
+        product_ids.append(db_manager.add_product(f'Product {n}', urls))
+    for n, product_id in enumerate(product_ids[:5]):
+        for step in range(3):
+            for offset, site in enumerate(SITES):
+                # Ties between stores on some products
+                price = 10.0 + n + (step * offset) % 2
+                db_manager.save_price_history(product_id, site, price,
+                                              timestamp=START + timedelta(hours=step, minutes=offset))
+    return product_ids
+
+
+def test_incremental_refresh_matches_reference():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'index.db'))
+        product_ids = _catalogue(db_manager)
+        index = CountingIndex(db_manager)
+
+        assert indexed_best_prices(index) == reference_best_prices(db_manager)
+        assert index.rebuilds == 1
+        assert index.refresh() == set()
+
+        # New prices for two products, one of them the product that had none
+        db_manager.save_price_history(product_ids[1], 'amazon_uk', 4.0, timestamp=START + timedelta(days=1))
+        db_manager.save_price_history(product_ids[5], 'atoz_catering', 7.5, timestamp=START + timedelta(days=1))
+        db_manager.save_price_history(product_ids[5], 'jjfoodservice', 7.5, timestamp=START + timedelta(days=1))
+        assert index.refresh() == {product_ids[1], product_ids[5]}
+        assert indexed_best_prices(index) == reference_best_prices(db_manager)
+        assert [option['store_name'] for option in index.best_prices()[product_ids[5]]] == \
+            ['jjfoodservice', 'atoz_catering']
+        assert index.rebuilds == 1
+
+        # An older price does not replace the latest one
+        db_manager.save_price_history(product_ids[2], 'jjfoodservice', 1.0, timestamp=START - timedelta(days=1))
+        index.refresh()
+        assert indexed_best_prices(index) == reference_best_prices(db_manager)
+        assert index.rebuilds == 1
+
+
+def test_updates_and_deletes_rebuild():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'index.db'))
+        product_ids = _catalogue(db_manager)
+        index = CountingIndex(db_manager)
+        index.refresh()
+
+        with db_manager.get_connection() as conn:
+            conn.execute('''
+                UPDATE price_history SET price = 2.5
+                WHERE id = (SELECT MAX(id) FROM price_history WHERE product_id = ?)
+            ''', (product_ids[3],))
+        index.refresh()
+        assert index.rebuilds == 2
+        assert indexed_best_prices(index) == reference_best_prices(db_manager)
+
+        # A delete alongside an insert: the ID scan sees one new row for two writes
+        with db_manager.get_connection() as conn:
+            conn.execute('''
+                DELETE FROM price_history
+                WHERE id = (SELECT MAX(id) FROM price_history WHERE product_id = ?)
+            ''', (product_ids[0],))
+        db_manager.save_price_history(product_ids[4], 'amazon_uk', 30.0, timestamp=START + timedelta(days=1))
+        index.refresh()
+        assert index.rebuilds == 3
+        assert indexed_best_prices(index) == reference_best_prices(db_manager)
+
+        db_manager.delete_product(product_ids[2])
+        index.refresh()
+        assert product_ids[2] not in index.best_prices()
+        assert indexed_best_prices(index) == reference_best_prices(db_manager)
+
+
+def test_product_edits_and_deactivation():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'index.db'))
+        product_ids = _catalogue(db_manager)
+        index = CountingIndex(db_manager)
+        index.refresh()
+
+        db_manager.update_product(product_ids[0], name='Renamed',
+                                  urls={'jjfoodservice': 'https://jj/new'})
+        db_manager.deactivate_product(product_ids[1])
+        assert index.refresh() == {product_ids[0], product_ids[1]}
+        assert index.rebuilds == 1
+
+        best = index.best_prices()
+        assert product_ids[1] not in best and product_ids[1] not in index.latest_prices()
+        assert index.product_info(product_ids[1]) == {}
+        assert {option['product_name'] for option in best[product_ids[0]]} == {'Renamed'}
+        assert indexed_best_prices(index) == reference_best_prices(db_manager)
+
+        # Prices saved for a deactivated product stay out of the index
+        db_manager.save_price_history(product_ids[1], 'jjfoodservice', 1.0, timestamp=START + timedelta(days=1))
+        assert indexed_best_prices(index) == reference_best_prices(db_manager)
+
+
+if __name__ == '__main__':
+    test_incremental_refresh_matches_reference()
+    test_updates_and_deletes_rebuild()
+    test_product_edits_and_deactivation()
+    print("✅ All price index tests passed")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for the profiling hooks used by --profile and the admin request profiler
+"""
+
+import pstats
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, '.')
+
+from src.profiling import ProfileSession, RequestProfilerMiddleware
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+def hello_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'hello']
+
+
+def call(app, headers=None, query=''):
+    environ = {'PATH_INFO': '/api/products', 'QUERY_STRING': query}
+    environ.update({f"HTTP_{name.upper().replace('-', '_')}": value for name, value in (headers or {}).items()})
+    captured = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        captured['headers'] = dict(response_headers)
+
+    body = b''.join(app(environ, start_response))
+    return body, captured['headers']
+
+
+def test_cprofile_session_writes_pstats():
+    with tempfile.TemporaryDirectory() as tmp:
+        with ProfileSession('cprofile', tmp, label='scrape', run_id='r1') as session:
+            busy_loop(0.05)
+
+        assert session.paths == [str(Path(tmp) / 'scrape-r1.prof')]
+        stats = pstats.Stats(session.paths[0])
+        assert any(func[2] == 'busy_loop' for func in stats.stats)
+
+
+def test_sampling_session_writes_collapsed_stacks():
+    with tempfile.TemporaryDirectory() as tmp:
+        with ProfileSession('sample', tmp, label='shopping', run_id='r2', interval=0.001) as session:
+            busy_loop(0.2)
+
+        lines = Path(session.paths[0]).read_text().splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(' ', 1)
+        assert 'busy_loop' in stack and int(count) > 0
+        assert 'busy_loop' in session.summary()
+
+
+def test_requests_are_profiled_only_with_admin_token():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = RequestProfilerMiddleware(hello_app, token='s3cret', output_dir=tmp)
+
+        body, headers = call(app, {'X-Profile': 'cprofile'})
+        assert body == b'hello' and 'X-Profile-Run' not in headers
+
+        body, headers = call(app, {'X-Profile-Token': 'wrong', 'X-Profile': 'cprofile'})
+        assert 'X-Profile-Run' not in headers
+
+        body, headers = call(app, {'X-Profile-Token': 's3cret'}, query='_profile=cprofile')
+        assert body == b'hello'
+        run_id = headers['X-Profile-Run']
+        assert (Path(tmp) / f'request_api_products-{run_id}.prof').exists()
+
+
+if __name__ == '__main__':
+    test_cprofile_session_writes_pstats()
+    test_sampling_session_writes_collapsed_stacks()
+    test_requests_are_profiled_only_with_admin_token()
+    print("✅ All profiling tests passed")
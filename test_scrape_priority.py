@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Tests for priority-ordered scraping with per-result saving and alerting
+"""
+
+import asyncio
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, '.')
+
+from src.alerts import AlertEngine
+from src.config import Config
+from src.database import DatabaseManager
+from src.scrape_recorder import ScrapeRecorder, scrape_and_record
+from src.scrape_scheduler import ScrapeScheduler
+from src.scraper_manager import ScraperManager
+
+
+class RecordingNotifier:
+    """Notification manager stand-in that remembers when alerts were sent."""
+
+    def __init__(self, scraped):
+        self.scraped = scraped
+        self.sent = []
+
+    def has_enabled_channel(self):
+        return True
+
+    async def send_price_alerts(self, alerts):
+        self.sent.append((len(self.scraped), [alert['product']['name'] for alert in alerts]))
+        return True
+
+
+def test_priorities_rank_near_target_then_stale():
+    now = datetime(2024, 6, 1, 8, 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'priority.db'))
+        far = db_manager.add_product('Flour', {'jjfoodservice': 'https://jj/1'}, target_price=5.0)
+        near = db_manager.add_product('Oil', {'jjfoodservice': 'https://jj/2'}, target_price=9.5)
+        stale = db_manager.add_product('Rice', {'jjfoodservice': 'https://jj/3'})
+        fresh = db_manager.add_product('Salt', {'jjfoodservice': 'https://jj/4'})
+        new = db_manager.add_product('Sugar', {'jjfoodservice': 'https://jj/5'})
+        for product_id, price, age in ((far, 10.0, 6), (near, 10.0, 6), (stale, 3.0, 100), (fresh, 1.0, 1)):
+            db_manager.save_price_history(product_id, 'jjfoodservice', price, timestamp=now - timedelta(hours=age))
+
+        scores = ScrapeScheduler(db_manager).priorities(db_manager.get_all_products(), now=now)
+        order = [product_id for (product_id, _), _ in sorted(scores.items(), key=lambda item: -item[1])]
+        assert order == [near, new, stale, far, fresh]
+
+
+def test_near_target_alert_is_sent_before_the_catalogue_finishes():
+    scraped, served = [], []
+
+    async def product_page(request):
+        product = request.match_info['id']
+        scraped.append(product)
+        if product != 'oil':
+            # The rest of the catalogue is slow, so "before it finishes" does not depend on timing
+            await asyncio.sleep(0.5)
+        served.append(product)
+        price = '8.99' if product == 'oil' else '20.00'
+        return web.Response(text=f'<html><h1>{product}</h1><span class="price">£{price}</span></html>',
+                            content_type='text/html')
+
+    async def scenario(db_manager, notifier):
+        app = web.Application()
+        app.router.add_get('/product/{id}', product_page)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        base = f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+        for name in ('flour', 'rice', 'salt', 'sugar', 'oil'):
+            target = 9.5 if name == 'oil' else 5.0
+            product_id = db_manager.add_product(name, {'atoz_catering': f'{base}/product/{name}'}, target_price=target)
+            db_manager.save_price_history(product_id, 'atoz_catering', 10.0 if name == 'oil' else 20.0,
+                                          timestamp=datetime.now() - timedelta(hours=6))
+
+        config = Config()
+        config._config['scraping']['delay_between_requests'] = 0
+        products = db_manager.get_all_products()
+        recorder = ScrapeRecorder(db_manager, AlertEngine(db_manager))
+        on_result, summary = recorder.streaming(notifier)
+        try:
+            results = await ScraperManager(config, db_manager).scrape_all_products(
+                products, priorities=ScrapeScheduler(db_manager).priorities(products), on_result=on_result)
+        finally:
+            await runner.cleanup()
+        return results, summary
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'priority.db'))
+        notifier = RecordingNotifier(served)
+        results, summary = asyncio.run(scenario(db_manager, notifier))
+
+        # Saved as each job finished, not only at the end
+        assert summary['successful'] == 5 and summary['notified'] == 1
+        assert all(len(db_manager.get_price_history(product_id, days=1)) == 2 for product_id in results)
+
+    assert scraped[0] == 'oil'
+    assert notifier.sent == [(1, ['oil'])]
+
+
+class SlowNotifier:
+    """Notification manager stand-in whose sends take a while, so dispatches overlap."""
+
+    def __init__(self):
+        self.sent = []
+
+    def has_enabled_channel(self):
+        return True
+
+    async def send_price_alerts(self, alerts):
+        await asyncio.sleep(0.05)
+        self.sent.extend(alert['product']['name'] for alert in alerts)
+        return True
+
+
+def test_overlapping_dispatches_send_each_alert_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'overlap.db'))
+        products = [db_manager.get_product(db_manager.add_product(name, {'booker': f'https://booker/{name}'},
+                                                                  target_price=10.0))
+                    for name in ('oil', 'rice', 'salt')]
+        notifier = SlowNotifier()
+        on_result, summary = ScrapeRecorder(db_manager).streaming(notifier)
+
+        async def scenario():
+            # Each result opens an alert and dispatches while the others' sends are in flight
+            await asyncio.gather(*(on_result(product, 'booker', {'success': True, 'price': 9.0})
+                                   for product in products))
+
+        asyncio.run(scenario())
+
+        assert sorted(notifier.sent) == ['oil', 'rice', 'salt']
+        assert summary['notified'] == 3
+        assert AlertEngine(db_manager).pending_alerts() == []
+
+
+def test_scrape_and_record_runs_the_due_jobs():
+    scraped = []
+
+    async def product_page(request):
+        scraped.append(request.match_info['id'])
+        return web.Response(text='<html><h1>Oil</h1><span class="price">£8.99</span></html>',
+                            content_type='text/html')
+
+    async def scenario(db_manager, notifier):
+        app = web.Application()
+        app.router.add_get('/product/{id}', product_page)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        base = f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+        for name in ('oil', 'rice'):
+            db_manager.add_product(name, {'atoz_catering': f'{base}/product/{name}'}, target_price=9.5)
+        config = Config()
+        config._config['scraping']['delay_between_requests'] = 0
+        config._config['scraping']['schedule'] = {'enabled': True, 'min_interval_hours': 6}
+        scraper_manager = ScraperManager(config, db_manager)
+        try:
+            return [await scrape_and_record(config, db_manager, scraper_manager, notifier, scrape_all=scrape_all)
+                    for scrape_all in (False, False, True)]
+        finally:
+            await runner.cleanup()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'run.db'))
+        empty = asyncio.run(scrape_and_record(Config(), db_manager, None))
+        assert empty['products'] == 0 and empty['successful'] == 0
+
+        notifier = RecordingNotifier(scraped)
+        first, rescheduled, forced = asyncio.run(scenario(db_manager, notifier))
+
+        assert (first['products'], first['successful'], len(first['alerts']), first['notified']) == (2, 2, 2, 2)
+        assert sorted(name for _, names in notifier.sent for name in names) == ['oil', 'rice']
+        # Nothing is due again within min_interval_hours, unless every job is asked for
+        assert rescheduled['products'] == 0 and forced['products'] == 2
+        assert sorted(scraped) == ['oil', 'oil', 'rice', 'rice']
+
+
+if __name__ == '__main__':
+    test_priorities_rank_near_target_then_stale()
+    test_near_target_alert_is_sent_before_the_catalogue_finishes()
+    test_overlapping_dispatches_send_each_alert_once()
+    test_scrape_and_record_runs_the_due_jobs()
+    print("✅ All scrape priority tests passed")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for volatility-aware scrape scheduling
+"""
+
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, '.')
+
+from src.database import DatabaseManager
+from src.scrape_scheduler import ScrapeScheduler
+
+
+def _history(db_manager, product_id, site_name, prices, now):
+    for days_ago, price in zip(range(len(prices), 0, -1), prices):
+        db_manager.save_price_history(product_id, site_name, price, timestamp=now - timedelta(days=days_ago))
+
+
+def test_intervals_follow_price_volatility_and_target_distance():
+    now = datetime(2024, 6, 1, 8, 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'schedule.db'))
+        stable = db_manager.add_product('Flour', {'jjfoodservice': 'https://jj/1'})
+        weekly = db_manager.add_product('Oil', {'jjfoodservice': 'https://jj/2'})
+        daily = db_manager.add_product('Chips', {'atoz_catering': 'https://atoz/3'})
+        near_target = db_manager.add_product('Rice', {'jjfoodservice': 'https://jj/4'}, target_price=9.5)
+        new = db_manager.add_product('Sugar', {'jjfoodservice': 'https://jj/5'})
+
+        _history(db_manager, stable, 'jjfoodservice', [10.0] * 30, now)
+        _history(db_manager, weekly, 'jjfoodservice', [20.0 + day // 7 for day in range(29)], now)
+        _history(db_manager, daily, 'atoz_catering', [5.0 if day % 2 else 4.0 for day in range(30)], now)
+        _history(db_manager, near_target, 'jjfoodservice', [10.0] * 30, now)
+
+        scheduler = ScrapeScheduler(db_manager, {'enabled': True})
+        products = db_manager.get_all_products()
+        results = {product['id']: {site: {'success': True} for site in product['urls']} for product in products}
+        results[new]['jjfoodservice'] = {'success': False, 'error': 'Failed to fetch page content'}
+        scheduler.reschedule(products, results, now=now)
+
+        with db_manager.get_connection() as conn:
+            hours = {product_id: minutes / 60 for product_id, minutes in
+                     conn.execute('SELECT product_id, interval_minutes FROM scrape_schedule')}
+
+        assert hours[stable] == 168
+        assert 72 <= hours[weekly] <= 96  # changes about weekly, checked twice a week
+        assert hours[daily] == 12
+        assert hours[near_target] == 6
+        assert hours[new] == 6
+
+        # Only jobs whose next-due time has come (within the slack) are scraped
+        due = scheduler.due_products(products, now=now + timedelta(hours=11, minutes=45))
+        assert sorted(product['id'] for product in due) == sorted([daily, near_target, new])
+
+        due = scheduler.due_products(products, now=now + timedelta(days=8))
+        assert len(due) == len(products)
+
+
+def test_due_products_keeps_only_due_sites():
+    now = datetime(2024, 6, 1, 8, 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'schedule.db'))
+        product_id = db_manager.add_product('Oil', {'jjfoodservice': 'https://jj/1', 'amazon_uk': 'https://amz/1'})
+        _history(db_manager, product_id, 'jjfoodservice', [10.0] * 30, now)
+
+        scheduler = ScrapeScheduler(db_manager, {'enabled': True})
+        products = db_manager.get_all_products()
+        scheduler.reschedule(products, {product_id: {'jjfoodservice': {'success': True}}}, now=now)
+
+        due = scheduler.due_products(products, now=now + timedelta(hours=7))
+        assert due == [{**products[0], 'urls': {'amazon_uk': 'https://amz/1'}}]
+
+
+if __name__ == '__main__':
+    test_intervals_follow_price_volatility_and_target_distance()
+    test_due_products_keeps_only_due_sites()
+    print("✅ All scrape scheduler tests passed")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for adaptive selector ordering
+"""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, '.')
+
+from src.config import Config
+from src.selector_stats import SelectorStats
+from src.uk_scraper import UKCateringScraper
+
+PAGE = '''<html><head><title>Cash and carry</title></head><body>
+<div class="breadcrumbs">Home / Oils</div>
+<div class="selling-price">£18.49</div>
+</body></html>'''
+
+
+def test_order_follows_hit_rate_and_persists():
+    selectors = ['.a', '.b', '.c', '.d']
+    with tempfile.TemporaryDirectory() as tmp:
+        ordering = {'enabled': True, 'stats_path': str(Path(tmp) / 'stats.json'), 'min_observations': 7}
+        stats = SelectorStats(ordering)
+        for _ in range(3):
+            stats.record('booker', 'price', '.a', False, 0.002)
+            stats.record('booker', 'price', '.b', False, 0.001)
+        assert stats.order('booker', 'price', selectors) == selectors  # not warmed up yet
+        for _ in range(3):
+            stats.record('booker', 'price', '.c', True, 0.001)
+
+        # .c hits; untried .d gets the benefit of the doubt; .b beats .a on time
+        assert stats.order('booker', 'price', selectors) == ['.c', '.d', '.b', '.a']
+        assert stats.order('booker', 'title', selectors) == selectors
+        stats.save()
+
+        assert SelectorStats(ordering).order('booker', 'price', selectors) == ['.c', '.d', '.b', '.a']
+        assert SelectorStats({**ordering, 'enabled': False}).order('booker', 'price', selectors) == selectors
+
+
+def test_learned_order_cuts_selector_evaluations_across_runs():
+    with tempfile.TemporaryDirectory() as tmp:
+        config = Config()
+        config._config['scraping']['selector_ordering'] = {
+            'enabled': True, 'stats_path': str(Path(tmp) / 'stats.json'), 'min_observations': 5}
+
+        async def run(pages):
+            async with UKCateringScraper(config) as scraper:
+                scraper.selector_stats.reset_pages()
+                data = [scraper.extract_page(PAGE, 'booker') for _ in range(pages)]
+                return data, scraper.selector_stats.report()['booker']
+
+        first, report = asyncio.run(run(1))
+        # Price found by the 8th selector, title by the 5th
+        assert report['evaluations_per_page'] == 13
+
+        SelectorStats._instances.clear()  # as in a new process: the order comes from the saved file
+        second, report = asyncio.run(run(3))
+        assert report['evaluations_per_page'] == 2
+        assert first[0] == second[0] and first[0]['price'] == 18.49 and first[0]['title'] == 'Cash and carry'
+
+
+if __name__ == '__main__':
+    test_order_follows_hit_rate_and_persists()
+    test_learned_order_cuts_selector_evaluations_across_runs()
+    print("✅ All selector ordering tests passed")
@@ -26,7 +26,7 @@ def test_shopping_lists():
     # Generate shopping lists
     print("\n📊 Generating shopping lists...")
     shopping_lists = shopping_generator.generate_shopping_lists()
-    summary = shopping_generator.get_summary_stats()
+    summary = shopping_generator.get_summary_stats(shopping_lists)
     
     # Display summary
     print(f"\n📈 Summary:")
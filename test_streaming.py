@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed page fetching with early termination
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, '.')
+
+from src.config import Config
+from src.streaming import MarkerScanner, read_html
+from src.uk_scraper import UKCateringScraper
+
+FIXTURES = Path('benchmarks/fixtures')
+# Reviews, recommendations and scripts that follow the product details on a real page
+FILLER = '<div class="review"><p>' + 'Great product, would buy again. ' * 30 + '</p></div>\n'
+
+
+def _padded(html: str, copies: int = 500) -> str:
+    end = html.rfind('</body>')
+    end = len(html) if end == -1 else end
+    return html[:end] + FILLER * copies + html[end:]
+
+
+def test_marker_scanner_handles_split_chunks_and_nesting():
+    scanner = MarkerScanner({
+        'price': ['.a-price .a-offscreen'],
+        'title': ['h1#productTitle'],
+        'availability': ['#availability > span'],
+        'unsupported': ['span:contains("£")']
+    })
+    html = ('<html><body><h1 id="productTitle">Oil 5L</h1><span class="a-offscreen">£1</span>'
+            '<div class="a-price big"><p><span class="a-offscreen">£9.99</span></p></div>'
+            '<div id="availability"><p><span>nested</span></p><span>In stock')
+    for start in range(0, len(html), 7):
+        scanner.feed(html[start:start + 7])
+    assert scanner.found == {'price', 'title'}
+    scanner.feed('</span></div>')
+    assert scanner.found == {'price', 'title', 'availability'} and not scanner.done
+
+    assert MarkerScanner({'price': ['.price']}).done is False
+    scanner = MarkerScanner({'price': ['.price']})
+    scanner.feed('<div><p><span class="price">£2<br>.50</div>')
+    assert scanner.done
+
+
+def test_streamed_fetch_matches_full_fetch_on_fixtures():
+    manifest = json.loads((FIXTURES / 'manifest.json').read_text())
+    pages = {name: _padded((FIXTURES / name).read_text(encoding='utf-8')) for name in manifest}
+    sizes = {}
+
+    async def page(request):
+        name = request.match_info['name']
+        response = web.StreamResponse(headers={'Content-Type': 'text/html; charset=utf-8'})
+        await response.prepare(request)
+        body = pages[name].encode('utf-8')
+        for start in range(0, len(body), 8192):
+            await response.write(body[start:start + 8192])
+        return response
+
+    async def scenario(tmp):
+        app = web.Application()
+        app.router.add_get('/{name:.+}', page)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        base = f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+        config = Config()
+        config._config['scraping']['streaming'] = {'enabled': True, 'chunk_bytes': 8192}
+        config._config['scraping']['selector_ordering'] = {'stats_path': str(Path(tmp) / 'selector_stats.json')}
+        results = {}
+        try:
+            async with UKCateringScraper(config) as scraper:
+                for name, entry in manifest.items():
+                    results[name] = await scraper.scrape_product_price(f'{base}/{name}', entry['site'])
+                    async with scraper.session.get(f'{base}/{name}') as response:
+                        _, reason, sizes[name] = await read_html(
+                            response, scraper._stream_markers(entry['site']), 8192)
+                async with scraper.session.get(f'{base}/{name}') as response:
+                    _, reason, capped = await read_html(response, {}, 8192, max_body_bytes=20000)
+        finally:
+            await runner.cleanup()
+        assert reason == 'max_size' and capped < 30000
+        return results
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = asyncio.run(scenario(tmp))
+    for name, entry in manifest.items():
+        expected = entry['expected']
+        assert results[name]['price'] == expected['price'], (name, results[name])
+
+    # Pages with every first-choice marker stop early; the rest are read to the end
+    full = {name: len(html.encode('utf-8')) for name, html in pages.items()}
+    assert sizes['amazon_uk/core_price.html'] < full['amazon_uk/core_price.html'] / 5
+    assert sizes['amazon_uk/deal_price.html'] == full['amazon_uk/deal_price.html']
+
+
+if __name__ == '__main__':
+    test_marker_scanner_handles_split_chunks_and_nesting()
+    test_streamed_fetch_matches_full_fetch_on_fixtures()
+    print("✅ All streaming tests passed")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for the structured-data extraction fast path
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, '.')
+
+from src.config import Config
+from src.structured_data import FAST_PATH_STATS, extract_structured_data
+from src.uk_scraper import UKCateringScraper
+
+
+def test_json_ld_microdata_and_open_graph():
+    json_ld = '''<html><head>
+        <script type="application/ld+json">{not valid json</script>
+        <script type="application/ld+json">[{"@type": "Organization", "name": "Shop"},
+          {"@type": ["Product"], "name": "Rapeseed Oil 20L &amp; tap",
+           "offers": [{"@type": "Offer", "price": "31.50", "availability": "https://schema.org/OutOfStock"},
+                      {"@type": "AggregateOffer", "lowPrice": 29.99, "priceCurrency": "gbp",
+                       "availability": "http://schema.org/InStock"}]}]</script>
+        </head><body><h1>Oil</h1></body></html>'''
+    assert extract_structured_data(json_ld) == {
+        'price': 29.99, 'title': 'Rapeseed Oil 20L & tap', 'availability': True, 'currency': 'GBP',
+        'source': 'json_ld'}
+
+    microdata = '''<div itemscope itemtype="https://schema.org/Product">
+        <h1 itemprop="name">Basmati Rice 10kg</h1>
+        <div itemprop="offers" itemscope itemtype="https://schema.org/Offer">
+          <span itemprop='priceCurrency' content='GBP'>£</span><span itemprop="price">1,014.00</span>
+          <link itemprop="availability" href="https://schema.org/SoldOut"></div></div>'''
+    assert extract_structured_data(microdata) == {
+        'price': 1014.0, 'title': 'Basmati Rice 10kg', 'availability': False, 'currency': 'GBP',
+        'source': 'microdata'}
+
+    open_graph = ('<meta property="og:title" content="Chips 4x2.5kg"><meta property="og:price:amount" '
+                  'content="12.5"><meta itemprop="priceValidUntil" content="2030-01-01">')
+    assert extract_structured_data(open_graph) == {
+        'price': 12.5, 'title': 'Chips 4x2.5kg', 'availability': True, 'currency': 'GBP', 'source': 'open_graph'}
+
+    # A price without a title, or a page without structured data, goes to the selectors
+    assert extract_structured_data('<meta property="product:price:amount" content="3.00">') is None
+    assert extract_structured_data('<span class="price">£3.00</span>') is None
+
+
+def test_extract_page_uses_fast_path_and_reports_hits():
+    scraper = UKCateringScraper(Config())
+    fixtures = Path('benchmarks/fixtures')
+    FAST_PATH_STATS.reset()
+
+    data = scraper.extract_page((fixtures / 'amazon_uk/json_ld_product.html').read_text(), 'amazon_uk')
+    assert data == {'price': 24.99, 'title': 'Napkins Chunky Mayonnaise Catering Sunflower 12x400g',
+                    'availability': True, 'currency': 'GBP'}
+    scraper.extract_page((fixtures / 'amazon_uk/core_price.html').read_text(), 'amazon_uk')
+    scraper.extract_page((fixtures / 'amazon_uk/json_ld_product.html').read_text(), 'amazon_uk')
+    # Turned off for sites whose delivery pricing the structured data does not describe
+    scraper.extract_page((fixtures / 'jjfoodservice/out_of_stock.html').read_text(), 'jjfoodservice')
+
+    report = FAST_PATH_STATS.report()
+    assert report['amazon_uk']['pages'] == 3 and report['amazon_uk']['hits'] == 2
+    assert report['amazon_uk']['saved_seconds'] > 0
+    assert report['jjfoodservice']['pages'] == 0
+
+
+if __name__ == '__main__':
+    test_json_ld_microdata_and_open_graph()
+    test_extract_page_uses_fast_path_and_reports_hits()
+    print("✅ All structured data tests passed")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for per-stage scrape tracing and the Chrome trace export
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, '.')
+
+from src.config import Config
+from src.database import DatabaseManager
+from src.scrape_recorder import ScrapeRecorder
+from src.scraper_manager import ScraperManager
+from src.tracing import Tracer, TRACER, export_and_stop
+
+PAGE = '<html><h1>Oil</h1><span class="price">£4.99</span></html>'
+
+
+async def _scrape_local_page(products):
+    app = web.Application()
+    app.router.add_get('/product', lambda request: web.Response(text=PAGE, content_type='text/html'))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    config = Config()
+    config._config['scraping']['delay_between_requests'] = 0
+    for product in products:
+        product['urls'] = {'atoz_catering': f'http://127.0.0.1:{port}/product'}
+    try:
+        return await ScraperManager(config).scrape_all_products(products)
+    finally:
+        await runner.cleanup()
+
+
+def test_jobs_reuse_free_lanes():
+    tracer = Tracer()
+    tracer.start()
+    with tracer.job(1, 'a'):
+        with tracer.job(2, 'b'):
+            with tracer.span('parse'):
+                pass
+    with tracer.job(3, 'c'):
+        pass
+
+    spans = {event['name']: event for event in tracer._events if event['ph'] == 'X'}
+    assert spans['a #1']['tid'] == 1
+    assert spans['b #2']['tid'] == 2
+    assert spans['parse']['tid'] == 2
+    assert spans['c #3']['tid'] == 1
+
+
+def test_stopped_tracer_records_nothing():
+    tracer = Tracer()
+    with tracer.job(1, 'a'), tracer.span('parse') as args:
+        args['ignored'] = True
+    assert tracer._events == []
+
+
+def test_scrape_run_exports_every_stage():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(str(Path(tmp) / 'trace.db'))
+        product_id = db_manager.add_product('Oil', {'atoz_catering': 'http://placeholder'}, target_price=5.0)
+
+        TRACER.start(run_id='test')
+        results = asyncio.run(_scrape_local_page([{'id': product_id, 'name': 'Oil'}]))
+        ScrapeRecorder(db_manager).record_results(results)
+        path = export_and_stop(str(Path(tmp) / 'trace-{run_id}.json'))
+
+        assert path.endswith('trace-test.json')
+        trace = json.loads(Path(path).read_text())
+
+    stages = {event['name'] for event in trace['traceEvents'] if event['ph'] == 'X'}
+    assert {'queue_wait', 'fetch', 'connect', 'request', 'download', 'parse', 'extract',
+            'db_write', 'alert', 'scrape_products', f'atoz_catering #{product_id}'} <= stages
+    assert trace['otherData']['stages']['job']['count'] == 2
+    assert not TRACER.enabled
+
+
+if __name__ == '__main__':
+    test_jobs_reuse_free_lanes()
+    test_stopped_tracer_records_nothing()
+    test_scrape_run_exports_every_stage()
+    print("✅ All tracing tests passed")
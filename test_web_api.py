@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests for the JSON API's cursor pagination, conditional requests and argument errors
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, '.')
+
+from src.database import DatabaseManager
+from src.web_ui import create_app
+
+START = datetime.now() - timedelta(days=2)
+
+
+def _client(tmp):
+    """A test client for an app whose database lives in tmp."""
+    os.environ.update({'DATABASE_PATH': str(Path(tmp) / 'api.db'), 'DELAY_BETWEEN_REQUESTS': '0'})
+    try:
+        app = create_app()
+    finally:
+        del os.environ['DATABASE_PATH'], os.environ['DELAY_BETWEEN_REQUESTS']
+    db_manager = DatabaseManager(str(Path(tmp) / 'api.db'))
+    product_ids = [db_manager.add_product(f'Product {n}', {'booker': f'https://booker/{n}'}) for n in range(3)]
+    for n in range(3):
+        db_manager.save_price_history(product_ids[0], 'booker', 10.0 + n, timestamp=START + timedelta(hours=n))
+    return app.test_client(), db_manager, product_ids
+
+
+def _next_link(response):
+    link = response.headers.get('Link')
+    if link is None:
+        return None
+    assert link.endswith('>; rel="next"'), link
+    return link[1:-len('>; rel="next"')]
+
+
+def test_pages_chain_through_link_header():
+    with tempfile.TemporaryDirectory() as tmp:
+        client, _, product_ids = _client(tmp)
+
+        seen, url = [], '/api/products?limit=2&fields=id'
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200
+            seen += [row['id'] for row in response.get_json()]
+            url = _next_link(response)
+            assert ('X-Next-Cursor' in response.headers) == (url is not None)
+        assert seen == product_ids
+
+        # A query argument named like a view argument does not move the next link to another product
+        response = client.get(f'/api/product/{product_ids[0]}/prices?limit=2&product_id=99')
+        assert response.status_code == 200
+        assert [row['price'] for row in response.get_json()] == [12.0, 11.0]
+        link = _next_link(response)
+        assert link.startswith(f'/api/product/{product_ids[0]}/prices?') and 'limit=2' in link
+        assert [row['price'] for row in client.get(link).get_json()] == [10.0]
+        assert _next_link(client.get(link)) is None
+
+
+def test_if_none_match_and_etag_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        client, db_manager, product_ids = _client(tmp)
+        url = f'/api/product/{product_ids[0]}/prices'
+
+        response = client.get(url)
+        etag = response.headers['ETag']
+        assert response.headers['Cache-Control'] == 'no-cache'
+
+        not_modified = client.get(url, headers={'If-None-Match': etag})
+        assert not_modified.status_code == 304 and not_modified.data == b''
+        assert not_modified.headers['ETag'] == etag
+        # The ETag covers the query string
+        assert client.get(url + '?limit=1').headers['ETag'] != etag
+
+        db_manager.save_price_history(product_ids[0], 'booker', 9.5, timestamp=datetime.now())
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 200 and response.headers['ETag'] != etag
+        assert response.get_json()[0]['price'] == 9.5
+
+
+def test_invalid_arguments_return_400():
+    with tempfile.TemporaryDirectory() as tmp:
+        client, _, product_ids = _client(tmp)
+
+        for url, message in [
+            ('/api/products?cursor=not-a-cursor', 'Invalid cursor'),
+            ('/api/products?fields=id,secret', 'Unknown fields: secret'),
+            ('/api/products?active=maybe', 'active must be 1, 0 or all'),
+            (f'/api/product/{product_ids[0]}/prices?fields=cost', 'Unknown fields: cost'),
+        ]:
+            response = client.get(url)
+            assert response.status_code == 400, url
+            assert response.get_json() == {'error': message}, url
+
+
+class ProductPage(BaseHTTPRequestHandler):
+    """Serves a product page at whatever price the test sets."""
+    price = '10.00'
+
+    def do_GET(self):
+        body = f'<html><h1>Oil</h1><span class="price">£{ProductPage.price}</span></html>'.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_manual_scrapes_are_screened_and_alerted_on():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ProductPage)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            client, db_manager, _ = _client(tmp)
+            url = f'http://127.0.0.1:{server.server_address[1]}/oil'
+            product_id = db_manager.add_product('Oil', {'atoz_catering': url}, target_price=8.0)
+            for n, price in enumerate((10.0, 10.2, 9.9, 10.1, 10.0)):
+                db_manager.save_price_history(product_id, 'atoz_catering', price, timestamp=START + timedelta(hours=n))
+
+            def scrape(path):
+                response = client.post(path)
+                assert response.status_code == 200 and response.get_json()['success'], response.get_json()
+                with client.session_transaction() as session:
+                    flashes = session.pop('_flashes', [])
+                return response.get_json(), [message for _, message in flashes]
+
+            # An implausible price is kept out of price history
+            ProductPage.price = '100.00'
+            data, flashes = scrape(f'/scrape/{product_id}')
+            assert data['suspicious'] == 1 and flashes == ['Updated 0 prices, 1 suspicious not saved']
+            assert len(db_manager.get_price_history(product_id, days=30)) == 5
+
+            # A price at or below target opens an alert, from a scrape of the whole catalogue too
+            ProductPage.price = '7.49'
+            data, flashes = scrape('/scrape_all')
+            assert data['suspicious'] == 0 and data['total_updated'] == 1
+            assert flashes == ['Updated 1 prices, 1 price alerts']
+            assert db_manager.get_price_history(product_id, days=30)[0]['price'] == 7.49
+            with db_manager.get_connection() as conn:
+                assert conn.execute('SELECT alert_price FROM price_alerts').fetchall() == [(7.49,)]
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    test_pages_chain_through_link_header()
+    test_if_none_match_and_etag_changes()
+    test_invalid_arguments_return_400()
+    test_manual_scrapes_are_screened_and_alerted_on()
+    print("✅ All web API tests passed")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Throughput and reliability tests for the webhook dispatcher against a local HTTP stub
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, '.')
+
+from src.webhook_dispatcher import WebhookDispatcher
+
+
+class WebhookStub:
+    """Local aiohttp server that records requests and can fail or slow down on demand."""
+
+    def __init__(self, delay=0.0, fail_first=0, status=200):
+        self.delay = delay
+        self.fail_first = fail_first
+        self.status = status
+        self.requests = []
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.runner = None
+        self.url = None
+
+    async def handle(self, request):
+        self.connections.add(request.transport.get_extra_info('peername'))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            self.requests.append(await request.json())
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                return web.Response(status=503)
+            return web.Response(status=self.status)
+        finally:
+            self.in_flight -= 1
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post('/hook', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://127.0.0.1:{port}/hook'
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def run(test):
+    async def wrapper():
+        stub = WebhookStub(**getattr(test, 'stub_options', {}))
+        await stub.start()
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                await test(stub, Path(tmp) / 'dead_letters.jsonl')
+        finally:
+            await stub.stop()
+    asyncio.run(wrapper())
+
+
+async def _test_events_in_window_are_coalesced(stub, dead_letters):
+    dispatcher = WebhookDispatcher(stub.url, coalesce_window=0.05, dead_letter_path=dead_letters)
+    results = await asyncio.gather(*(dispatcher.publish({'n': i}) for i in range(10)))
+    await dispatcher.close()
+
+    assert all(results)
+    assert len(stub.requests) == 1, f"Expected 1 batched request, got {len(stub.requests)}"
+    assert stub.requests[0]['event_count'] == 10
+    assert [event['n'] for event in stub.requests[0]['events']] == list(range(10))
+
+
+async def _test_single_event_is_sent_unchanged(stub, dead_letters):
+    dispatcher = WebhookDispatcher(stub.url, coalesce_window=0.01, dead_letter_path=dead_letters)
+    assert await dispatcher.publish({'type': 'daily_shopping_list', 'items': 3})
+    await dispatcher.close()
+
+    assert stub.requests == [{'type': 'daily_shopping_list', 'items': 3}]
+
+
+async def _test_throughput_with_bounded_concurrency(stub, dead_letters):
+    dispatcher = WebhookDispatcher(stub.url, max_concurrency=4, dead_letter_path=dead_letters)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(dispatcher.send({'n': i}) for i in range(200)))
+    elapsed = time.perf_counter() - started
+    await dispatcher.close()
+
+    assert all(results)
+    assert len(stub.requests) == 200
+    assert stub.max_in_flight <= 4, f"Concurrency limit exceeded: {stub.max_in_flight}"
+    # Keep-alive: the 200 posts share the pooled connections
+    assert len(stub.connections) <= 4, f"Expected at most 4 connections, got {len(stub.connections)}"
+    print(f"  200 webhooks in {elapsed:.2f}s ({200 / elapsed:.0f}/s) over {len(stub.connections)} connection(s)")
+
+_test_throughput_with_bounded_concurrency.stub_options = {'delay': 0.005}
+
+
+async def _test_large_burst_is_split_into_batches(stub, dead_letters):
+    dispatcher = WebhookDispatcher(stub.url, coalesce_window=0.05, max_batch_size=50,
+                                   dead_letter_path=dead_letters)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(dispatcher.publish({'n': i}) for i in range(1000)))
+    elapsed = time.perf_counter() - started
+    await dispatcher.close()
+
+    assert all(results)
+    assert len(stub.requests) == 20, len(stub.requests)
+    assert sum(request['event_count'] for request in stub.requests) == 1000
+    print(f"  1000 events in {elapsed:.2f}s as {len(stub.requests)} requests")
+
+
+async def _test_retries_then_delivers(stub, dead_letters):
+    dispatcher = WebhookDispatcher(stub.url, retry_base_delay=0.01, dead_letter_path=dead_letters)
+    assert await dispatcher.send({'n': 1})
+    await dispatcher.close()
+
+    assert len(stub.requests) == 3
+    assert not dead_letters.exists()
+
+_test_retries_then_delivers.stub_options = {'fail_first': 2}
+
+
+async def _test_failures_go_to_dead_letter_file(stub, dead_letters):
+    dispatcher = WebhookDispatcher(stub.url, max_retries=3, retry_base_delay=0.01,
+                                   dead_letter_path=dead_letters)
+    assert await dispatcher.send({'n': 1}) is False
+    await dispatcher.close()
+
+    # 400 is not retryable
+    assert len(stub.requests) == 1
+    records = [json.loads(line) for line in dead_letters.read_text().splitlines()]
+    assert len(records) == 1
+    assert records[0]['payload'] == {'n': 1}
+    assert records[0]['error'] == 'HTTP 400'
+
+_test_failures_go_to_dead_letter_file.stub_options = {'status': 400}
+
+
+async def _test_threads_with_their_own_loops_share_a_dispatcher(stub, dead_letters):
+    # As on the app-wide NotificationManager, used by request threads that each run a loop
+    dispatcher = WebhookDispatcher(stub.url, coalesce_window=0.1, dead_letter_path=dead_letters)
+    both_publishing = threading.Barrier(2)
+
+    def request_thread(name):
+        async def publish_events():
+            both_publishing.wait()
+            results = await asyncio.wait_for(
+                asyncio.gather(*(dispatcher.publish({'thread': name, 'n': i}) for i in range(5))), timeout=5)
+            await dispatcher.close()
+            return results
+        return asyncio.run(publish_events())
+
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(loop.run_in_executor(None, request_thread, name) for name in ('a', 'b')))
+
+    assert all(all(thread_results) for thread_results in results)
+    # One batch per thread, each delivered by the loop that published it
+    assert sorted(tuple(event['thread'] for event in request['events']) for request in stub.requests) == \
+        [('a',) * 5, ('b',) * 5]
+    assert dispatcher._states == {}
+
+
+def test_events_in_window_are_coalesced():
+    run(_test_events_in_window_are_coalesced)
+
+
+def test_single_event_is_sent_unchanged():
+    run(_test_single_event_is_sent_unchanged)
+
+
+def test_throughput_with_bounded_concurrency():
+    run(_test_throughput_with_bounded_concurrency)
+
+
+def test_large_burst_is_split_into_batches():
+    run(_test_large_burst_is_split_into_batches)
+
+
+def test_retries_then_delivers():
+    run(_test_retries_then_delivers)
+
+
+def test_failures_go_to_dead_letter_file():
+    run(_test_failures_go_to_dead_letter_file)
+
+
+def test_threads_with_their_own_loops_share_a_dispatcher():
+    run(_test_threads_with_their_own_loops_share_a_dispatcher)
+
+
+if __name__ == '__main__':
+    test_events_in_window_are_coalesced()
+    test_single_event_is_sent_unchanged()
+    test_throughput_with_bounded_concurrency()
+    test_large_burst_is_split_into_batches()
+    test_retries_then_delivers()
+    test_failures_go_to_dead_letter_file()
+    test_threads_with_their_own_loops_share_a_dispatcher()
+    print("✅ All webhook dispatcher tests passed")